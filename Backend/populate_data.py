@@ -7,11 +7,15 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "shopease.settings")
 django.setup()
 
 import random
-from datetime import datetime, timedelta
+from datetime import timedelta
 from decimal import Decimal
 
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
+from django.utils import timezone
 
+from shop import cache, rollups
+from shop.loadgen import explicit_timestamps
 from shop.models import Category, Customer, Order, OrderItem, Product
 
 
@@ -41,11 +45,9 @@ def create_categories():
         {"name": "Food & Beverages", "description": "Food items and drinks"},
     ]
 
-    categories = []
-    for cat_data in categories_data:
-        category = Category.objects.create(**cat_data)
-        categories.append(category)
-        print(f"  ✓ Created category: {category.name}")
+    categories = Category.objects.bulk_create(
+        Category(**cat_data) for cat_data in categories_data
+    )
 
     print(f"✅ Created {len(categories)} categories!\n")
     return categories
@@ -114,17 +116,17 @@ def create_products(categories):
         ],
     }
 
-    products = []
-    for category in categories:
-        if category.name in products_data:
-            for prod_data in products_data[category.name]:
-                product = Product.objects.create(
-                    category=category,
-                    description=f"High-quality {prod_data['name'].lower()} for your needs.",
-                    **prod_data,
-                )
-                products.append(product)
-                print(f"  ✓ Created: {product.name} (${product.price})")
+    products = Product.objects.bulk_create(
+        Product(
+            category=category,
+            description=f"High-quality {prod_data['name'].lower()} for your needs.",
+            **{**prod_data, "price": Decimal(str(prod_data["price"]))},
+        )
+        for category in categories
+        for prod_data in products_data.get(category.name, [])
+    )
+
+    Category.refresh_product_counts()
 
     print(f"✅ Created {len(products)} products!\n")
     return products
@@ -217,22 +219,23 @@ def create_customers():
         },
     ]
 
-    customers = []
-    for cust_data in customers_data:
-        phone = cust_data.pop("phone")
-        city = cust_data.pop("city")
-
-        user = User.objects.create_user(password="password123", **cust_data)
-
-        customer = Customer.objects.create(
+    password = make_password("password123")
+    profiles = [
+        {"phone": data.pop("phone"), "city": data.pop("city")}
+        for data in customers_data
+    ]
+    users = User.objects.bulk_create(
+        User(password=password, **cust_data) for cust_data in customers_data
+    )
+    customers = Customer.objects.bulk_create(
+        Customer(
             user=user,
-            phone=phone,
-            city=city,
             address=f"{random.randint(100, 999)} Main Street",
             postal_code=f"{random.randint(10000, 99999)}",
+            **profile,
         )
-        customers.append(customer)
-        print(f"  ✓ Created customer: {customer.full_name}")
+        for user, profile in zip(users, profiles)
+    )
 
     print(f"✅ Created {len(customers)} customers!\n")
     return customers
@@ -244,40 +247,46 @@ def create_orders(customers, products):
 
     statuses = ["pending", "processing", "shipped", "delivered"]
     orders_count = 30
+    now = timezone.now()
 
+    orders, order_lines = [], []
     for i in range(orders_count):
         customer = random.choice(customers)
-        status = random.choice(statuses)
-
-        # Create order
-        order = Order.objects.create(
-            customer=customer,
-            status=status,
-            shipping_address=f"{customer.address}, {customer.city} {customer.postal_code}",
-            order_notes=f"Order notes for order {i+1}" if random.random() > 0.7 else "",
-        )
 
         # Add random items to order
-        num_items = random.randint(1, 5)
-        selected_products = random.sample(products, num_items)
-
-        for product in selected_products:
-            quantity = random.randint(1, 3)
-            OrderItem.objects.create(
-                order=order, product=product, quantity=quantity, price=product.price
+        lines = [
+            (product, random.randint(1, 3))
+            for product in random.sample(products, random.randint(1, 5))
+        ]
+        order_lines.append(lines)
+
+        orders.append(
+            Order(
+                customer=customer,
+                status=random.choice(statuses),
+                shipping_address=f"{customer.address}, {customer.city} {customer.postal_code}",
+                order_notes=(
+                    f"Order notes for order {i+1}" if random.random() > 0.7 else ""
+                ),
+                total_amount=sum(product.price * qty for product, qty in lines),
+                # Set realistic created date (last 60 days)
+                created_at=now - timedelta(days=random.randint(0, 60)),
             )
+        )
 
-        # Calculate total
-        order.calculate_total()
-
-        # Set realistic created date (last 60 days)
-        days_ago = random.randint(0, 60)
-        order.created_at = datetime.now() - timedelta(days=days_ago)
-        order.save()
-
-        print(
-            f"  ✓ Order #{order.id}: {order.items.count()} items, ${order.total_amount}"
+    with explicit_timestamps(Order):
+        orders = Order.objects.bulk_create(orders)
+    OrderItem.objects.bulk_create(
+        OrderItem(
+            order=order,
+            product=product,
+            category_id=product.category_id,
+            quantity=quantity,
+            price=product.price,
         )
+        for order, lines in zip(orders, order_lines)
+        for product, quantity in lines
+    )
 
     print(f"✅ Created {orders_count} orders!\n")
 
@@ -296,6 +305,12 @@ def main():
     customers = create_customers()
     create_orders(customers, products)
 
+    print("📊 Rebuilding sales rollups...")
+    rollups.rebuild()
+    cache.invalidate_categories()
+    cache.invalidate_products()
+    print("✅ Rollups rebuilt!\n")
+
     print("=" * 50)
     print("🎉 DATA POPULATION COMPLETE!")
     print("=" * 50)
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Category, Customer, Order, OrderItem, Product
+from .models import Cart, CartItem, Category, Customer, Order, OrderItem, Product
 
 
 @admin.register(Category)
@@ -11,9 +11,18 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ["name", "category", "price", "stock", "is_active", "created_at"]
+    list_display = [
+        "name",
+        "sku",
+        "category",
+        "price",
+        "stock",
+        "reserved",
+        "is_active",
+        "created_at",
+    ]
     list_filter = ["category", "is_active", "created_at"]
-    search_fields = ["name", "description"]
+    search_fields = ["name", "sku", "description"]
     list_editable = ["price", "stock", "is_active"]
 
 
@@ -36,3 +45,15 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ["customer__user__username", "customer__user__email"]
     inlines = [OrderItemInline]
     readonly_fields = ["total_amount", "created_at", "updated_at"]
+
+
+class CartItemInline(admin.TabularInline):
+    model = CartItem
+    extra = 0
+
+
+@admin.register(Cart)
+class CartAdmin(admin.ModelAdmin):
+    list_display = ["id", "customer", "token", "updated_at"]
+    search_fields = ["customer__user__username", "token"]
+    inlines = [CartItemInline]
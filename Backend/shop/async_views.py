@@ -0,0 +1,211 @@
+"""
+Async variants of the hot read endpoints.
+
+They answer GET requests with Django's async ORM, so under an ASGI server
+a request waiting on the database does not hold a worker thread. Each
+one returns the same JSON as its DRF view and hands the requests it does
+not cover (writes, the browsable API, cursor pages, errors) to that view.
+
+Routes opt in by URL name through the ``SHOP_ASYNC_VIEWS`` setting; see
+``routes``. The public catalogue routes ignore credentials, as any user
+may read them.
+"""
+
+import asyncio
+import math
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+from django.urls import path
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .authentication import CachedJWTAuthentication
+from .cache import async_cache_response
+from .models import Category, Customer, CustomerSalesRollup, Product
+from .serializers import ProductDetailSerializer, ProductListSerializer
+from .views import (
+    DASHBOARD_CATALOGUE_TOTALS,
+    DASHBOARD_ORDER_TOTALS,
+    CategoryViewSet,
+    ProductViewSet,
+    analytics_dashboard,
+    catalogue_products,
+    dashboard_cache_key,
+    dashboard_data,
+    dashboard_ttl,
+    date_window,
+)
+
+
+class Fallback(Exception):
+    """Raised by an async view to let the sync view answer the request"""
+
+
+def sync_fallback(sync_view):
+    """Serve GET requests for JSON with the async view, the rest with sync_view"""
+
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            wants_json = "format" not in request.GET and "text/html" not in (
+                request.headers.get("Accept", "")
+            )
+            if request.method == "GET" and wants_json:
+                try:
+                    return await view(request, *args, **kwargs)
+                except Fallback:
+                    pass
+            return await sync_to_async(sync_view)(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def json_response(data):
+    response = HttpResponse(
+        JSONRenderer().render(data), content_type="application/json"
+    )
+    patch_vary_headers(response, ["Accept"])
+    return response
+
+
+async def authenticated_user(request):
+    """The user of the request's JWT, or None"""
+    try:
+        result = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+async def paginate(request, queryset):
+    """Page number pagination as done by the DRF views"""
+    page = request.GET.get("page", "1")
+    if not page.isdigit() or int(page) < 1:
+        raise Fallback
+    page, size = int(page), api_settings.PAGE_SIZE
+
+    count = await queryset.acount()
+    if page > max(1, math.ceil(count / size)):
+        raise Fallback
+
+    url = request.build_absolute_uri()
+    next_url = replace_query_param(url, "page", page + 1)
+    if page == 2:
+        previous_url = remove_query_param(url, "page")
+    else:
+        previous_url = replace_query_param(url, "page", page - 1)
+
+    start = (page - 1) * size
+    results = [obj async for obj in queryset[start : start + size]]
+    return {
+        "count": count,
+        "next": next_url if page * size < count else None,
+        "previous": previous_url if page > 1 else None,
+    }, results
+
+
+@sync_fallback(ProductViewSet.as_view({"get": "list", "post": "create"}))
+@async_cache_response("categories", "products")
+async def product_list(request):
+    params = request.GET
+    if params.get("pagination") == "cursor" or "cursor" in params:
+        raise Fallback
+
+    page, products = await paginate(request, catalogue_products(params))
+    serializer = ProductListSerializer(
+        products, many=True, context={"request": request}
+    )
+    return json_response({**page, "results": serializer.data})
+
+
+@sync_fallback(
+    ProductViewSet.as_view(
+        {
+            "get": "retrieve",
+            "put": "update",
+            "patch": "partial_update",
+            "delete": "destroy",
+        }
+    )
+)
+@async_cache_response("categories", "product:{pk}")
+async def product_detail(request, pk):
+    try:
+        product = await catalogue_products(request.GET).aget(pk=pk)
+    except Product.DoesNotExist:
+        raise Fallback
+    serializer = ProductDetailSerializer(product, context={"request": request})
+    return json_response(serializer.data)
+
+
+@sync_fallback(CategoryViewSet.as_view({"get": "products"}))
+@async_cache_response("categories", "products")
+async def category_products(request, pk):
+    if not await Category.objects.filter(pk=pk).aexists():
+        raise Fallback
+    products = Product.objects.filter(category_id=pk, is_active=True)
+    products = [product async for product in products.select_related("category")]
+    serializer = ProductListSerializer(
+        products, many=True, context={"request": request}
+    )
+    return json_response(serializer.data)
+
+
+@sync_fallback(analytics_dashboard)
+async def dashboard(request):
+    if await authenticated_user(request) is None:
+        raise Fallback
+    try:
+        window = date_window(request)
+    except ValidationError:
+        raise Fallback
+
+    key = dashboard_cache_key(window)
+    data = await cache.aget(key)
+    if data is None:
+        # Django runs the async ORM's queries on the request's database
+        # thread, so they still reach the database one at a time; gathering
+        # them just awaits all three together
+        orders, catalogue, customers = await asyncio.gather(
+            CustomerSalesRollup.objects.filter(**window).aaggregate(
+                **DASHBOARD_ORDER_TOTALS
+            ),
+            Category.objects.aaggregate(**DASHBOARD_CATALOGUE_TOTALS),
+            Customer.objects.acount(),
+        )
+        data = dashboard_data(orders, catalogue, customers)
+        await cache.aset(key, data, dashboard_ttl())
+    return json_response(data)
+
+
+ROUTES = {
+    "product-list": path("products/", product_list, name="product-list"),
+    "product-detail": path("products/<int:pk>/", product_detail, name="product-detail"),
+    "category-products": path(
+        "categories/<int:pk>/products/", category_products, name="category-products"
+    ),
+    "analytics_dashboard": path(
+        "analytics/dashboard/", dashboard, name="analytics_dashboard"
+    ),
+}
+
+
+def routes(names):
+    """URL patterns serving the named routes asynchronously, to list first"""
+    unknown = sorted(set(names) - set(ROUTES))
+    if unknown:
+        raise ImproperlyConfigured(
+            f"Unknown async routes {unknown}; choose from {sorted(ROUTES)}"
+        )
+    return [ROUTES[name] for name in names]
@@ -0,0 +1,195 @@
+"""
+JWT authentication.
+
+Access tokens carry the identity the frontend and the views need
+(``user_id``, ``customer_id``, ``is_staff``, as of login), and
+``CachedJWTAuthentication`` resolves the user through a bounded
+in-process LRU, so an authenticated request whose user is cached makes no
+authentication queries. Cached users come with their customer profile
+loaded. Entries are evicted by shop.signals when a user or customer
+changes, and expire after ``SHOP_AUTH_CACHE_TTL_SECONDS`` to bound how
+long other processes may serve a stale copy.
+
+Refresh tokens are checked against the blacklist through
+``shop.blacklist.token_blacklist``.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .blacklist import token_blacklist
+from .middleware import profile_section
+
+
+class ShopRefreshToken(RefreshToken):
+    """
+    Refresh token whose access tokens carry the shop identity claims, and
+    which is checked against the blacklist filter rather than the table
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        customer = getattr(user, "customer_profile", None)
+        token["customer_id"] = customer.pk if customer else None
+        token["is_staff"] = user.is_staff
+        return token
+
+    def check_blacklist(self):
+        if self.payload[api_settings.JTI_CLAIM] in token_blacklist:
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        blacklisted = super().blacklist()
+        token_blacklist.add(self.payload[api_settings.JTI_CLAIM])
+        return blacklisted
+
+
+class ShopModelBackend(ModelBackend):
+    """
+    ModelBackend that loads the customer profile with the user, so the
+    login token's ``customer_id`` claim costs no extra query
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        User = get_user_model()
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = User._default_manager.select_related("customer_profile").get(
+                **{User.USERNAME_FIELD: username}
+            )
+        except User.DoesNotExist:
+            # Hash anyway so unknown usernames take as long as wrong passwords
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+
+class ShopTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ShopRefreshToken
+
+
+class ShopTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = ShopRefreshToken
+
+
+class UserCache:
+    """
+    Thread-safe LRU of users by ID, each kept for at most ``ttl`` seconds.
+
+    IDs are compared as strings, the form they take in token claims.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, user_id):
+        user_id = str(user_id)
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and entry[1] <= time.monotonic():
+                del self.entries[user_id]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(user_id)
+            self.hits += 1
+        # Each request gets its own copy, customer profile included
+        return copy.deepcopy(entry[0])
+
+    def set(self, user):
+        if self.max_size <= 0:
+            return
+        user_id = str(getattr(user, api_settings.USER_ID_FIELD))
+        with self.lock:
+            self.entries[user_id] = (copy.deepcopy(user), time.monotonic() + self.ttl)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def evict(self, user_id):
+        with self.lock:
+            self.entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_cache = UserCache(
+    max_size=getattr(settings, "SHOP_AUTH_CACHE_SIZE", 10_000),
+    ttl=getattr(settings, "SHOP_AUTH_CACHE_TTL_SECONDS", 60),
+)
+
+
+class ProfiledJWTAuthentication(JWTAuthentication):
+    """JWT authentication that reports its time to ProfilingMiddleware"""
+
+    def authenticate(self, request):
+        with profile_section("auth"):
+            return super().authenticate(request)
+
+
+class CachedJWTAuthentication(ProfiledJWTAuthentication):
+    """Profiled JWT authentication that reads users from ``user_cache``"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(
+                "Token contained no recognizable user identification"
+            ) from e
+
+        user = user_cache.get(user_id)
+        if user is None:
+            try:
+                user = (
+                    get_user_model()
+                    .objects.select_related("customer_profile")
+                    .get(**{api_settings.USER_ID_FIELD: user_id})
+                )
+            except get_user_model().DoesNotExist as e:
+                raise AuthenticationFailed(
+                    "User not found", code="user_not_found"
+                ) from e
+            user_cache.set(user)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(
+                "The user's password has been changed.", code="password_changed"
+            )
+
+        return user
@@ -0,0 +1,178 @@
+"""
+Refresh-token blacklist.
+
+simplejwt checks every refresh token it is given against its
+``BlacklistedToken`` table. ``TokenBlacklist`` answers that question from
+an in-process Bloom filter of blacklisted token IDs instead and only asks
+the database about the (rare) tokens the filter may contain, so refreshing
+a token that was never blacklisted runs no membership query whatever the
+size of the table.
+
+The filter learns the tokens this process blacklists at once, and those
+blacklisted elsewhere by reading the rows added since its last look, at
+most every ``SHOP_BLACKLIST_SYNC_SECONDS``. It is rebuilt from the tokens
+that have not expired every ``SHOP_BLACKLIST_REBUILD_SECONDS``, or sooner
+once it holds more than its capacity, which is at least twice the live
+tokens it was built from. ``purge_expired`` (the
+purge_tokens command) deletes the tokens past their expiry so the tables
+themselves stay the size of the live tokens.
+"""
+
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+PURGE_BATCH_SIZE = 1000
+
+# How long a missing row ID is watched for a transaction committing late
+GAP_SECONDS = 60
+
+
+class BloomFilter:
+    """Set of strings that may answer "present" for a few absent ones"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(capacity, 1)
+        self.size = math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self.positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self.positions(key)
+        )
+
+
+class TokenBlacklist:
+    """Thread-safe view of the blacklisted token IDs; see the module docstring"""
+
+    def __init__(self, capacity, error_rate, sync_seconds, rebuild_seconds):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_seconds = sync_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Forget everything; the next check rebuilds the filter"""
+        self.filter = None
+        self.last_id = 0
+        self.gaps = {}
+        self.built_at = self.synced_at = 0.0
+
+    def rebuild(self):
+        now = time.monotonic()
+        latest = BlacklistedToken.objects.order_by("-pk").values_list("pk", flat=True)
+        last_id = latest.first() or 0
+        live = BlacklistedToken.objects.filter(
+            pk__lte=last_id, token__expires_at__gt=timezone.now()
+        ).values_list("token__jti", flat=True)
+
+        # Room for as many again before the next rebuild is due
+        bloom = BloomFilter(max(self.capacity, 2 * live.count()), self.error_rate)
+        for jti in live.iterator(chunk_size=10_000):
+            bloom.add(jti)
+        self.filter, self.last_id, self.gaps = bloom, last_id, {}
+        self.built_at = self.synced_at = now
+
+    def sync(self):
+        """Add the rows blacklisted by other processes since the last look"""
+        now = time.monotonic()
+        self.gaps = {
+            pk: seen for pk, seen in self.gaps.items() if now - seen < GAP_SECONDS
+        }
+        rows = BlacklistedToken.objects.filter(pk__gt=self.last_id)
+        if self.gaps:
+            rows |= BlacklistedToken.objects.filter(pk__in=list(self.gaps))
+        found = set()
+        for pk, jti in rows.values_list("pk", "token__jti"):
+            self.filter.add(jti)
+            found.add(pk)
+            self.gaps.pop(pk, None)
+
+        # IDs skipped over may belong to transactions that have not committed
+        # yet; look for them again until they are old enough to be gaps
+        newest = max(found, default=self.last_id)
+        for pk in range(self.last_id + 1, newest):
+            if pk not in found:
+                self.gaps.setdefault(pk, now)
+        self.last_id = max(self.last_id, newest)
+        self.synced_at = now
+
+    def refresh(self):
+        now = time.monotonic()
+        with self.lock:
+            if (
+                self.filter is None
+                or self.filter.count > self.filter.capacity
+                or now - self.built_at >= self.rebuild_seconds
+            ):
+                self.rebuild()
+            elif now - self.synced_at >= self.sync_seconds:
+                self.sync()
+
+    def add(self, jti):
+        with self.lock:
+            if self.filter is not None:
+                self.filter.add(jti)
+
+    def __contains__(self, jti):
+        self.refresh()
+        if jti not in self.filter:
+            return False
+        return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+token_blacklist = TokenBlacklist(
+    capacity=getattr(settings, "SHOP_BLACKLIST_FILTER_CAPACITY", 1_000_000),
+    error_rate=getattr(settings, "SHOP_BLACKLIST_FILTER_ERROR_RATE", 0.001),
+    sync_seconds=getattr(settings, "SHOP_BLACKLIST_SYNC_SECONDS", 1),
+    rebuild_seconds=getattr(settings, "SHOP_BLACKLIST_REBUILD_SECONDS", 60 * 60),
+)
+
+
+def purge_expired(now=None, batch_size=PURGE_BATCH_SIZE):
+    """
+    Delete the outstanding and blacklisted tokens past their expiry.
+
+    Works through the outstanding tokens in ID order, which is close to
+    expiry order (every refresh token lives as long), a batch per
+    statement so no one transaction locks the tables for long. Returns the
+    number of outstanding tokens deleted.
+    """
+    now = now or timezone.now()
+    purged = last_pk = 0
+    while True:
+        batch = list(
+            OutstandingToken.objects.filter(pk__gt=last_pk, expires_at__lte=now)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not batch:
+            return purged
+        # Blacklist rows go with their token (on_delete=CASCADE)
+        OutstandingToken.objects.filter(pk__in=batch).delete()
+        purged += len(batch)
+        last_pk = batch[-1]
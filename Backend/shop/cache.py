@@ -0,0 +1,188 @@
+"""
+Response cache for the public catalogue endpoints.
+
+Rendered responses are stored in the cache named by the
+``SHOP_CATALOGUE_CACHE`` setting. Keys embed version tokens, so a write
+never deletes entries: it replaces the tokens the affected keys were
+built from and the old entries age out on their own.
+
+- ``categories``: category names and product counts
+- ``products``: every product listing
+- ``product:<id>``: a single product's detail
+"""
+
+import hashlib
+import uuid
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework.response import Response
+
+# Query parameters that change the catalogue responses
+CACHED_PARAMS = ("category", "in_stock", "search", "page", "pagination", "cursor")
+CACHED_FORMATS = ("json",)
+
+
+def get_cache():
+    return caches[getattr(settings, "SHOP_CATALOGUE_CACHE", "default")]
+
+
+def get_versions(names):
+    """Fetch (or create) the version tokens for the given names"""
+    cache = get_cache()
+    keys = [f"catalogue:version:{name}" for name in names]
+    versions = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*names):
+    """Invalidate every cached response built from the given versions"""
+
+    def bump():
+        get_cache().set_many(
+            {f"catalogue:version:{name}": uuid.uuid4().hex for name in names},
+            timeout=None,
+        )
+
+    # Bump now for this process, and again once the write is visible to
+    # readers that may have cached the old rows in the meantime
+    bump()
+    transaction.on_commit(bump)
+
+
+def invalidate_products(product_ids=()):
+    bump_versions("products", *[f"product:{pk}" for pk in product_ids])
+
+
+def invalidate_categories():
+    bump_versions("categories")
+
+
+def response_cache_key(request, versions, renderer_format):
+    params = sorted(
+        (name, value)
+        for name, values in request.GET.lists()
+        if name in CACHED_PARAMS
+        for value in values
+    )
+    raw = "|".join(
+        [
+            *versions,
+            renderer_format,
+            request.get_host(),
+            request.path,
+            repr(params),
+        ]
+    )
+    return "catalogue:response:" + hashlib.md5(raw.encode()).hexdigest()
+
+
+def not_modified(request, etag):
+    return etag in request.headers.get("If-None-Match", "")
+
+
+def cached_response(request, cached):
+    content, content_type, etag = cached
+    if not_modified(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type=content_type)
+    response["ETag"] = etag
+    return response
+
+
+def store_response(request, key, response):
+    """Cache a rendered 200 response; returns what to send back"""
+    etag = '"%s"' % hashlib.md5(response.content).hexdigest()
+    get_cache().set(key, (response.content, response["Content-Type"], etag))
+    response["ETag"] = etag
+
+    if not_modified(request, etag):
+        not_modified_response = HttpResponseNotModified()
+        not_modified_response["ETag"] = etag
+        return not_modified_response
+    return response
+
+
+def cache_response(*version_names):
+    """
+    Cache a read-only catalogue view method.
+
+    ``version_names`` may contain ``{pk}``, filled from the URL kwargs. On a
+    hit the stored body is returned without touching the ORM or the
+    serializers; a matching If-None-Match gets a 304.
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            # The browsable API embeds the current user, so only cache JSON
+            if request.accepted_renderer.format not in CACHED_FORMATS:
+                return method(self, request, *args, **kwargs)
+
+            names = [name.format(**kwargs) for name in version_names]
+            key = response_cache_key(
+                request, get_versions(names), request.accepted_renderer.format
+            )
+
+            cached = get_cache().get(key)
+            if cached is not None:
+                return cached_response(request, cached)
+
+            request.catalogue_cache_key = key
+            return method(self, request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class CatalogueCacheMixin:
+    """Store the responses of methods decorated with cache_response"""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(request, "catalogue_cache_key", None)
+        if key is None or not isinstance(response, Response):
+            return response
+        if response.status_code != 200:
+            return response
+
+        response.render()
+        return store_response(request, key, response)
+
+
+def async_cache_response(*version_names):
+    """
+    cache_response for the async views in shop.async_views.
+
+    They only render JSON, and share keys and entries with the sync views.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            names = [name.format(**kwargs) for name in version_names]
+            versions = await sync_to_async(get_versions)(names)
+            key = response_cache_key(request, versions, "json")
+
+            cached = await get_cache().aget(key)
+            if cached is not None:
+                return cached_response(request, cached)
+
+            response = await view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            return await sync_to_async(store_response)(request, key, response)
+
+        return wrapper
+
+    return decorator
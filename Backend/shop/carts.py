@@ -0,0 +1,215 @@
+"""
+Server-side carts.
+
+A cart belongs to a customer, or to a guest who addresses it with the
+token returned when it was created (sent back in the ``X-Cart-Token``
+header). The first signed-in request that still carries a guest token
+merges the guest cart into the customer's.
+
+Lines are validated and priced against the catalogue in one ``in_bulk``
+lookup whatever their number, and checkout hands them to place_order,
+so converting a cart into an order runs a fixed number of queries too.
+"""
+
+import uuid
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .checkout import place_order
+from .models import Cart, CartItem, Customer, Product, StockHold
+
+TOKEN_HEADER = "HTTP_X_CART_TOKEN"
+
+
+class CartError(Exception):
+    """Raised when a cart cannot be updated or checked out as requested"""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def request_token(request):
+    try:
+        return uuid.UUID(request.META.get(TOKEN_HEADER, ""))
+    except ValueError:
+        return None
+
+
+def find_cart(request, create=False):
+    """
+    Return the cart for the current shopper, or None when there is none.
+
+    Signed-in customers get their own cart, with the guest cart named by
+    the request's token merged into it. Users without a customer profile
+    shop as guests.
+    """
+    token = request_token(request)
+    guest = None
+    if token is not None:
+        guest = Cart.objects.filter(token=token, customer=None).first()
+
+    customer = None
+    if request.user.is_authenticated:
+        try:
+            customer = request.user.customer_profile
+        except Customer.DoesNotExist:
+            pass
+
+    if customer is None:
+        if guest is None and create:
+            guest = Cart.objects.create()
+        return guest
+
+    if guest is None and not create:
+        return Cart.objects.filter(customer=customer).first()
+
+    cart, _ = Cart.objects.get_or_create(customer=customer)
+    if guest is not None:
+        merge(guest, cart)
+    return cart
+
+
+def cart_lines(cart):
+    """{product_id: quantity} in the order the lines were added"""
+    if cart is None:
+        return {}
+    return dict(
+        cart.items.order_by("added_at", "pk").values_list("product_id", "quantity")
+    )
+
+
+def save_lines(cart, lines):
+    """Write the given quantities, removing lines whose quantity is 0"""
+    keep = {pk: qty for pk, qty in lines.items() if qty > 0}
+    drop = [pk for pk, qty in lines.items() if qty <= 0]
+    if keep:
+        CartItem.objects.bulk_create(
+            [
+                CartItem(cart=cart, product_id=product_id, quantity=quantity)
+                for product_id, quantity in keep.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["cart", "product"],
+            update_fields=["quantity"],
+        )
+    if drop:
+        cart.items.filter(product_id__in=drop).delete()
+    Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now())
+
+
+def update(cart, lines, replace=False):
+    """
+    Add the given {product_id: quantity} lines to the cart.
+
+    With ``replace`` the lines become the cart's whole content instead,
+    and a quantity of 0 removes a line. Raises CartError, changing
+    nothing, when a product does not exist or is not for sale.
+    """
+    wanted = [pk for pk, qty in lines.items() if qty > 0]
+    sellable = set(
+        Product.objects.filter(pk__in=wanted, is_active=True).values_list(
+            "pk", flat=True
+        )
+    )
+    errors = {
+        pk: "This product is not available." for pk in wanted if pk not in sellable
+    }
+    if errors:
+        raise CartError(errors)
+
+    with transaction.atomic():
+        if replace:
+            cart.items.exclude(product_id__in=wanted).delete()
+        else:
+            current = dict(
+                cart.items.filter(product_id__in=lines).values_list(
+                    "product_id", "quantity"
+                )
+            )
+            lines = {pk: current.get(pk, 0) + qty for pk, qty in lines.items()}
+        save_lines(cart, lines)
+
+
+def merge(source, target):
+    """Move the lines of ``source`` into ``target``, adding quantities"""
+    with transaction.atomic():
+        lines = cart_lines(target)
+        for product_id, quantity in cart_lines(source).items():
+            lines[product_id] = lines.get(product_id, 0) + quantity
+        save_lines(target, lines)
+        source.delete()
+
+
+def price(cart):
+    """
+    Price and validate the cart's lines against current stock.
+
+    Returns a dict with the token, the lines (each with its price, the
+    units the shopper can buy and an error if the line cannot be bought as
+    is) and the total of the buyable lines.
+    """
+    lines = cart_lines(cart)
+    products = Product.objects.in_bulk(list(lines))
+
+    # Units the customer holds count as available to them, as at checkout
+    held = {}
+    if lines and cart.customer_id:
+        for product_id, quantity in StockHold.objects.filter(
+            customer_id=cart.customer_id, product_id__in=lines
+        ).values_list("product_id", "quantity"):
+            held[product_id] = held.get(product_id, 0) + quantity
+
+    items = []
+    total = Decimal("0.00")
+    for product_id, quantity in lines.items():
+        product = products.get(product_id)
+        line = {
+            "product": product_id,
+            "product_name": None,
+            "price": None,
+            "quantity": quantity,
+            "subtotal": None,
+            "available": 0,
+            "error": None,
+        }
+        items.append(line)
+        if product is None or not product.is_active:
+            line["error"] = "This product is not available."
+            continue
+
+        available = product.available + held.get(product_id, 0)
+        line.update(
+            product_name=product.name,
+            price=product.price,
+            subtotal=product.price * quantity,
+            available=available,
+        )
+        if quantity > available:
+            line["error"] = f"Only {available} items available in stock."
+        else:
+            total += line["subtotal"]
+
+    return {
+        "token": cart.token if cart else None,
+        "items": items,
+        "total": total,
+    }
+
+
+def checkout(cart, **order_fields):
+    """Turn the customer's cart into an order and empty it"""
+    lines = cart_lines(cart)
+    if not lines:
+        raise CartError({"cart": "The cart is empty."})
+
+    with transaction.atomic():
+        order = place_order(
+            cart.customer,
+            [{"product": pk, "quantity": qty} for pk, qty in lines.items()],
+            **order_fields,
+        )
+        cart.items.all().delete()
+    return order
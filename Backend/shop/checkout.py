@@ -0,0 +1,161 @@
+from collections import OrderedDict, defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, Sum, When
+from django.utils import timezone
+
+from . import cache, inventory, rollups
+from .models import Order, OrderItem, Product, StockHold
+
+
+class CheckoutError(Exception):
+    """Raised when an order cannot be placed against current stock"""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def merge_lines(items_data):
+    """Collapse repeated products into a single line per product"""
+    lines = OrderedDict()
+    for item in items_data:
+        product = item["product"]
+        product_id = product.pk if isinstance(product, Product) else product
+        lines[product_id] = lines.get(product_id, 0) + item["quantity"]
+    return lines
+
+
+def place_order(customer, items_data, **order_fields):
+    """
+    Create an order and decrement stock for all of its lines.
+
+    Stock the customer holds for these products (shop.inventory) is used
+    first; the rest must be free, unreserved stock. Runs a fixed number of
+    queries regardless of basket size: one locking read of the products,
+    one of the holds, one conditional stock update, one order insert and
+    one bulk insert of the order items.
+    """
+    lines = merge_lines(items_data)
+
+    with transaction.atomic():
+        # Lock every referenced product in one query (ordered to avoid deadlocks)
+        products = Product.objects.select_for_update().in_bulk(sorted(lines))
+        held = inventory.take_holds(
+            StockHold.objects.filter(customer=customer, product_id__in=lines)
+        )
+
+        errors = {}
+        for product_id, quantity in lines.items():
+            product = products.get(product_id)
+            if product is None or not product.is_active:
+                errors[product_id] = "This product is not available."
+                continue
+            available = product.available + held.get(product_id, 0)
+            if quantity > available:
+                errors[product_id] = f"Only {available} items available in stock."
+        if errors:
+            raise CheckoutError(errors)
+
+        # Conditional decrement: only rows that still have enough stock match
+        try:
+            inventory.purchase(lines, held)
+        except inventory.InsufficientStock as exc:
+            raise CheckoutError(exc.errors)
+        cache.invalidate_products(lines)
+
+        # Compute the total in memory so the order is written once
+        total = sum(products[pid].price * qty for pid, qty in lines.items())
+        order = Order.objects.create(
+            customer=customer, total_amount=total, **order_fields
+        )
+
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=order,
+                    product=products[product_id],
+                    category_id=products[product_id].category_id,
+                    quantity=quantity,
+                    price=products[product_id].price,
+                )
+                for product_id, quantity in lines.items()
+            ]
+        )
+
+        rollups.record_new_order(order, lines, products)
+
+    return order
+
+
+NON_CANCELLABLE_STATUSES = ["shipped", "delivered"]
+
+
+def restore_stock(order_ids):
+    """Return the stock held by the given orders in one grouped update"""
+    quantities = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values("product_id")
+        .annotate(quantity=Sum("quantity"))
+        .values_list("product_id", "quantity")
+    )
+    quantities = dict(quantities)
+    if not quantities:
+        return 0
+
+    cache.invalidate_products(quantities)
+    return Product.objects.filter(pk__in=quantities).update(
+        stock=Case(
+            *[
+                When(pk=product_id, then=F("stock") + quantity)
+                for product_id, quantity in quantities.items()
+            ],
+            default=F("stock"),
+        )
+    )
+
+
+def cancel_orders(queryset, order_ids, batch_size=500):
+    """
+    Cancel the given orders and restore their stock.
+
+    Orders are processed in batches with a few set-based statements each.
+    Returns the list of cancelled IDs and a mapping of skipped IDs to the
+    reason they were left untouched.
+    """
+    cancelled = []
+    skipped = {}
+    order_ids = list(dict.fromkeys(order_ids))
+
+    for start in range(0, len(order_ids), batch_size):
+        batch = order_ids[start : start + batch_size]
+
+        with transaction.atomic():
+            statuses = dict(
+                queryset.select_for_update()
+                .filter(pk__in=batch)
+                .values_list("pk", "status")
+            )
+            cancellable = defaultdict(list)
+            for order_id in batch:
+                current = statuses.get(order_id)
+                if current is None:
+                    skipped[order_id] = "not found"
+                elif current in NON_CANCELLABLE_STATUSES:
+                    skipped[order_id] = f"already {current}"
+                elif current == "cancelled":
+                    skipped[order_id] = "already cancelled"
+                else:
+                    cancellable[current].append(order_id)
+
+            batch_cancelled = [pk for ids in cancellable.values() for pk in ids]
+            if batch_cancelled:
+                restore_stock(batch_cancelled)
+                Order.objects.filter(pk__in=batch_cancelled).update(
+                    status="cancelled", updated_at=timezone.now()
+                )
+                for previous, ids in cancellable.items():
+                    rollups.move_orders(ids, previous, "cancelled")
+                cancelled.extend(batch_cancelled)
+
+    return cancelled, skipped
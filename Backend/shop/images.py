@@ -0,0 +1,153 @@
+"""
+Product image derivatives.
+
+Each product image gets resized copies (``SHOP_IMAGE_VARIANTS``, by
+largest side) in WebP and in JPEG, or PNG for images with transparency,
+recorded in ``Product.image_variants`` under the names the storage gave
+them (content hashes with shop.storage)::
+
+    {"source": "products/3fa4….jpg",
+     "thumb": {"width": 200, "height": 150,
+               "jpeg": "products/variants/91c0….jpeg",
+               "webp": "products/variants/5be2….webp"},
+     ...}
+
+Variants are made outside the request: saving a product with a new image
+clears its variants, and the image_variants command (``--loop`` as a
+worker, ``--all --processes N`` to backfill) generates them for the
+products that have none. Serializers expose them with ``srcset``. The
+variant files of a replaced image are left in storage.
+"""
+
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from . import cache
+from .models import Product
+
+FORMATS = {"jpeg": "JPEG", "png": "PNG", "webp": "WEBP"}
+
+
+def variant_sizes():
+    return getattr(settings, "SHOP_IMAGE_VARIANTS", {"thumb": 200, "medium": 800})
+
+
+def variant_name(name, variant, extension):
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, "variants", f"{stem}-{variant}.{extension}")
+
+
+def encode(image, extension):
+    if extension == "jpeg" and image.mode != "RGB":
+        image = image.convert("RGB")
+    buffer = io.BytesIO()
+    image.save(
+        buffer,
+        FORMATS[extension],
+        quality=getattr(settings, "SHOP_IMAGE_QUALITY", 80),
+        optimize=True,
+    )
+    return buffer.getvalue()
+
+
+def render_variants(file):
+    """{variant: (width, height, {extension: bytes})} for an image file"""
+    with Image.open(file) as original:
+        original.load()
+        image = ImageOps.exif_transpose(original)
+    transparent = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if transparent else "RGB")
+    extensions = ["png" if transparent else "jpeg", "webp"]
+
+    variants = {}
+    for variant, size in variant_sizes().items():
+        resized = image.copy()
+        # Never enlarges; keeps the aspect ratio
+        resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+        variants[variant] = (
+            resized.width,
+            resized.height,
+            {extension: encode(resized, extension) for extension in extensions},
+        )
+    return variants
+
+
+def generate_variants(product):
+    """
+    Write the product image's variants and record them on the product.
+
+    Returns False, leaving the product alone, when the image changed
+    meanwhile. An image Pillow cannot read is recorded with an error so
+    it is not retried.
+    """
+    source = product.image.name
+    storage = product.image.storage
+    recorded = {"source": source}
+    try:
+        with product.image.open("rb") as file:
+            rendered = render_variants(file)
+    except (OSError, Image.DecompressionBombError) as e:
+        recorded["error"] = str(e)
+    else:
+        for variant, (width, height, files) in rendered.items():
+            recorded[variant] = {"width": width, "height": height}
+            for extension, content in files.items():
+                name = variant_name(source, variant, extension)
+                storage.delete(name)
+                recorded[variant][extension] = storage.save(name, ContentFile(content))
+
+    updated = Product.objects.filter(pk=product.pk, image=source).update(
+        image_variants=recorded
+    )
+    if updated:
+        cache.invalidate_products([product.pk])
+    return bool(updated)
+
+
+def pending():
+    """Products with an image but no variants yet"""
+    return (
+        Product.objects.exclude(image="").exclude(image=None).filter(image_variants={})
+    )
+
+
+def generate_for(product_ids):
+    """Generate the variants of the given products; returns how many were made"""
+    products = Product.objects.filter(pk__in=product_ids).exclude(image="")
+    return sum(generate_variants(product) for product in products.only("pk", "image"))
+
+
+def srcset(product, request=None):
+    """
+    {extension: srcset} for the product's variants, smallest first, e.g.
+    {"webp": "https://…/mug-thumb.webp 200w, https://…/mug-medium.webp 800w"}
+    """
+    variants = product.image_variants
+    if not product.image or variants.get("source") != product.image.name:
+        return {}
+
+    storage = product.image.storage
+    candidates, widths = {}, set()
+    for variant in sorted(
+        (value for value in variants.values() if isinstance(value, dict)),
+        key=lambda value: value["width"],
+    ):
+        # Small images come out the same size for several variants
+        if variant["width"] in widths:
+            continue
+        widths.add(variant["width"])
+        for extension in FORMATS:
+            if extension in variant:
+                url = storage.url(variant[extension])
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                candidates.setdefault(extension, []).append(
+                    f"{url} {variant['width']}w"
+                )
+    return {extension: ", ".join(urls) for extension, urls in candidates.items()}
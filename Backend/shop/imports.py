@@ -0,0 +1,201 @@
+"""
+Bulk catalogue import keyed on Product.sku.
+
+Rows come from CSV or NDJSON with the columns ``sku``, ``name``,
+``description``, ``price``, ``stock``, ``category`` (a category name) and
+``is_active``. Each batch is validated in memory, resolves its categories
+with one query and is written with a single upsert statement. Invalid rows
+are reported and skipped; the rest of the batch is still imported.
+"""
+
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import DatabaseError, transaction
+
+from . import cache
+from .models import Category, Product
+
+BATCH_SIZE = 1000
+
+UPDATE_FIELDS = ["name", "description", "price", "stock", "category", "is_active"]
+
+TRUE_VALUES = {"1", "true", "yes", "y", "t"}
+FALSE_VALUES = {"0", "false", "no", "n", "f"}
+
+
+def object_rows(rows):
+    """Pass dict rows through, replacing anything else with a row error"""
+    for row in rows:
+        yield row if isinstance(row, dict) else {"__error__": "Row must be an object."}
+
+
+def read_rows(stream, file_format):
+    """Yield one dict per CSV line or NDJSON object from a text stream"""
+    if file_format == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield {"__error__": "Invalid JSON."}
+                continue
+            yield from object_rows([row])
+
+
+def text(value):
+    return "" if value is None else str(value).strip()
+
+
+def clean_row(row, categories):
+    """Return (Product, None) for a valid row or (None, errors)"""
+    if "__error__" in row:
+        return None, {"row": row["__error__"]}
+
+    errors = {}
+    sku = text(row.get("sku"))
+    if not sku:
+        errors["sku"] = "This field is required."
+    elif len(sku) > 64:
+        errors["sku"] = "Ensure this field has no more than 64 characters."
+
+    name = text(row.get("name"))
+    if not name:
+        errors["name"] = "This field is required."
+    elif len(name) > 200:
+        errors["name"] = "Ensure this field has no more than 200 characters."
+
+    try:
+        price = Decimal(text(row.get("price")))
+        if not price.is_finite() or price < Decimal("0.01"):
+            raise InvalidOperation
+        if price != price.quantize(Decimal("0.01")) or price >= Decimal("1e8"):
+            errors["price"] = "Use at most 8 digits and 2 decimal places."
+    except InvalidOperation:
+        price = None
+        errors["price"] = "Enter a price of at least 0.01."
+
+    try:
+        stock = int(text(row.get("stock")) or 0)
+        if stock < 0:
+            raise ValueError
+    except ValueError:
+        stock = None
+        errors["stock"] = "Enter a whole number of at least 0."
+
+    is_active = text(row.get("is_active")).lower() or "true"
+    if is_active not in TRUE_VALUES | FALSE_VALUES:
+        errors["is_active"] = "Enter true or false."
+
+    category_id = categories.get(text(row.get("category")))
+    if category_id is None:
+        errors["category"] = f"Unknown category {text(row.get('category'))!r}."
+
+    if errors:
+        return None, errors
+    return (
+        Product(
+            sku=sku,
+            name=name,
+            description=text(row.get("description")),
+            price=price,
+            stock=stock,
+            category_id=category_id,
+            is_active=is_active in TRUE_VALUES,
+        ),
+        None,
+    )
+
+
+class ProductImport:
+    """Upsert product rows in batches and collect a per-row report"""
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.categories = {}
+        self.touched_categories = set()
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+
+    def run(self, rows):
+        rows = iter(rows)
+        number = 0
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.import_batch(batch, first_row=number + 1)
+            number += len(batch)
+        self.finish()
+        return self.report()
+
+    def resolve_categories(self, batch):
+        """Look up the category names of a batch not seen in earlier batches"""
+        names = {text(row.get("category")) for row in batch} - set(self.categories)
+        names.discard("")
+        if names:
+            self.categories.update(
+                Category.objects.filter(name__in=names).values_list("name", "pk")
+            )
+
+    def import_batch(self, batch, first_row):
+        self.resolve_categories(batch)
+
+        # Later rows win when a file repeats a SKU
+        products = {}
+        for number, row in enumerate(batch, start=first_row):
+            product, errors = clean_row(row, self.categories)
+            if errors:
+                self.errors.append({"row": number, "errors": errors})
+            else:
+                products[product.sku] = (number, product)
+        if not products:
+            return
+
+        try:
+            with transaction.atomic():
+                existing = dict(
+                    Product.objects.filter(sku__in=products).values_list(
+                        "sku", "category_id"
+                    )
+                )
+                saved = Product.objects.bulk_create(
+                    [product for _, product in products.values()],
+                    update_conflicts=True,
+                    unique_fields=["sku"],
+                    update_fields=[*UPDATE_FIELDS, "updated_at"],
+                )
+        except DatabaseError as exc:
+            self.errors.extend(
+                {"row": number, "errors": {"row": str(exc)}}
+                for number, _ in products.values()
+            )
+            return
+
+        self.updated += len(existing)
+        self.created += len(products) - len(existing)
+        self.touched_categories.update(existing.values())
+        self.touched_categories.update(p.category_id for p in saved)
+        cache.invalidate_products([p.pk for p in saved if p.pk is not None])
+
+    def finish(self):
+        if self.touched_categories:
+            Category.refresh_product_counts(self.touched_categories)
+            cache.invalidate_categories()
+        cache.invalidate_products()
+
+    def report(self):
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "errors": self.errors,
+        }
+
+
+def import_products(rows, batch_size=BATCH_SIZE):
+    return ProductImport(batch_size).run(rows)
@@ -0,0 +1,174 @@
+"""
+Stock reservations.
+
+A StockHold sets units of a product aside for a customer (a cart or a
+checkout in progress) until it is consumed by an order, released, or
+expires. ``Product.reserved`` is the sum of the active holds, so
+availability is ``stock - reserved`` without joining the holds table.
+
+Every change is a single conditional UPDATE whose WHERE clause re-checks
+availability, so concurrent buyers cannot oversell whatever the isolation
+level: a write that would overdraw a product matches no row and fails.
+"""
+
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+
+from . import cache
+from .models import Product, StockHold
+
+SWEEP_BATCH_SIZE = 1000
+
+
+class InsufficientStock(Exception):
+    """Raised when products cannot supply the requested quantities"""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def hold_ttl():
+    return timedelta(seconds=getattr(settings, "SHOP_HOLD_TTL_SECONDS", 15 * 60))
+
+
+def availability_errors(lines, held=None):
+    """Explain which of the requested lines cannot currently be supplied"""
+    held = held or {}
+    errors = {}
+    products = Product.objects.in_bulk(list(lines))
+    for product_id, quantity in lines.items():
+        product = products.get(product_id)
+        if product is None or not product.is_active:
+            errors[product_id] = "This product is not available."
+            continue
+        available = product.available + held.get(product_id, 0)
+        if quantity > available:
+            errors[product_id] = f"Only {available} items available in stock."
+    return errors
+
+
+def adjust(lines, stock=None, reserved=None, require=None, active_only=False):
+    """
+    Apply per-product deltas in one conditional UPDATE.
+
+    ``stock`` and ``reserved`` map product IDs to the amount added to each
+    counter; ``require`` maps product IDs to the free units (stock minus
+    reserved, before the update) each row must have. Returns True when
+    every product matched.
+    """
+    stock, reserved, require = stock or {}, reserved or {}, require or {}
+    conditions = [
+        (
+            Q(pk=product_id, stock__gte=F("reserved") + require[product_id])
+            if product_id in require
+            else Q(pk=product_id)
+        )
+        for product_id in lines
+    ]
+    products = Product.objects.filter(reduce(or_, conditions))
+    if active_only:
+        products = products.filter(is_active=True)
+    updates = {}
+    for field, deltas in [("stock", stock), ("reserved", reserved)]:
+        if deltas:
+            updates[field] = Case(
+                *[When(pk=pk, then=F(field) + delta) for pk, delta in deltas.items()],
+                default=F(field),
+                output_field=Product._meta.get_field(field),
+            )
+    return products.update(**updates) == len(lines)
+
+
+def reserve(customer, lines, ttl=None):
+    """Hold the given {product_id: quantity} lines, all or nothing"""
+    lines = {pk: qty for pk, qty in lines.items() if qty > 0}
+    if not lines:
+        return []
+    expires_at = timezone.now() + (ttl or hold_ttl())
+
+    with transaction.atomic():
+        if not adjust(lines, reserved=lines, require=lines, active_only=True):
+            raise InsufficientStock(availability_errors(lines))
+
+        holds = StockHold.objects.bulk_create(
+            StockHold(
+                customer=customer,
+                product_id=product_id,
+                quantity=quantity,
+                expires_at=expires_at,
+            )
+            for product_id, quantity in lines.items()
+        )
+    cache.invalidate_products(lines)
+    return holds
+
+
+def take_holds(holds):
+    """
+    Lock and delete the given holds, returning {product_id: quantity}.
+
+    Must run inside a transaction. Holds already consumed or released by a
+    concurrent transaction are simply not returned, so their quantities can
+    never be given back twice.
+    """
+    rows = list(holds.select_for_update().values_list("pk", "product_id", "quantity"))
+    if not rows:
+        return {}
+    StockHold.objects.filter(pk__in=[pk for pk, _, _ in rows]).delete()
+    quantities = {}
+    for _, product_id, quantity in rows:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+def release(holds):
+    """Give the stock of the given holds back to the pool"""
+    with transaction.atomic():
+        quantities = take_holds(holds)
+        if quantities:
+            adjust(quantities, reserved={pk: -qty for pk, qty in quantities.items()})
+    if quantities:
+        cache.invalidate_products(quantities)
+    return sum(quantities.values())
+
+
+def expire_holds(now=None, batch_size=SWEEP_BATCH_SIZE):
+    """Release every hold past its expiry; returns the number of holds swept"""
+    now = now or timezone.now()
+    swept = 0
+    while True:
+        batch = list(
+            StockHold.objects.filter(expires_at__lte=now)
+            .order_by("expires_at")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not batch:
+            return swept
+        release(StockHold.objects.filter(pk__in=batch, expires_at__lte=now))
+        swept += len(batch)
+
+
+def purchase(lines, held):
+    """
+    Take ``lines`` out of stock, consuming the ``held`` quantities first.
+
+    Each product row must have enough free stock for the part of its line
+    that was not held; held units stop being reserved. Must run inside the
+    checkout transaction. Raises InsufficientStock.
+    """
+    require = {pk: max(qty - held.get(pk, 0), 0) for pk, qty in lines.items()}
+    matched = adjust(
+        lines,
+        stock={pk: -qty for pk, qty in lines.items()},
+        reserved={pk: -held[pk] for pk in lines if held.get(pk)},
+        require=require,
+    )
+    if not matched:
+        raise InsufficientStock({"stock": "Stock changed while placing the order."})
@@ -0,0 +1,291 @@
+"""
+Deterministic synthetic data for load testing.
+
+Rows are generated in fixed-size chunks, each from its own seeded random
+generator, so the same options always produce the same data no matter how
+many worker processes split the work. Everything is written with
+``bulk_create``; the derived state that signals would normally maintain
+(category counts, sales rollups, catalogue cache) is rebuilt once at the end.
+"""
+
+import multiprocessing
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import cache, rollups
+from .models import Category, Customer, Order, OrderItem, Product
+
+ADJECTIVES = [
+    "Classic", "Compact", "Deluxe", "Eco", "Ergonomic", "Essential", "Premium",
+    "Portable", "Rugged", "Smart", "Vintage", "Wireless", "Lightweight", "Pro",
+]  # fmt: skip
+MATERIALS = [
+    "Bamboo", "Carbon", "Ceramic", "Cotton", "Glass", "Leather", "Linen",
+    "Maple", "Steel", "Titanium", "Wool", "Copper", "Silicone", "Oak",
+]  # fmt: skip
+NOUNS = [
+    "Backpack", "Blender", "Bottle", "Chair", "Headphones", "Jacket", "Kettle",
+    "Lamp", "Mug", "Notebook", "Speaker", "Sneakers", "Watch", "Wallet",
+    "Keyboard", "Tent", "Pan", "Desk", "Pillow", "Scarf",
+]  # fmt: skip
+
+# Orders older than this have usually been fulfilled
+FULFILMENT_DAYS = 14
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk inserts keep the created_at values set on the instances"""
+    fields = [model._meta.get_field("created_at") for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def zipf_cum_weights(count, exponent):
+    """Cumulative Zipf weights for random.choices over ``count`` items"""
+    return list(accumulate(1 / rank**exponent for rank in range(1, count + 1)))
+
+
+def next_id(model):
+    return (model.objects.aggregate(Max("pk"))["pk__max"] or 0) + 1
+
+
+class LoadGenerator:
+    def __init__(
+        self,
+        categories=20,
+        products=10_000,
+        customers=5_000,
+        orders=50_000,
+        max_items=5,
+        days=365,
+        seed=42,
+        batch_size=5_000,
+        zipf=1.1,
+        password="password123",
+    ):
+        self.categories = categories
+        self.products = products
+        self.customers = customers
+        self.orders = orders
+        self.max_items = max_items
+        self.days = days
+        self.seed = seed
+        self.batch_size = batch_size
+        self.zipf = zipf
+        self.password = password
+        self.now = timezone.now()
+
+    def rng(self, kind, start):
+        return random.Random(f"{self.seed}:{kind}:{start}")
+
+    def created_at(self, rng):
+        # Skewed towards recent days, as a growing shop would be
+        age = self.days * 86400 * rng.random() ** 1.5
+        return self.now - timedelta(seconds=age)
+
+    # Chunk builders: each inserts the rows [start, stop) of one kind
+
+    def insert_users(self, start, stop):
+        rng = self.rng("users", start)
+        users = [
+            User(
+                id=self.first_user_id + index,
+                username=f"load{self.first_user_id + index}",
+                email=f"load{self.first_user_id + index}@example.com",
+                password=self.password_hash,
+            )
+            for index in range(start, stop)
+        ]
+        User.objects.bulk_create(users)
+        Customer.objects.bulk_create(
+            Customer(
+                id=self.first_customer_id + index,
+                user=user,
+                city=rng.choice(["Austin", "Boston", "Denver", "Miami", "Seattle"]),
+                postal_code=f"{rng.randint(10000, 99999)}",
+                address=f"{rng.randint(1, 999)} Main Street",
+            )
+            for index, user in zip(range(start, stop), users)
+        )
+
+    def insert_products(self, start, stop):
+        rng = self.rng("products", start)
+        Product.objects.bulk_create(
+            Product(
+                id=self.first_product_id + index,
+                name=" ".join(
+                    [rng.choice(ADJECTIVES), rng.choice(MATERIALS), rng.choice(NOUNS)]
+                ),
+                description=" ".join(rng.choices(ADJECTIVES + MATERIALS + NOUNS, k=12)),
+                price=Decimal(rng.randint(199, 49999)) / 100,
+                stock=rng.randint(0, 500),
+                category_id=rng.choice(self.category_ids),
+                is_active=rng.random() > 0.05,
+                created_at=self.created_at(rng),
+            )
+            for index in range(start, stop)
+        )
+
+    def insert_orders(self, start, stop):
+        rng = self.rng("orders", start)
+        orders, items = [], []
+        for index in range(start, stop):
+            order_id = self.first_order_id + index
+            picks = rng.choices(
+                self.catalogue,
+                cum_weights=self.product_weights,
+                k=rng.randint(1, self.max_items),
+            )
+            total = Decimal(0)
+            lines = {product_id: rest for product_id, *rest in picks}
+            for product_id, (price, category_id) in lines.items():
+                quantity = rng.randint(1, 3)
+                total += price * quantity
+                items.append(
+                    OrderItem(
+                        order_id=order_id,
+                        product_id=product_id,
+                        category_id=category_id,
+                        quantity=quantity,
+                        price=price,
+                    )
+                )
+
+            created_at = self.created_at(rng)
+            if self.now - created_at > timedelta(days=FULFILMENT_DAYS):
+                status = "delivered" if rng.random() < 0.9 else "cancelled"
+            else:
+                status = rng.choice(["pending", "processing", "shipped", "cancelled"])
+            orders.append(
+                Order(
+                    id=order_id,
+                    customer_id=rng.choices(
+                        self.customer_ids, cum_weights=self.customer_weights
+                    )[0],
+                    status=status,
+                    total_amount=total,
+                    shipping_address=f"{rng.randint(1, 999)} Main Street",
+                    created_at=created_at,
+                )
+            )
+        Order.objects.bulk_create(orders)
+        OrderItem.objects.bulk_create(items, batch_size=self.batch_size)
+
+    def run_chunk(self, task):
+        kind, start, stop = task
+        with explicit_timestamps(Product, Order), transaction.atomic():
+            getattr(self, f"insert_{kind}")(start, stop)
+        return kind, stop - start
+
+    def chunks(self, kind, count):
+        return [
+            (kind, start, min(count, start + self.batch_size))
+            for start in range(0, count, self.batch_size)
+        ]
+
+    def run_phase(self, tasks, workers, log):
+        if workers <= 1:
+            results = map(self.run_chunk, tasks)
+        else:
+            # Children inherit this generator (and the prepared id lists)
+            # through fork and open their own database connections
+            connections.close_all()
+            context = multiprocessing.get_context("fork")
+            pool = context.Pool(workers, initializer=_set_generator, initargs=(self,))
+            results = pool.imap_unordered(_run_chunk, tasks)
+        done = {}
+        try:
+            for kind, count in results:
+                done[kind] = done.get(kind, 0) + count
+                log(f"  {kind}: {done[kind]}")
+        finally:
+            if workers > 1:
+                pool.close()
+                pool.join()
+
+    def run(self, workers=1, log=print):
+        if workers > 1 and connection.vendor == "sqlite":
+            log("  SQLite allows a single writer, generating in one process")
+            workers = 1
+
+        # Hash once: every generated user shares the same password
+        self.password_hash = make_password(self.password)
+        self.first_user_id = next_id(User)
+        self.first_customer_id = next_id(Customer)
+        self.first_product_id = next_id(Product)
+        self.first_order_id = next_id(Order)
+
+        existing = Category.objects.count()
+        Category.objects.bulk_create(
+            Category(name=f"Category {index}")
+            for index in range(existing, self.categories)
+        )
+        self.category_ids = list(Category.objects.values_list("pk", flat=True))
+
+        self.run_phase(
+            self.chunks("users", self.customers)
+            + self.chunks("products", self.products),
+            workers,
+            log,
+        )
+
+        if self.orders:
+            # Zipfian popularity over a seeded shuffle of the whole catalogue
+            self.catalogue = list(
+                Product.objects.filter(is_active=True)
+                .order_by("pk")
+                .values_list("pk", "price", "category_id")
+            )
+            random.Random(self.seed).shuffle(self.catalogue)
+            self.product_weights = zipf_cum_weights(len(self.catalogue), self.zipf)
+            self.customer_ids = list(
+                Customer.objects.order_by("pk").values_list("pk", flat=True)
+            )
+            random.Random(self.seed + 1).shuffle(self.customer_ids)
+            self.customer_weights = zipf_cum_weights(len(self.customer_ids), 0.5)
+            self.run_phase(self.chunks("orders", self.orders), workers, log)
+
+        self.finish(log)
+
+    def finish(self, log):
+        # Explicit primary keys leave PostgreSQL sequences behind
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [User, Customer, Product, Order]
+        )
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+        log("  refreshing category counts and sales rollups")
+        Category.refresh_product_counts()
+        rollups.rebuild()
+        cache.invalidate_categories()
+        cache.invalidate_products()
+
+
+_generator = None
+
+
+def _set_generator(generator):
+    global _generator
+    _generator = generator
+
+
+def _run_chunk(task):
+    return _generator.run_chunk(task)
@@ -0,0 +1,213 @@
+import asyncio
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType
+
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from django.urls import include, path
+from rest_framework_simplejwt.tokens import AccessToken
+
+from shop import async_views
+from shop import urls as shop_urls
+from shop.loadgen import LoadGenerator
+from shop.models import Category, Product
+
+from ._bench import benchmark_database, percentiles
+from .bench_endpoints import NO_CATALOGUE_CACHE
+
+
+def urlconf(patterns):
+    module = ModuleType("bench_urlconf")
+    module.urlpatterns = [path("api/", include(patterns))]
+    return module
+
+
+# The same API with every route sync, and with the async variants first
+SYNC_PATTERNS = [
+    pattern
+    for pattern in shop_urls.urlpatterns
+    if pattern not in async_views.ROUTES.values()
+]
+SYNC_URLCONF = urlconf(SYNC_PATTERNS)
+ASYNC_URLCONF = urlconf(async_views.routes(list(async_views.ROUTES)) + SYNC_PATTERNS)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the throughput of one WSGI worker (a thread pool) with one "
+        "ASGI worker (an event loop) on the routes that have async variants"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=2_000)
+        parser.add_argument("--orders", type=int, default=5_000)
+        parser.add_argument("--requests", type=int, default=400)
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=32,
+            help="Requests in flight at once",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=4,
+            help="Threads of the WSGI worker, as in gunicorn --threads",
+        )
+        parser.add_argument(
+            "--db-latency",
+            type=float,
+            default=2.0,
+            help="Milliseconds added to every query, standing in for a "
+            "database across the network",
+        )
+        parser.add_argument(
+            "--cache",
+            action="store_true",
+            help="Serve catalogue routes from the response cache",
+        )
+
+    def handle(self, *args, **options):
+        overrides = {} if options["cache"] else NO_CATALOGUE_CACHE
+        latency = options["db_latency"] / 1000
+
+        def slow_execute(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def add_latency(sender, connection, **kwargs):
+            connection.execute_wrappers.append(slow_execute)
+
+        with benchmark_database(), override_settings(**overrides):
+            LoadGenerator(
+                products=options["products"],
+                orders=options["orders"],
+                seed=42,
+            ).run(log=lambda message: None)
+            endpoints = self.endpoints()
+
+            # Every thread opens its own connection to the test database
+            connection.execute_wrappers.append(slow_execute)
+            connection_created.connect(add_latency)
+            try:
+                for name, url, headers in endpoints:
+                    with override_settings(ROOT_URLCONF=SYNC_URLCONF):
+                        wsgi = self.run_wsgi(url, headers, options)
+                    with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+                        asgi = asyncio.run(self.run_asgi(url, headers, options))
+                    self.report(name, wsgi, asgi)
+            finally:
+                connection_created.disconnect(add_latency)
+                connection.execute_wrappers.remove(slow_execute)
+
+    def endpoints(self):
+        """(name, url, headers) for every route with an async variant"""
+        staff = User.objects.create(username="bench-staff", is_staff=True)
+        token = f"Bearer {AccessToken.for_user(staff)}"
+        category = Category.objects.order_by("-active_product_count").first()
+        product = Product.objects.filter(is_active=True).order_by("pk").first()
+        return [
+            ("products.list", "/api/products/", {}),
+            ("products.list.page", "/api/products/?page=5&in_stock=true", {}),
+            ("products.detail", f"/api/products/{product.pk}/", {}),
+            ("categories.products", f"/api/categories/{category.pk}/products/", {}),
+            ("analytics.dashboard", "/api/analytics/dashboard/", {"authorization": token}),
+        ]  # fmt: skip
+
+    def run_wsgi(self, url, headers, options):
+        application = get_wsgi_application()
+        path_info, _, query = url.partition("?")
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path_info,
+            "QUERY_STRING": query,
+            "SERVER_NAME": "testserver",
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "HTTP_HOST": "testserver",
+            "wsgi.url_scheme": "http",
+            **{f"HTTP_{name.upper()}": value for name, value in headers.items()},
+        }
+
+        def request(_):
+            statuses = []
+            start = time.perf_counter()
+            response = application(
+                {**environ, "wsgi.input": io.BytesIO()},
+                lambda status, response_headers: statuses.append(status),
+            )
+            b"".join(response)
+            response.close()
+            if not statuses[0].startswith("200"):
+                raise CommandError(f"GET {url} -> {statuses[0]}")
+            return (time.perf_counter() - start) * 1000
+
+        # A gthread worker serves at most --threads requests at once
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options["threads"]) as pool:
+            timings = list(pool.map(request, range(options["requests"])))
+        return self.result(timings, time.perf_counter() - start)
+
+    async def run_asgi(self, url, headers, options):
+        application = get_asgi_application()
+        path_info, _, query = url.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path_info,
+            "raw_path": path_info.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(b"host", b"testserver")]
+            + [(name.encode(), value.encode()) for name, value in headers.items()],
+            "server": ("testserver", 80),
+            "client": ("127.0.0.1", 0),
+        }
+        in_flight = asyncio.Semaphore(options["concurrency"])
+
+        async def request():
+            statuses = []
+            body_sent = False
+
+            async def receive():
+                nonlocal body_sent
+                if not body_sent:
+                    body_sent = True
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                # The client never disconnects; Django cancels this wait
+                await asyncio.Future()
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    statuses.append(message["status"])
+
+            async with in_flight:
+                start = time.perf_counter()
+                await application(dict(scope), receive, send)
+                if statuses[0] != 200:
+                    raise CommandError(f"GET {url} -> {statuses[0]}")
+                return (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        timings = await asyncio.gather(*[request() for _ in range(options["requests"])])
+        return self.result(timings, time.perf_counter() - start)
+
+    def result(self, timings, elapsed):
+        return {**percentiles(timings), "rps": len(timings) / elapsed}
+
+    def report(self, name, wsgi, asgi):
+        self.stdout.write(
+            f"{name:<22} wsgi {wsgi['rps']:>7.1f} req/s p95={wsgi['p95_ms']:>7.1f}ms"
+            f" | asgi {asgi['rps']:>7.1f} req/s p95={asgi['p95_ms']:>7.1f}ms"
+            f" | x{asgi['rps'] / wsgi['rps']:.2f}"
+        )
@@ -0,0 +1,77 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from shop.authentication import CachedJWTAuthentication, ShopRefreshToken, user_cache
+from shop.loadgen import LoadGenerator
+from shop.models import Customer
+
+from ._bench import benchmark_database, percentiles
+from .bench_endpoints import NO_CATALOGUE_CACHE
+
+ENDPOINTS = [
+    "/api/auth/user/",
+    "/api/customers/profile/",
+    "/api/orders/",
+    "/api/holds/",
+    "/api/cart/",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the queries and latency JWT-authenticated reads spend with "
+        "the stock simplejwt user lookup and with the cached one"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=2_000)
+        parser.add_argument("--repeat", type=int, default=200)
+
+    def handle(self, *args, **options):
+        with benchmark_database(), override_settings(**NO_CATALOGUE_CACHE):
+            LoadGenerator(orders=options["orders"], seed=42).run(
+                log=lambda message: None
+            )
+            customer = Customer.objects.select_related("user").first()
+            client = APIClient()
+            token = ShopRefreshToken.for_user(customer.user).access_token
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+            cached_get_user = CachedJWTAuthentication.get_user
+            for path in ENDPOINTS:
+                # Stock simplejwt: the user, then the views' own lookups
+                CachedJWTAuthentication.get_user = JWTAuthentication.get_user
+                try:
+                    before = self.run(client, path, options["repeat"])
+                finally:
+                    CachedJWTAuthentication.get_user = cached_get_user
+                user_cache.clear()
+                after = self.run(client, path, options["repeat"])
+                self.report(path, before, after)
+
+    def run(self, client, path, repeat):
+        timings = []
+        # One warm-up call (which fills the user cache), then the measured ones
+        for attempt in range(repeat + 1):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = client.get(path)
+                elapsed = (time.perf_counter() - start) * 1000
+            if response.status_code != 200:
+                raise CommandError(f"GET {path} -> {response.status_code}")
+            if attempt:
+                timings.append(elapsed)
+        return {**percentiles(timings), "queries": len(queries)}
+
+    def report(self, path, before, after):
+        self.stdout.write(
+            f"{path:<26} stock: {before['queries']:>2} queries "
+            f"p50={before['p50_ms']:>6.2f}ms | cached: {after['queries']:>2} queries "
+            f"p50={after['p50_ms']:>6.2f}ms | saved "
+            f"{before['queries'] - after['queries']} round trips"
+        )
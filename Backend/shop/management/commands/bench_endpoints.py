@@ -0,0 +1,339 @@
+import json
+import math
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from shop import carts, inventory
+from shop.authentication import ShopRefreshToken
+from shop.checkout import place_order
+from shop.loadgen import LoadGenerator
+from shop.models import Cart, Category, Customer, Product
+
+from ._bench import benchmark_database, percentiles
+
+BENCHMARK_DIR = Path(settings.BASE_DIR) / "benchmarks"
+
+# Catalogue responses and the dashboard skip their caches unless --cache is
+# given, so the numbers cover the ORM and serializer work behind each route
+NO_CATALOGUE_CACHE = {
+    "CACHES": {
+        **settings.CACHES,
+        "bench": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+    },
+    "SHOP_CATALOGUE_CACHE": "bench",
+    "SHOP_DASHBOARD_TTL_SECONDS": 0,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive every API route against a generated dataset and record latency, "
+        "query count and response size; compare with a committed baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=2_000)
+        parser.add_argument("--customers", type=int, default=500)
+        parser.add_argument("--orders", type=int, default=10_000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument(
+            "--cache",
+            action="store_true",
+            help="Serve catalogue routes from the response cache",
+        )
+        parser.add_argument("--only", nargs="+", help="Run only the named endpoints")
+        parser.add_argument("--output", default=str(BENCHMARK_DIR / "latest.json"))
+        parser.add_argument(
+            "--baseline",
+            "--compare",
+            default=str(BENCHMARK_DIR / "baseline.json"),
+            help="Baseline to compare the results with",
+        )
+        parser.add_argument(
+            "--update-baseline",
+            action="store_true",
+            help="Write the results to the baseline instead of comparing",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=2.0,
+            help="Fail when p50 latency exceeds the baseline by this factor",
+        )
+
+    def handle(self, *args, **options):
+        meta = {
+            "products": options["products"],
+            "customers": options["customers"],
+            "orders": options["orders"],
+            "seed": options["seed"],
+            "repeat": options["repeat"],
+            "cache": options["cache"],
+            "vendor": connection.vendor,
+        }
+        overrides = {} if options["cache"] else NO_CATALOGUE_CACHE
+
+        with benchmark_database(), override_settings(**overrides):
+            self.stdout.write("Generating data...")
+            LoadGenerator(
+                products=options["products"],
+                customers=options["customers"],
+                orders=options["orders"],
+                seed=options["seed"],
+            ).run(log=lambda message: None)
+            self.prepare(options["repeat"])
+
+            results = {}
+            for name, method, path, data, client in self.endpoints():
+                if options["only"] and name not in options["only"]:
+                    continue
+                results[name] = self.run(method, path, data, client, options["repeat"])
+                self.report(name, results[name])
+
+        report = {"meta": meta, "endpoints": results}
+        target = (
+            options["baseline"] if options["update_baseline"] else options["output"]
+        )
+        Path(target).parent.mkdir(parents=True, exist_ok=True)
+        Path(target).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+        self.stdout.write(f"Wrote {target}")
+
+        if not options["update_baseline"]:
+            self.compare(report, options["baseline"], options["tolerance"])
+
+    def prepare(self, repeat):
+        """Pick the users, products and orders the requests refer to"""
+        self.staff = User.objects.create(username="bench-staff", is_staff=True)
+        # The busiest customer: the worst case for their order list
+        self.customer = (
+            Customer.objects.annotate(order_total=Count("orders"))
+            .order_by("-order_total")
+            .select_related("user")
+            .first()
+        )
+        self.category = Category.objects.order_by("-active_product_count").first()
+        self.product = Product.objects.filter(is_active=True).order_by("pk").first()
+        self.basket = [
+            {"product": pk, "quantity": 1}
+            for pk in Product.objects.filter(is_active=True)
+            .order_by("-stock")
+            .values_list("pk", flat=True)[:3]
+        ]
+        self.order = self.customer.orders.order_by("-created_at").first()
+        # The order export covers a week, as a periodic job would fetch it
+        self.recent = (timezone.localdate() - timedelta(days=7)).isoformat()
+        self.search = self.product.name.split()[-1]
+        # Page 50 of the list, or its last page when the dataset is smaller
+        pages = math.ceil(
+            Product.objects.filter(is_active=True).count()
+            / settings.REST_FRAMEWORK["PAGE_SIZE"]
+        )
+        self.deep_page = max(min(50, pages), 1)
+
+        # Every cancel and release call needs fresh pending orders or holds,
+        # one set per request including the warm-up call
+        self.cancellable = [
+            place_order(self.customer, self.basket, shipping_address="1 Main St").pk
+            for _ in range(repeat + 1)
+        ]
+        self.bulk_cancellable = [
+            [
+                place_order(self.customer, self.basket, shipping_address="1 Main St").pk
+                for _ in range(5)
+            ]
+            for _ in range(repeat + 1)
+        ]
+        # Held on a product outside the basket, which orders would consume
+        spare = (
+            Product.objects.filter(is_active=True)
+            .exclude(pk__in=[line["product"] for line in self.basket])
+            .order_by("-stock")
+            .first()
+        )
+        self.releasable = [
+            inventory.reserve(self.customer, {spare.pk: 1})[0].pk
+            for _ in range(repeat + 1)
+        ]
+        self.lines = {line["product"]: line["quantity"] for line in self.basket}
+        self.imported = [
+            {
+                "sku": f"BENCH-{n}",
+                "name": f"Imported product {n}",
+                "price": "9.99",
+                "stock": 10,
+                "category": self.category.name,
+            }
+            for n in range(50)
+        ]
+        self.counter = 0
+
+        self.anonymous = APIClient()
+        self.user_client = APIClient()
+        self.user_client.force_authenticate(self.customer.user)
+        self.staff_client = APIClient()
+        self.staff_client.force_authenticate(self.staff)
+
+    def endpoints(self):
+        """
+        (name, method, path, data, client) for the API's read routes and the
+        writes shoppers and staff make routinely; the catalogue's admin
+        writes (creating, editing or deleting products and categories) are
+        left out
+        """
+        product, category, order = self.product, self.category, self.order
+        user, staff, anonymous = self.user_client, self.staff_client, self.anonymous
+        return [
+            ("auth.login", "post", "/api/auth/login/", lambda: {"username": self.customer.user.username, "password": "password123"}, anonymous),
+            ("auth.register", "post", "/api/auth/register/", self.registration, anonymous),
+            ("auth.user", "get", "/api/auth/user/", None, user),
+            ("auth.refresh", "post", "/api/auth/token/refresh/", lambda: {"refresh": self.refresh_token()}, anonymous),
+            ("auth.logout", "post", "/api/auth/logout/", lambda: {"refresh_token": self.refresh_token()}, user),
+            ("categories.list", "get", "/api/categories/", None, anonymous),
+            ("categories.detail", "get", f"/api/categories/{category.pk}/", None, anonymous),
+            ("categories.products", "get", f"/api/categories/{category.pk}/products/", None, anonymous),
+            ("products.list", "get", "/api/products/", None, anonymous),
+            ("products.list.deep_page", "get", f"/api/products/?page={self.deep_page}", None, anonymous),
+            ("products.list.cursor", "get", "/api/products/?pagination=cursor", None, anonymous),
+            ("products.filter", "get", f"/api/products/?category={category.pk}&in_stock=true", None, anonymous),
+            ("products.search", "get", f"/api/products/?search={self.search}", None, anonymous),
+            ("products.detail", "get", f"/api/products/{product.pk}/", None, anonymous),
+            ("products.low_stock", "get", "/api/products/low_stock/", None, anonymous),
+            ("products.export", "get", "/api/products/export/?fmt=csv", None, staff),
+            ("products.bulk", "post", "/api/products/bulk/", lambda: self.imported, staff),
+            ("customers.profile", "get", "/api/customers/profile/", None, user),
+            ("customers.list", "get", "/api/customers/", None, staff),
+            ("orders.list", "get", "/api/orders/", None, user),
+            ("orders.list.staff", "get", "/api/orders/", None, staff),
+            ("orders.detail", "get", f"/api/orders/{order.pk}/", None, user),
+            ("orders.create", "post", "/api/orders/", lambda: {"shipping_address": "1 Main St", "items": self.basket}, user),
+            ("orders.cancel", "post", self.cancel_path, None, user),
+            ("orders.bulk_cancel", "post", "/api/orders/bulk-cancel/", lambda: {"ids": self.bulk_cancellable.pop()}, staff),
+            ("orders.export", "get", f"/api/orders/export/?fmt=ndjson&from={self.recent}", None, staff),
+            ("holds.create", "post", "/api/holds/", lambda: {"items": self.basket}, user),
+            ("holds.list", "get", "/api/holds/", None, user),
+            ("holds.release", "delete", lambda: f"/api/holds/{self.releasable.pop()}/", None, user),
+            ("cart.update", "put", "/api/cart/", lambda: {"items": self.basket}, user),
+            ("cart.add", "post", "/api/cart/", lambda: {"items": self.basket}, user),
+            ("cart.detail", "get", "/api/cart/", None, user),
+            ("cart.checkout", "post", "/api/cart/checkout/", self.fill_cart, user),
+            ("cart.clear", "delete", "/api/cart/", None, user),
+            ("analytics.dashboard", "get", "/api/analytics/dashboard/", None, staff),
+            ("analytics.top_products", "get", "/api/analytics/top-products/", None, staff),
+            ("analytics.top_customers", "get", "/api/analytics/top-customers/", None, staff),
+            ("analytics.revenue_by_category", "get", "/api/analytics/revenue-by-category/", None, staff),
+        ]  # fmt: skip
+
+    def registration(self):
+        self.counter += 1
+        return {
+            "username": f"bench-new-{self.counter}",
+            "email": f"bench-new-{self.counter}@example.com",
+            "password": "bench-password-123",
+            "password2": "bench-password-123",
+        }
+
+    def cancel_path(self):
+        return f"/api/orders/{self.cancellable.pop()}/cancel/"
+
+    def refresh_token(self):
+        return str(ShopRefreshToken.for_user(self.customer.user))
+
+    def fill_cart(self):
+        cart, _ = Cart.objects.get_or_create(customer=self.customer)
+        carts.update(cart, self.lines, replace=True)
+        return {"shipping_address": "1 Main St"}
+
+    def run(self, method, path, data, client, repeat):
+        timings = []
+        # One warm-up call, then the measured ones
+        for attempt in range(repeat + 1):
+            url = path() if callable(path) else path
+            body = data() if callable(data) else data
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                if method == "get":
+                    response = client.get(url)
+                else:
+                    response = getattr(client, method)(url, body, format="json")
+                # Exports stream; their queries run as the body is read
+                content = (
+                    b"".join(response.streaming_content)
+                    if response.streaming
+                    else response.content
+                )
+                elapsed = (time.perf_counter() - start) * 1000
+            if response.status_code >= 400:
+                raise CommandError(f"{method.upper()} {url} -> {response.status_code}")
+            if attempt:
+                timings.append(elapsed)
+        return {
+            **percentiles(timings),
+            "queries": len(queries),
+            "bytes": len(content),
+            "status": response.status_code,
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"{name:<32} p50={result['p50_ms']:>8.2f}ms p95={result['p95_ms']:>8.2f}ms "
+            f"queries={result['queries']:>3} bytes={result['bytes']:>8}"
+        )
+
+    def compare(self, report, baseline_path, tolerance):
+        try:
+            baseline = json.loads(Path(baseline_path).read_text())
+        except FileNotFoundError:
+            self.stdout.write(f"No baseline at {baseline_path}, nothing to compare")
+            return
+
+        same_scale = baseline["meta"] == report["meta"]
+        if not same_scale:
+            self.stdout.write(
+                self.style.WARNING(
+                    "Baseline was recorded with different options; "
+                    "comparing query counts only"
+                )
+            )
+
+        regressions = []
+        for name, result in report["endpoints"].items():
+            expected = baseline["endpoints"].get(name)
+            if expected is None:
+                continue
+            if result["queries"] > expected["queries"]:
+                regressions.append(
+                    f"{name}: {result['queries']} queries "
+                    f"(baseline {expected['queries']})"
+                )
+            if not same_scale:
+                continue
+            # Ignore sub-millisecond jitter on the fastest routes
+            slower = result["p50_ms"] - expected["p50_ms"]
+            if result["p50_ms"] > expected["p50_ms"] * tolerance and slower > 1:
+                regressions.append(
+                    f"{name}: p50 {result['p50_ms']:.2f}ms "
+                    f"(baseline {expected['p50_ms']:.2f}ms)"
+                )
+            if result["bytes"] > expected["bytes"] * 1.1:
+                regressions.append(
+                    f"{name}: {result['bytes']} bytes "
+                    f"(baseline {expected['bytes']})"
+                )
+
+        if regressions:
+            raise CommandError(
+                "Performance regressions against the baseline:\n  "
+                + "\n  ".join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
@@ -0,0 +1,182 @@
+import queue
+import random
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Sum
+
+from shop import inventory
+from shop.checkout import CheckoutError, place_order
+from shop.models import Category, Customer, Order, Product, StockHold
+
+from ._bench import benchmark_database, percentiles
+
+
+class Command(BaseCommand):
+    help = (
+        "Flash sale: many concurrent buyers on one product, some holding stock "
+        "first and some abandoning their holds; checks nothing is oversold"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--buyers", type=int, default=2_000)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--stock", type=int, default=100)
+        parser.add_argument(
+            "--hold-ratio",
+            type=float,
+            default=0.5,
+            help="Share of buyers who hold stock before checking out",
+        )
+        parser.add_argument(
+            "--abandon-ratio",
+            type=float,
+            default=0.3,
+            help="Share of holders who never check out",
+        )
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            product = self.seed(options["buyers"], options["stock"])
+            self.run(product, options)
+            self.verify(product, options["stock"])
+
+    def seed(self, buyers, stock):
+        category = Category.objects.create(name="Flash sale")
+        users = User.objects.bulk_create(
+            User(username=f"buyer{i}") for i in range(buyers)
+        )
+        self.customers = Customer.objects.bulk_create(
+            Customer(user=user) for user in users
+        )
+        return Product.objects.create(
+            name="Limited sneaker",
+            description="One drop only",
+            price=Decimal("150.00"),
+            stock=stock,
+            category=category,
+        )
+
+    def run(self, product, options):
+        rng = random.Random(0)
+        buyers = queue.Queue()
+        for customer in self.customers:
+            holds = rng.random() < options["hold_ratio"]
+            abandons = holds and rng.random() < options["abandon_ratio"]
+            buyers.put((customer, holds, abandons))
+
+        self.timings, self.outcomes, self.retries = [], {}, 0
+        lock = threading.Lock()
+        done = threading.Event()
+
+        def record(outcome, elapsed=None, retries=0):
+            with lock:
+                self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+                self.retries += retries
+                if elapsed is not None:
+                    self.timings.append(elapsed)
+
+        def attempt(func):
+            """Run func, retrying lock timeouts; returns (ok, retries)"""
+            retries = 0
+            while True:
+                try:
+                    func()
+                    return True, retries
+                except OperationalError:
+                    retries += 1
+                    time.sleep(random.random() / 100)
+                except (CheckoutError, inventory.InsufficientStock):
+                    return False, retries
+
+        def buy(customer):
+            place_order(
+                customer,
+                [{"product": product.pk, "quantity": 1}],
+                shipping_address="1 Main St",
+            )
+
+        def worker():
+            try:
+                while True:
+                    try:
+                        customer, holds, abandons = buyers.get_nowait()
+                    except queue.Empty:
+                        return
+                    start = time.perf_counter()
+                    if holds:
+                        # Abandoned holds expire almost at once for the sweeper
+                        ttl = timedelta(seconds=0.05 if abandons else 600)
+                        ok, retries = attempt(
+                            lambda: inventory.reserve(customer, {product.pk: 1}, ttl)
+                        )
+                        if not ok:
+                            record("sold out", retries=retries)
+                            continue
+                        if abandons:
+                            record("abandoned", retries=retries)
+                            continue
+                    else:
+                        retries = 0
+                    ok, more = attempt(lambda: buy(customer))
+                    elapsed = (time.perf_counter() - start) * 1000
+                    record("bought" if ok else "sold out", elapsed, retries + more)
+            finally:
+                connection.close()
+
+        def sweeper():
+            try:
+                while not done.is_set():
+                    try:
+                        inventory.expire_holds()
+                    except OperationalError:
+                        pass
+                    time.sleep(0.02)
+            finally:
+                connection.close()
+
+        sweep = threading.Thread(target=sweeper)
+        sweep.start()
+        workers = [
+            threading.Thread(target=worker) for _ in range(options["concurrency"])
+        ]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        done.set()
+        sweep.join()
+        inventory.expire_holds()
+
+        result = percentiles(self.timings) if self.timings else {}
+        self.stdout.write(
+            f"{options['buyers']} buyers in {elapsed:.2f}s "
+            f"({options['buyers'] / elapsed:.0f}/s), outcomes={self.outcomes}, "
+            f"lock retries={self.retries}, checkout {result}"
+        )
+
+    def verify(self, product, stock):
+        product.refresh_from_db()
+        sold = (
+            Order.objects.filter(items__product=product).aggregate(
+                units=Sum("items__quantity")
+            )["units"]
+            or 0
+        )
+        held = StockHold.objects.aggregate(units=Sum("quantity"))["units"] or 0
+        self.stdout.write(
+            f"stock {stock} -> {product.stock}, sold {sold}, "
+            f"reserved {product.reserved}, open holds {held}"
+        )
+        if sold > stock or product.stock != stock - sold or product.stock < 0:
+            raise CommandError("Oversold: stock and orders do not add up")
+        if product.reserved != held:
+            raise CommandError("Reserved units do not match the open holds")
+        self.stdout.write(self.style.SUCCESS("No oversell"))
@@ -0,0 +1,102 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.pagination import Cursor
+from rest_framework.test import APIClient
+
+from shop.loadgen import explicit_timestamps
+from shop.models import Category, Customer, Order, Product
+from shop.pagination import CreatedAtCursorPagination
+
+from ._bench import benchmark_database, measure
+
+
+class Command(BaseCommand):
+    help = "Compare shallow and deep page latency for page number and cursor pagination"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=200_000)
+        parser.add_argument("--page", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.seed(options["rows"])
+            self.run(options["page"], options["repeat"])
+
+    def seed(self, rows):
+        self.stdout.write(f"Seeding {rows} products and orders...")
+        category = Category.objects.create(name="Benchmark")
+        user = User.objects.create(username="bench")
+        customer = Customer.objects.create(user=user)
+        now = timezone.now()
+
+        with explicit_timestamps(Product, Order):
+            Product.objects.bulk_create(
+                (
+                    Product(
+                        name=f"Product {i}",
+                        description="Benchmark product",
+                        price=Decimal("9.99"),
+                        stock=100,
+                        category=category,
+                        created_at=now - timedelta(seconds=i),
+                    )
+                    for i in range(rows)
+                ),
+                batch_size=5000,
+            )
+            Order.objects.bulk_create(
+                (
+                    Order(
+                        customer=customer,
+                        shipping_address="1 Main St",
+                        created_at=now - timedelta(seconds=i),
+                    )
+                    for i in range(rows)
+                ),
+                batch_size=5000,
+            )
+
+        user.is_staff = True
+        user.save()
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def deep_cursor(self, model, offset):
+        """Build the cursor a client would hold after paging to offset"""
+        created_at = model.objects.order_by("-created_at", "-id").values_list(
+            "created_at", flat=True
+        )[offset - 1]
+        paginator = CreatedAtCursorPagination()
+        paginator.base_url = "/"
+        paginator.cursor_query_param = "cursor"
+        cursor = Cursor(offset=0, reverse=False, position=str(created_at))
+        return paginator.encode_cursor(cursor).split("cursor=")[1]
+
+    def run(self, page, repeat):
+        page_size = CreatedAtCursorPagination.page_size
+        for name, model, url in [
+            ("products", Product, "/api/products/"),
+            ("orders", Order, "/api/orders/"),
+        ]:
+            cursor = self.deep_cursor(model, (page - 1) * page_size)
+            cases = [
+                ("page 1 (offset)", f"{url}?page=1"),
+                (f"page {page} (offset)", f"{url}?page={page}"),
+                ("page 1 (cursor)", f"{url}?pagination=cursor"),
+                (f"page {page} (cursor)", f"{url}?cursor={cursor}"),
+            ]
+            for label, path in cases:
+                result = measure(lambda: self.get(path), repeat)
+                self.stdout.write(
+                    f"{name:<9} {label:<22} "
+                    f"p50={result['p50_ms']:>8.2f}ms p95={result['p95_ms']:>8.2f}ms"
+                )
+
+    def get(self, path):
+        response = self.client.get(path)
+        assert response.status_code == 200, response.status_code
@@ -0,0 +1,153 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from shop.loadgen import LoadGenerator
+from shop.passwords import HashingPool
+
+from ._bench import benchmark_database, percentiles
+from .bench_endpoints import NO_CATALOGUE_CACHE
+
+
+class Command(BaseCommand):
+    help = (
+        "Signup burst: registrations/sec of one worker, and the latency of "
+        "catalogue reads served alongside, with passwords hashed inline "
+        "and in the hashing pool"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--signups", type=int, default=64)
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=8,
+            help="Request threads of the worker, as in gunicorn --threads",
+        )
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--queue-size", type=int, default=8)
+        parser.add_argument("--nice", type=int, default=10)
+        parser.add_argument("--iterations", type=int, default=1_000_000)
+        parser.add_argument(
+            "--read-rate",
+            type=float,
+            default=20,
+            help="Catalogue reads per second served during the burst",
+        )
+
+    def handle(self, *args, **options):
+        overrides = {
+            **NO_CATALOGUE_CACHE,
+            "SHOP_PASSWORD_ITERATIONS": options["iterations"],
+        }
+        with benchmark_database(), override_settings(**overrides):
+            LoadGenerator(products=500, orders=0, seed=42).run(log=lambda message: None)
+            pools = [
+                ("inline", HashingPool(workers=0, queue_size=1, nice=0)),
+                (
+                    "pool",
+                    HashingPool(
+                        workers=options["workers"],
+                        queue_size=options["queue_size"],
+                        nice=options["nice"],
+                    ),
+                ),
+            ]
+            for name, pool in pools:
+                # Start the workers before the clock does
+                pool.run(abs, 0)
+                with mock.patch("shop.passwords.hashing_pool", pool):
+                    self.report(name, self.run(name, options))
+                pool.shutdown()
+
+    def run(self, name, options):
+        signups = queue.Queue()
+        for n in range(options["signups"]):
+            signups.put(f"{name}-{n}")
+        statuses, reads = {}, []
+        lock = threading.Lock()
+        done = threading.Event()
+
+        def register(username):
+            for attempt in itertools.count():
+                # A retry may follow a half-done registration; use a new name
+                name = f"{username}-{attempt}"
+                try:
+                    return APIClient().post(
+                        "/api/auth/register/",
+                        {
+                            "username": name,
+                            "email": f"{name}@example.com",
+                            "password": "Campaign-2026!",
+                            "password2": "Campaign-2026!",
+                        },
+                        format="json",
+                    )
+                except OperationalError:
+                    time.sleep(0.01)
+
+        def signup_worker():
+            try:
+                while True:
+                    try:
+                        username = signups.get_nowait()
+                    except queue.Empty:
+                        return
+                    status = register(username).status_code
+                    with lock:
+                        statuses[status] = statuses.get(status, 0) + 1
+            finally:
+                connection.close()
+
+        def catalogue_reader():
+            client = APIClient()
+            interval = 1 / options["read_rate"]
+            try:
+                while not done.wait(interval):
+                    start = time.perf_counter()
+                    response = client.get("/api/products/")
+                    reads.append((time.perf_counter() - start) * 1000)
+                    if response.status_code != 200:
+                        raise CommandError(
+                            f"GET /api/products/ -> {response.status_code}"
+                        )
+            finally:
+                connection.close()
+
+        # SQLite's table locks fail some requests, which are retried
+        logging.getLogger("django.request").disabled = True
+        reader = threading.Thread(target=catalogue_reader)
+        reader.start()
+        workers = [
+            threading.Thread(target=signup_worker) for _ in range(options["threads"])
+        ]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        done.set()
+        reader.join()
+        logging.getLogger("django.request").disabled = False
+        return {
+            "elapsed": elapsed,
+            "statuses": statuses,
+            "reads": percentiles(reads) if reads else {},
+        }
+
+    def report(self, name, result):
+        registered = result["statuses"].get(201, 0)
+        self.stdout.write(
+            f"{name:<7} {registered} registered in {result['elapsed']:.2f}s "
+            f"({registered / result['elapsed']:.1f}/s), statuses={result['statuses']}"
+            f" | catalogue during the burst {result['reads']}"
+        )
@@ -0,0 +1,74 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.models import F, Sum
+from rest_framework.test import APIClient
+
+from shop import rollups
+from shop.loadgen import LoadGenerator
+from shop.models import Category, OrderItem
+from shop.views import REVENUE_STATUSES
+
+from ._bench import benchmark_database, measure
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare revenue_by_category served from rollups with a live "
+        "SUM(quantity * price) as the order item history grows"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[10_000, 100_000, 1_000_000],
+            help="Order item counts to measure at",
+        )
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.client = APIClient()
+            self.client.force_authenticate(User(username="bench", is_staff=True))
+
+            items = 0
+            for size in sorted(options["sizes"]):
+                # The first size brings the catalogue, later ones only orders
+                LoadGenerator(
+                    products=0 if items else 1000,
+                    customers=0 if items else 200,
+                    orders=(size - items) // 3,
+                    seed=size,
+                ).run(log=lambda message: None)
+                items = OrderItem.objects.count()
+
+                rebuild = measure(rollups.rebuild, 1)
+                rollup = measure(self.rollup_endpoint, options["repeat"])
+                live = measure(self.live_query, options["repeat"])
+                self.stdout.write(
+                    f"{items:>10} items  rebuild={rebuild['p50_ms']:>10.1f}ms  "
+                    f"rollup p50={rollup['p50_ms']:>8.2f}ms p95={rollup['p95_ms']:>8.2f}ms  "
+                    f"live p50={live['p50_ms']:>9.2f}ms p95={live['p95_ms']:>9.2f}ms"
+                )
+
+    def rollup_endpoint(self):
+        response = self.client.get(
+            "/api/analytics/revenue-by-category/",
+            {"from": "2000-01-01", "to": "2100-01-01"},
+        )
+        assert response.status_code == 200, response.status_code
+
+    def live_query(self):
+        list(
+            Category.objects.filter(
+                products__order_items__order__status__in=REVENUE_STATUSES
+            )
+            .annotate(
+                total_revenue=Sum(
+                    F("products__order_items__quantity")
+                    * F("products__order_items__price")
+                )
+            )
+            .values_list("id", "total_revenue")
+        )
@@ -0,0 +1,108 @@
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from rest_framework_simplejwt.views import TokenRefreshView
+
+from shop.authentication import ShopRefreshToken
+from shop.blacklist import purge_expired, token_blacklist
+
+from ._bench import benchmark_database, percentiles
+
+STOCK_SERIALIZER = "rest_framework_simplejwt.serializers.TokenRefreshSerializer"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure token refreshes against a blacklist grown by years of "
+        "rotation, with simplejwt's table lookup and with the shop filter, "
+        "then after purging the expired tokens"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tokens",
+            type=int,
+            default=200_000,
+            help="Blacklisted tokens to seed, nine in ten of them expired",
+        )
+        parser.add_argument("--repeat", type=int, default=200)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            user = User.objects.create(username="bench-refresh")
+            self.seed(user, options["tokens"])
+
+            # simplejwt's own serializer checks the blacklist table
+            shop_serializer = TokenRefreshView._serializer_class
+            TokenRefreshView._serializer_class = STOCK_SERIALIZER
+            try:
+                self.report("stock", self.run(user, options["repeat"]))
+            finally:
+                TokenRefreshView._serializer_class = shop_serializer
+            token_blacklist.clear()
+            self.report("filter", self.run(user, options["repeat"]))
+
+            start = time.perf_counter()
+            purged = purge_expired()
+            self.stdout.write(
+                f"purged {purged} expired tokens in "
+                f"{time.perf_counter() - start:.1f}s, "
+                f"{BlacklistedToken.objects.count()} blacklisted left"
+            )
+            token_blacklist.clear()
+            self.report("filter+purge", self.run(user, options["repeat"]))
+
+    def seed(self, user, count):
+        now = timezone.now()
+        for start in range(0, count, 10_000):
+            tokens = OutstandingToken.objects.bulk_create(
+                OutstandingToken(
+                    user=user,
+                    jti=uuid.uuid4().hex,
+                    token="",
+                    created_at=now - timedelta(days=8),
+                    # One token in ten is still live
+                    expires_at=now + timedelta(days=-1 if n % 10 else 1),
+                )
+                for n in range(start, min(start + 10_000, count))
+            )
+            BlacklistedToken.objects.bulk_create(
+                BlacklistedToken(token=token) for token in tokens
+            )
+
+    def run(self, user, repeat):
+        """Rotate one refresh token repeat times, as a client would"""
+        client = APIClient()
+        refresh = str(ShopRefreshToken.for_user(user))
+        timings = []
+        # One warm-up refresh (which builds the filter), then the measured ones
+        for attempt in range(repeat + 1):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = client.post(
+                    "/api/auth/token/refresh/", {"refresh": refresh}, format="json"
+                )
+                elapsed = (time.perf_counter() - start) * 1000
+            if response.status_code != 200:
+                raise CommandError(f"refresh -> {response.status_code}")
+            refresh = response.data["refresh"]
+            if attempt:
+                timings.append(elapsed)
+        return {**percentiles(timings), "queries": len(queries)}
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"{name:<13} {result['queries']:>2} queries "
+            f"p50={result['p50_ms']:>6.2f}ms p95={result['p95_ms']:>6.2f}ms"
+        )
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop import inventory
+
+
+class Command(BaseCommand):
+    help = "Release stock holds that have expired"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop", action="store_true", help="Keep sweeping until interrupted"
+        )
+        parser.add_argument(
+            "--interval", type=float, default=30, help="Seconds between sweeps"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=inventory.SWEEP_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            swept = inventory.expire_holds(batch_size=options["batch_size"])
+            if swept or not options["loop"]:
+                self.stdout.write(f"Released {swept} expired holds")
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
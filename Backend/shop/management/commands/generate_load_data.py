@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.loadgen import LoadGenerator
+
+
+class Command(BaseCommand):
+    help = "Bulk-generate a deterministic catalogue and order history for load tests"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--categories", type=int, default=20)
+        parser.add_argument("--products", type=int, default=10_000)
+        parser.add_argument("--customers", type=int, default=5_000)
+        parser.add_argument("--orders", type=int, default=50_000)
+        parser.add_argument(
+            "--max-items", type=int, default=5, help="Most lines in one order"
+        )
+        parser.add_argument(
+            "--days", type=int, default=365, help="Spread orders over this many days"
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=5_000)
+        parser.add_argument(
+            "--zipf",
+            type=float,
+            default=1.1,
+            help="Exponent of the product popularity distribution",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=1, help="Generate chunks in N processes"
+        )
+        parser.add_argument(
+            "--password", default="password123", help="Password of every new user"
+        )
+
+    def handle(self, *args, **options):
+        if options["categories"] < 1:
+            raise CommandError("At least one category is required.")
+        if options["max_items"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--max-items and --batch-size must be positive.")
+
+        generator = LoadGenerator(
+            categories=options["categories"],
+            products=options["products"],
+            customers=options["customers"],
+            orders=options["orders"],
+            max_items=options["max_items"],
+            days=options["days"],
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            zipf=options["zipf"],
+            password=options["password"],
+        )
+        start = time.perf_counter()
+        try:
+            generator.run(workers=options["workers"], log=self.stdout.write)
+        except ValueError as exc:
+            # random.choices over an empty catalogue or customer list
+            raise CommandError(f"Cannot generate orders: {exc}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated load data in {time.perf_counter() - start:.1f}s"
+            )
+        )
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from shop import cache
+from shop.models import Product
+from shop.storage import is_hashed
+
+
+class Command(BaseCommand):
+    help = (
+        "Move product images saved under their upload names to "
+        "content-addressed names; the old files are left in place"
+    )
+
+    def handle(self, *args, **options):
+        storage = Product._meta.get_field("image").storage
+        products = Product.objects.exclude(image="").exclude(image=None)
+        moved = []
+        for product in products.only("pk", "image").iterator():
+            name = product.image.name
+            if is_hashed(name):
+                continue
+            try:
+                with storage.open(name) as file:
+                    hashed = storage.save(name, file)
+            except FileNotFoundError:
+                self.stderr.write(f"Product {product.pk}: {name} is missing")
+                continue
+            # The variants are remade from the moved image by image_variants
+            if Product.objects.filter(pk=product.pk, image=name).update(
+                image=hashed, image_variants={}
+            ):
+                moved.append(product.pk)
+
+        if moved:
+            cache.invalidate_products(moved)
+        self.stdout.write(
+            f"Moved {len(moved)} product images; run image_variants to remake "
+            "their variants"
+        )
@@ -0,0 +1,68 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+
+from shop import images
+from shop.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the resized variants of product images: those still "
+        "missing, or with --all every image, across --processes processes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all", action="store_true", help="Regenerate every product image"
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep generating new images' variants until interrupted",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=5, help="Seconds between looks"
+        )
+        parser.add_argument("--processes", type=int, default=1)
+        parser.add_argument("--batch-size", type=int, default=50)
+
+    def handle(self, *args, **options):
+        if options["all"]:
+            products = Product.objects.exclude(image="").exclude(image=None)
+            self.generate(products, options)
+            return
+        while True:
+            generated = self.generate(images.pending(), options)
+            if not options["loop"]:
+                return
+            if not generated:
+                time.sleep(options["interval"])
+
+    def generate(self, products, options):
+        ids = list(products.order_by("pk").values_list("pk", flat=True))
+        size = options["batch_size"]
+        batches = [ids[start : start + size] for start in range(0, len(ids), size)]
+        if not batches:
+            if not options["loop"]:
+                self.stdout.write("No product images to process")
+            return 0
+
+        start = time.perf_counter()
+        if options["processes"] > 1:
+            with ProcessPoolExecutor(
+                options["processes"],
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=django.setup,
+            ) as pool:
+                generated = sum(pool.map(images.generate_for, batches))
+        else:
+            generated = sum(images.generate_for(batch) for batch in batches)
+        self.stdout.write(
+            f"Generated variants for {generated} of {len(ids)} product images "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+        return generated
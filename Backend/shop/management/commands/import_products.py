@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.imports import BATCH_SIZE, import_products, read_rows
+
+
+class Command(BaseCommand):
+    help = "Upsert products by SKU from a CSV or NDJSON file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--format",
+            dest="file_format",
+            choices=["csv", "ndjson"],
+            help="File format (default: guessed from the extension)",
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--show-errors",
+            type=int,
+            default=20,
+            help="Number of row errors to print",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["file_format"] or (
+            "ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv"
+        )
+        try:
+            stream = open(path, encoding="utf-8-sig", newline="")
+        except OSError as exc:
+            raise CommandError(exc)
+
+        with stream:
+            report = import_products(
+                read_rows(stream, file_format), batch_size=options["batch_size"]
+            )
+
+        for error in report["errors"][: options["show_errors"]]:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {report['created']}, updated {report['updated']}, "
+                f"{len(report['errors'])} rows rejected"
+            )
+        )
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop import blacklist
+
+
+class Command(BaseCommand):
+    help = "Delete outstanding and blacklisted refresh tokens past their expiry"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop", action="store_true", help="Keep purging until interrupted"
+        )
+        parser.add_argument(
+            "--interval", type=float, default=60 * 60, help="Seconds between purges"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=blacklist.PURGE_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            purged = blacklist.purge_expired(batch_size=options["batch_size"])
+            if purged or not options["loop"]:
+                self.stdout.write(f"Deleted {purged} expired tokens")
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from shop import rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales rollup tables from the order history"
+
+    def handle(self, *args, **options):
+        rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS("Rebuilt sales rollups"))
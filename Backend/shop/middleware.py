@@ -0,0 +1,159 @@
+"""
+Opt-in per-request profiling.
+
+``ProfilingMiddleware`` is inert unless ``SHOP_PROFILING_ENABLED`` is set.
+For a sampled request it records the SQL count and time (grouping
+repeated statements into N+1 candidates), authentication and rendering
+time and the response size; the rest of the time is reported as ``app``
+(view code and serializers). It reports them in a ``Server-Timing``
+header and, for requests over the configured thresholds, in a JSON log
+line on the ``shop.profiling`` logger.
+"""
+
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger("shop.profiling")
+
+_current = ContextVar("shop_profile", default=None)
+
+# Runs of placeholders from IN (...) lists of different lengths
+PLACEHOLDER_RUN = re.compile(r"%s(?:\s*,\s*%s)+")
+
+
+def sql_signature(sql):
+    return PLACEHOLDER_RUN.sub("%s, ...", sql)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sections = Counter()
+        self.queries = Counter()
+        self.query_count = 0
+        self.render_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        """Execute wrapper timing every query on the wrapped connections"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sections["db"] += time.perf_counter() - start
+            self.query_count += 1
+            self.queries[sql_signature(sql)] += 1
+
+    def duplicates(self, threshold):
+        return [
+            {"sql": sql, "count": count}
+            for sql, count in self.queries.most_common(5)
+            if count >= threshold
+        ]
+
+
+@contextmanager
+def profile_section(name):
+    """Add the time spent in the block to the current request's profile"""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.sections[name] += time.perf_counter() - start
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, "SHOP_PROFILING_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "SHOP_PROFILING_SAMPLE_RATE", 1.0)
+        self.slow_ms = getattr(settings, "SHOP_PROFILING_SLOW_MS", 500)
+        self.max_queries = getattr(settings, "SHOP_PROFILING_MAX_QUERIES", 50)
+        self.duplicate_threshold = getattr(
+            settings, "SHOP_PROFILING_DUPLICATE_THRESHOLD", 5
+        )
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        request.shop_profile = profile
+        token = _current.set(profile)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        self.report(request, response, profile)
+        return response
+
+    def process_template_response(self, request, response):
+        # Called right before the handler renders a DRF/template response
+        profile = getattr(request, "shop_profile", None)
+        if profile is not None:
+            profile.render_started = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: self.rendered(profile, rendered)
+            )
+        return response
+
+    def rendered(self, profile, response):
+        profile.sections["render"] += time.perf_counter() - profile.render_started
+
+    def report(self, request, response, profile):
+        total_ms = (time.perf_counter() - profile.started) * 1000
+        timings = {name: seconds * 1000 for name, seconds in profile.sections.items()}
+        duplicates = profile.duplicates(self.duplicate_threshold)
+        size = None if response.streaming else len(response.content)
+
+        metrics = [
+            f'db;dur={timings.get("db", 0):.1f};desc="{profile.query_count} queries"'
+        ]
+        metrics += [
+            f"{name};dur={ms:.1f}"
+            for name, ms in sorted(timings.items())
+            if name != "db"
+        ]
+        # Whatever is left: view code, serializers, other middleware
+        app_ms = total_ms - sum(timings.values())
+        metrics.append(f"app;dur={app_ms:.1f}")
+        metrics.append(f"total;dur={total_ms:.1f}")
+        response["Server-Timing"] = ", ".join(metrics)
+
+        if (
+            total_ms >= self.slow_ms
+            or profile.query_count >= self.max_queries
+            or duplicates
+        ):
+            logger.warning(
+                json.dumps(
+                    {
+                        "method": request.method,
+                        "path": request.path,
+                        "status": response.status_code,
+                        "total_ms": round(total_ms, 2),
+                        **{f"{k}_ms": round(v, 2) for k, v in sorted(timings.items())},
+                        "queries": profile.query_count,
+                        "duplicates": duplicates,
+                        "bytes": size,
+                    }
+                )
+            )
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:42
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_active_products(apps, schema_editor):
+    Category = apps.get_model("shop", "Category")
+    Product = apps.get_model("shop", "Product")
+    active_count = (
+        Product.objects.filter(category=OuterRef("pk"), is_active=True)
+        .order_by()
+        .values("category")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    Category.objects.update(active_product_count=Coalesce(Subquery(active_count), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="active_product_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_active_products, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+from shop.search import (
+    POSTGRES_DROP_SQL,
+    POSTGRES_INDEX_SQL,
+    SQLITE_FTS_DROP_SQL,
+    SQLITE_FTS_SQL,
+)
+
+FORWARD_SQL = {"sqlite": SQLITE_FTS_SQL, "postgresql": POSTGRES_INDEX_SQL}
+BACKWARD_SQL = {"sqlite": SQLITE_FTS_DROP_SQL, "postgresql": POSTGRES_DROP_SQL}
+
+
+def run_vendor_sql(statements):
+    def run(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0003_created_at_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(run_vendor_sql(FORWARD_SQL), run_vendor_sql(BACKWARD_SQL)),
+    ]
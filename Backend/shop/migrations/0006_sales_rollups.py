@@ -0,0 +1,203 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+from shop.rollups import insert_from_select
+
+
+def rebuild_rollups(apps, schema_editor):
+    # rollups.rebuild for the models as of this migration; order items get
+    # their own category in 0011, until then it is the product's
+    Order = apps.get_model("shop", "Order")
+    OrderItem = apps.get_model("shop", "OrderItem")
+    item_totals = OrderItem.objects.annotate(
+        day=TruncDate("order__created_at")
+    ).order_by()
+    sales = {"units": Sum("quantity"), "sales": Sum(F("quantity") * F("price"))}
+
+    for name, fields, rows in [
+        (
+            "ProductSalesRollup",
+            ["day", "product_id", "status", "quantity", "revenue"],
+            item_totals.values("day", "product_id", "order__status")
+            .annotate(**sales)
+            .values_list("day", "product_id", "order__status", "units", "sales"),
+        ),
+        (
+            "CategorySalesRollup",
+            ["day", "category_id", "status", "quantity", "revenue"],
+            item_totals.values("day", "product__category_id", "order__status")
+            .annotate(**sales)
+            .values_list(
+                "day", "product__category_id", "order__status", "units", "sales"
+            ),
+        ),
+        (
+            "CustomerSalesRollup",
+            ["day", "customer_id", "status", "order_count", "total_spent"],
+            Order.objects.annotate(day=TruncDate("created_at"))
+            .order_by()
+            .values("day", "customer_id", "status")
+            .annotate(orders=Count("pk"), spent=Sum("total_amount"))
+            .values_list("day", "customer_id", "status", "orders", "spent"),
+        ),
+    ]:
+        insert_from_select(apps.get_model("shop", name), fields, rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0005_query_shape_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CategorySalesRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("processing", "Processing"),
+                            ("shipped", "Shipped"),
+                            ("delivered", "Delivered"),
+                            ("cancelled", "Cancelled"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("quantity", models.BigIntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "category",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="sales_rollups",
+                        to="shop.category",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("day", "category", "status"), name="category_rollup_key"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="CustomerSalesRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("processing", "Processing"),
+                            ("shipped", "Shipped"),
+                            ("delivered", "Delivered"),
+                            ("cancelled", "Cancelled"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("order_count", models.BigIntegerField(default=0)),
+                (
+                    "total_spent",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "customer",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="sales_rollups",
+                        to="shop.customer",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("day", "customer", "status"), name="customer_rollup_key"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="ProductSalesRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("processing", "Processing"),
+                            ("shipped", "Shipped"),
+                            ("delivered", "Delivered"),
+                            ("cancelled", "Cancelled"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("quantity", models.BigIntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="sales_rollups",
+                        to="shop.product",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("day", "product", "status"), name="product_rollup_key"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(rebuild_rollups, migrations.RunPython.noop),
+    ]
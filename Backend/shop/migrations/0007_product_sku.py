@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:59
+
+from django.db import migrations, models
+
+from shop.search import restore_sqlite_index
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0006_sales_rollups"),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_sqlite_index),
+        migrations.AddField(
+            model_name="product",
+            name="sku",
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(restore_sqlite_index, migrations.RunPython.noop),
+    ]
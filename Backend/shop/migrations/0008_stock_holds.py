@@ -0,0 +1,69 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:11
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+from shop.search import restore_sqlite_index
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0007_product_sku"),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_sqlite_index),
+        migrations.AddField(
+            model_name="product",
+            name="reserved",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(restore_sqlite_index, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name="StockHold",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "quantity",
+                    models.PositiveIntegerField(
+                        validators=[django.core.validators.MinValueValidator(1)]
+                    ),
+                ),
+                ("expires_at", models.DateTimeField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "customer",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_holds",
+                        to="shop.customer",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="holds",
+                        to="shop.product",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["expires_at"], name="stockhold_expires_idx")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:40
+
+from django.db import migrations, models
+
+from shop.search import restore_sqlite_index
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0009_carts"),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_sqlite_index),
+        migrations.AddField(
+            model_name="product",
+            name="image_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(restore_sqlite_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def record_item_categories(apps, schema_editor):
+    # The category at order time is not known for existing items; take the
+    # product's current one, which is what the rollups were built from
+    OrderItem = apps.get_model("shop", "OrderItem")
+    Product = apps.get_model("shop", "Product")
+    OrderItem.objects.update(
+        category_id=Subquery(
+            Product.objects.filter(pk=OuterRef("product_id")).values("category_id")
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0010_product_image_variants"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="orderitem",
+            name="category",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="order_items",
+                to="shop.category",
+            ),
+        ),
+        migrations.RunPython(record_item_categories, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,17 @@
+import uuid
 from decimal import Decimal
 
 from django.contrib.auth.models import User
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models.functions import Coalesce
 
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
+    # Number of active products, maintained by shop.signals
+    active_product_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -17,8 +21,32 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def refresh_product_counts(cls, category_ids=None):
+        """
+        Recount active products for the given categories (all if None).
+
+        The product signals keep the counts current for saves and deletes;
+        writes that bypass them, such as bulk_create, call this afterwards.
+        """
+        active_count = (
+            Product.objects.filter(category=models.OuterRef("pk"), is_active=True)
+            .order_by()
+            .values("category")
+            .annotate(count=models.Count("pk"))
+            .values("count")
+        )
+        queryset = cls.objects.all()
+        if category_ids is not None:
+            queryset = queryset.filter(pk__in=category_ids)
+        return queryset.update(
+            active_product_count=Coalesce(models.Subquery(active_count), 0)
+        )
+
 
 class Product(models.Model):
+    # Stable external identifier used by catalogue imports
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     name = models.CharField(max_length=200)
     description = models.TextField()
     price = models.DecimalField(
@@ -26,23 +54,56 @@ class Product(models.Model):
     )
 
     stock = models.IntegerField(default=0, validators=[MinValueValidator(0)])
+    # Units held by active StockHolds, maintained by shop.inventory
+    reserved = models.PositiveIntegerField(default=0, editable=False)
     category = models.ForeignKey(
         Category, on_delete=models.CASCADE, related_name="products"
     )
     image = models.ImageField(upload_to="products/", blank=True, null=True)
+    # Resized copies of image, written by shop.images; empty until generated
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Storefront listing and cursor pagination (active products only)
+            models.Index(
+                fields=["-created_at", "-id"],
+                condition=models.Q(is_active=True),
+                name="product_active_created_idx",
+            ),
+            # Category and in-stock filters
+            models.Index(
+                fields=["category", "stock"],
+                condition=models.Q(is_active=True),
+                name="product_active_category_idx",
+            ),
+            # low_stock
+            models.Index(fields=["stock"], name="product_stock_idx"),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded state so signals can tell what changed
+        instance._loaded_category_id = instance.__dict__.get("category_id")
+        instance._loaded_is_active = instance.__dict__.get("is_active")
+        return instance
+
+    @property
+    def available(self):
+        """Units that can still be held or bought"""
+        return max(self.stock - self.reserved, 0)
+
     @property
     def is_in_stock(self):
-        return self.stock > 0
+        return self.available > 0
 
 
 class Customer(models.Model):
@@ -63,6 +124,16 @@ class Customer(models.Model):
         return f"{self.user.first_name} {self.user.last_name}"
 
 
+class OrderQuerySet(models.QuerySet):
+    def with_details(self):
+        """Load everything OrderDetailSerializer renders, whatever the line count"""
+        return self.select_related("customer__user").prefetch_related(
+            models.Prefetch(
+                "items", queryset=OrderItem.objects.select_related("product")
+            )
+        )
+
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ("pending", "Pending"),
@@ -82,12 +153,30 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="order_created_idx"),
+            # A customer's own order history
+            models.Index(
+                fields=["customer", "-created_at", "-id"],
+                name="order_customer_created_idx",
+            ),
+            models.Index(fields=["status"], name="order_status_idx"),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} - {self.customer.user.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded status so signals can move sales rollups
+        instance._loaded_status = instance.__dict__.get("status")
+        return instance
+
     def calculate_total(self):
         """Calculate total amount from order items"""
         total = sum(item.subtotal for item in self.items.all())
@@ -101,6 +190,15 @@ class OrderItem(models.Model):
     product = models.ForeignKey(
         Product, on_delete=models.CASCADE, related_name="order_items"
     )
+    # The product's category when ordered; sales rollups are booked against it
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="order_items",
+    )
     quantity = models.IntegerField(validators=[MinValueValidator(1)])
     price = models.DecimalField(max_digits=10, decimal_places=2)
 
@@ -118,4 +216,134 @@ class OrderItem(models.Model):
         # Automatically set price from product if not set
         if not self.price:
             self.price = self.product.price
+        if self.category_id is None:
+            self.category_id = self.product.category_id
         super().save(*args, **kwargs)
+
+
+class StockHold(models.Model):
+    """Stock set aside for a customer until it is bought or expires"""
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="holds")
+    customer = models.ForeignKey(
+        Customer,
+        on_delete=models.CASCADE,
+        related_name="stock_holds",
+        null=True,
+        blank=True,
+    )
+    quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # expire_holds sweeps in expiry order
+            models.Index(fields=["expires_at"], name="stockhold_expires_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} until {self.expires_at}"
+
+
+class Cart(models.Model):
+    """
+    A server-side shopping cart.
+
+    Guest carts have no customer and are addressed by their token; they are
+    merged into the customer's cart once the shopper signs in (shop.carts).
+    """
+
+    customer = models.OneToOneField(
+        Customer,
+        on_delete=models.CASCADE,
+        related_name="cart",
+        null=True,
+        blank=True,
+    )
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Cart {self.pk} - {self.customer or 'guest'}"
+
+
+class CartItem(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="items")
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="cart_items"
+    )
+    quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    added_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["cart", "product"], name="cartitem_cart_product"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id}"
+
+
+# Sales rollups, maintained incrementally by shop.rollups
+class ProductSalesRollup(models.Model):
+    day = models.DateField()
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="sales_rollups"
+    )
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    quantity = models.BigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "product", "status"], name="product_rollup_key"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.product_id} {self.status}"
+
+
+class CategorySalesRollup(models.Model):
+    day = models.DateField()
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, related_name="sales_rollups"
+    )
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    quantity = models.BigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "category", "status"], name="category_rollup_key"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.category_id} {self.status}"
+
+
+class CustomerSalesRollup(models.Model):
+    day = models.DateField()
+    customer = models.ForeignKey(
+        Customer, on_delete=models.CASCADE, related_name="sales_rollups"
+    )
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    order_count = models.BigIntegerField(default=0)
+    total_spent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "customer", "status"], name="customer_rollup_key"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.customer_id} {self.status}"
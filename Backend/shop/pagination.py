@@ -0,0 +1,57 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """Keyset pagination over (-created_at, -id), served by a composite index"""
+
+    ordering = ("-created_at", "-id")
+
+
+class OptionalCursorPagination(PageNumberPagination):
+    """
+    Page number pagination that switches to keyset pagination on request.
+
+    Clients opt in with ``?pagination=cursor`` and then follow the
+    ``next``/``previous`` links, which carry a ``cursor`` parameter. Cursor
+    pages cost the same at any depth and skip the ``COUNT(*)`` query.
+    """
+
+    mode_query_param = "pagination"
+    cursor_class = CreatedAtCursorPagination
+
+    def __init__(self):
+        self.cursor_paginator = None
+        self._display_page_controls = False
+
+    def wants_cursor(self, request):
+        params = request.query_params
+        return (
+            params.get(self.mode_query_param) == "cursor"
+            or self.cursor_class.cursor_query_param in params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.wants_cursor(request):
+            self.cursor_paginator = self.cursor_class()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.to_html()
+        return super().to_html()
+
+    @property
+    def display_page_controls(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.display_page_controls
+        return self._display_page_controls
+
+    @display_page_controls.setter
+    def display_page_controls(self, value):
+        self._display_page_controls = value
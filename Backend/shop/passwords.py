@@ -0,0 +1,114 @@
+"""
+Password hashing off the request thread.
+
+``PooledPBKDF2PasswordHasher`` is Django's PBKDF2 hasher with its cost
+taken from ``SHOP_PASSWORD_ITERATIONS`` and its key derivation run in a
+small pool of worker processes (``hashing_pool``). Every password Django
+hashes or checks goes through it: registration's ``create_user``, login
+through ``ModelBackend``, password changes.
+
+The pool accepts at most ``SHOP_PASSWORD_QUEUE_SIZE`` jobs at once and
+refuses the rest with ``PasswordHashingBusy``, a 503 to DRF views, so a
+signup burst waits outside rather than holding every request thread.
+Its workers run at a lower priority (``SHOP_PASSWORD_NICE``) so the
+catalogue keeps the CPU it needs. With ``SHOP_PASSWORD_WORKERS = 0``
+hashing runs inline as before.
+"""
+
+import base64
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.utils.crypto import pbkdf2
+from django.utils.encoding import force_str
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PasswordHashingBusy(APIException):
+    """Raised when the hashing pool has no room for another password"""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many sign-ins right now, please try again shortly."
+    default_code = "password_hashing_busy"
+    # Sent as Retry-After by DRF's exception handler
+    wait = 1
+
+
+def lower_priority(nice):
+    if nice:
+        os.nice(nice)
+
+
+class HashingPool:
+    """Bounded pool of worker processes that run CPU-heavy functions"""
+
+    def __init__(self, workers, queue_size, nice):
+        self.workers = workers
+        self.nice = nice
+        self.slots = threading.BoundedSemaphore(max(queue_size, 1))
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(
+                    self.workers,
+                    # Forking a threaded server process is unsafe
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=lower_priority,
+                    initargs=(self.nice,),
+                )
+            return self.executor
+
+    def run(self, func, *args):
+        """Return func(*args) computed by a worker; raises PasswordHashingBusy"""
+        if self.workers <= 0:
+            return func(*args)
+        if not self.slots.acquire(blocking=False):
+            raise PasswordHashingBusy()
+        try:
+            executor = self.get_executor()
+            try:
+                return executor.submit(func, *args).result()
+            except BrokenProcessPool as e:
+                self.shutdown(executor)
+                raise PasswordHashingBusy() from e
+        finally:
+            self.slots.release()
+
+    def shutdown(self, executor=None):
+        with self.lock:
+            if self.executor is not None and executor in (None, self.executor):
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
+
+
+hashing_pool = HashingPool(
+    workers=getattr(settings, "SHOP_PASSWORD_WORKERS", 0),
+    queue_size=getattr(settings, "SHOP_PASSWORD_QUEUE_SIZE", 8),
+    nice=getattr(settings, "SHOP_PASSWORD_NICE", 0),
+)
+
+
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 of tunable cost, derived in ``hashing_pool``"""
+
+    @property
+    def iterations(self):
+        return getattr(settings, "SHOP_PASSWORD_ITERATIONS", super().iterations)
+
+    def encode(self, password, salt, iterations=None):
+        self._check_encode_args(password, salt)
+        iterations = iterations or self.iterations
+        password = force_str(password)
+        salt = force_str(salt)
+        hash = hashing_pool.run(pbkdf2, password, salt, iterations, 0, self.digest)
+        hash = base64.b64encode(hash).decode("ascii").strip()
+        return "%s$%d$%s$%s" % (self.algorithm, iterations, salt, hash)
@@ -0,0 +1,200 @@
+"""
+Daily sales rollups per product, category and customer.
+
+Each rollup row holds the totals for one (day, key, order status). Order
+writes move amounts between status buckets instead of re-aggregating, so
+the analytics endpoints read a table whose size depends on days and keys
+rather than on the number of order items. ``rebuild`` recomputes all
+three tables from scratch.
+"""
+
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    CategorySalesRollup,
+    CustomerSalesRollup,
+    Order,
+    OrderItem,
+    ProductSalesRollup,
+)
+
+BATCH_SIZE = 200
+
+# (model, key field, value fields) for each rollup table
+ROLLUPS = {
+    "products": (ProductSalesRollup, "product_id", ("quantity", "revenue")),
+    "categories": (CategorySalesRollup, "category_id", ("quantity", "revenue")),
+    "customers": (CustomerSalesRollup, "customer_id", ("order_count", "total_spent")),
+}
+
+
+class SalesDelta:
+    """Per-table amounts keyed by (day, key id), ready to apply to a status"""
+
+    def __init__(self):
+        self.rows = {name: defaultdict(lambda: [0, 0]) for name in ROLLUPS}
+
+    def add(self, name, day, key, first, second):
+        row = self.rows[name][(day, key)]
+        row[0] += first
+        row[1] += second
+
+
+def new_order_delta(order, lines, products):
+    """Build the delta of a freshly placed order from data already in memory"""
+    delta = SalesDelta()
+    day = timezone.localdate(order.created_at)
+    for product_id, quantity in lines.items():
+        product = products[product_id]
+        revenue = product.price * quantity
+        delta.add("products", day, product_id, quantity, revenue)
+        delta.add("categories", day, product.category_id, quantity, revenue)
+    delta.add("customers", day, order.customer_id, 1, order.total_amount)
+    return delta
+
+
+def orders_delta(order_ids):
+    """Build the delta of existing orders with two grouped queries"""
+    delta = SalesDelta()
+    items = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values("product_id", "category_id", day=TruncDate("order__created_at"))
+        .annotate(units=Sum("quantity"), sales=Sum(F("quantity") * F("price")))
+    )
+    for row in items:
+        delta.add("products", row["day"], row["product_id"], row["units"], row["sales"])
+        # Items whose category has since been deleted have none to book
+        if row["category_id"] is not None:
+            delta.add(
+                "categories",
+                row["day"],
+                row["category_id"],
+                row["units"],
+                row["sales"],
+            )
+
+    orders = (
+        Order.objects.filter(pk__in=order_ids)
+        .order_by()
+        .values("customer_id", day=TruncDate("created_at"))
+        .annotate(orders=Count("pk"), spent=Sum("total_amount"))
+    )
+    for row in orders:
+        delta.add(
+            "customers",
+            row["day"],
+            row["customer_id"],
+            row["orders"],
+            row["spent"],
+        )
+    return delta
+
+
+def apply_delta(delta, status, sign=1):
+    """Add (sign=1) or subtract (sign=-1) a delta in one status bucket"""
+    for name, (model, key_field, fields) in ROLLUPS.items():
+        keys = list(delta.rows[name])
+        for start in range(0, len(keys), BATCH_SIZE):
+            batch = keys[start : start + BATCH_SIZE]
+
+            # Make sure every bucket exists, then increment them all at once
+            model.objects.bulk_create(
+                [
+                    model(day=day, status=status, **{key_field: key})
+                    for day, key in batch
+                ],
+                ignore_conflicts=True,
+            )
+            updates = {}
+            for index, field in enumerate(fields):
+                updates[field] = F(field) + Case(
+                    *[
+                        When(
+                            day=day,
+                            **{key_field: key},
+                            then=Value(sign * delta.rows[name][(day, key)][index]),
+                        )
+                        for day, key in batch
+                    ],
+                    default=Value(0),
+                    output_field=model._meta.get_field(field),
+                )
+            model.objects.filter(status=status).filter(
+                reduce(or_, [Q(day=day, **{key_field: key}) for day, key in batch])
+            ).update(**updates)
+
+
+def record_new_order(order, lines, products):
+    apply_delta(new_order_delta(order, lines, products), order.status)
+
+
+def move_orders(order_ids, from_status, to_status):
+    """Move orders between status buckets; None means added or removed"""
+    if not order_ids or from_status == to_status:
+        return
+    delta = orders_delta(order_ids)
+    if from_status:
+        apply_delta(delta, from_status, sign=-1)
+    if to_status:
+        apply_delta(delta, to_status)
+
+
+def rebuild():
+    """
+    Recompute every rollup table from the order history.
+
+    Checkout and the order signals keep the rollups current; orders written
+    without them, such as bulk inserts of generated data, need a rebuild.
+    """
+    item_totals = OrderItem.objects.annotate(
+        day=TruncDate("order__created_at")
+    ).order_by()
+    sales = {"units": Sum("quantity"), "sales": Sum(F("quantity") * F("price"))}
+
+    product_rows = (
+        item_totals.values("day", "product_id", "order__status")
+        .annotate(**sales)
+        .values_list("day", "product_id", "order__status", "units", "sales")
+    )
+    category_rows = (
+        item_totals.exclude(category=None)
+        .values("day", "category_id", "order__status")
+        .annotate(**sales)
+        .values_list("day", "category_id", "order__status", "units", "sales")
+    )
+    customer_rows = (
+        Order.objects.annotate(day=TruncDate("created_at"))
+        .order_by()
+        .values("day", "customer_id", "status")
+        .annotate(orders=Count("pk"), spent=Sum("total_amount"))
+        .values_list("day", "customer_id", "status", "orders", "spent")
+    )
+
+    with transaction.atomic():
+        for model, key_field, fields in ROLLUPS.values():
+            model.objects.all().delete()
+        for (model, key_field, fields), rows in zip(
+            ROLLUPS.values(), [product_rows, category_rows, customer_rows]
+        ):
+            insert_from_select(model, ["day", key_field, "status", *fields], rows)
+
+
+def insert_from_select(model, fields, queryset):
+    """Run INSERT INTO ... SELECT so the aggregation never leaves the database"""
+    columns = ", ".join(
+        connection.ops.quote_name(model._meta.get_field(name).column) for name in fields
+    )
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {connection.ops.quote_name(model._meta.db_table)} "
+            f"({columns}) {sql}",
+            params,
+        )
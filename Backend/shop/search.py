@@ -0,0 +1,167 @@
+"""
+Product search backends.
+
+The backend is picked from the ``SHOP_SEARCH_BACKEND`` setting (a dotted
+path) or, when unset, from the database vendor. Every backend turns a
+user query into prefix terms, filters a Product queryset with an index
+and orders it by relevance.
+"""
+
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+FTS_TABLE = "shop_product_fts"
+
+# SQL used by the migration that creates the SQLite FTS5 index
+SQLITE_FTS_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        name, description,
+        content='shop_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER shop_product_fts_insert AFTER INSERT ON shop_product BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER shop_product_fts_delete AFTER DELETE ON shop_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER shop_product_fts_update AFTER UPDATE OF name, description
+    ON shop_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_FTS_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS shop_product_fts_insert",
+    "DROP TRIGGER IF EXISTS shop_product_fts_delete",
+    "DROP TRIGGER IF EXISTS shop_product_fts_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def restore_sqlite_index(apps, schema_editor):
+    """
+    Recreate the FTS5 index and its triggers after a migration step.
+
+    SQLite alters shop_product for some column changes by copying it into
+    a new table, which drops the sync triggers along with the old one.
+    """
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in SQLITE_FTS_DROP_SQL + SQLITE_FTS_SQL:
+        schema_editor.execute(sql)
+
+
+# Expression shared by the PostgreSQL GIN index and the search query
+POSTGRES_VECTOR = (
+    "to_tsvector('simple', coalesce(shop_product.name, '') || ' ' || "
+    "coalesce(shop_product.description, ''))"
+)
+
+POSTGRES_INDEX_SQL = [
+    "CREATE INDEX IF NOT EXISTS shop_product_search_idx ON shop_product "
+    "USING gin ((" + POSTGRES_VECTOR.replace("shop_product.", "") + "))",
+]
+
+POSTGRES_DROP_SQL = ["DROP INDEX IF EXISTS shop_product_search_idx"]
+
+
+def search_terms(query):
+    """Split a user query into plain word terms"""
+    return re.findall(r"\w+", query.lower())
+
+
+class BasicSearchBackend:
+    """Unindexed fallback for databases without a full-text engine"""
+
+    def search(self, queryset, query):
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+        for term in terms:
+            queryset = queryset.filter(
+                Q(name__icontains=term) | Q(description__icontains=term)
+            )
+        return queryset
+
+    def rebuild(self):
+        pass
+
+
+class SQLiteFTSBackend:
+    """FTS5 index kept in sync with shop_product by triggers"""
+
+    # bm25 column weights: matches in the name count more than the description
+    rank = f"bm25({FTS_TABLE}, 10.0, 1.0)"
+
+    def search(self, queryset, query):
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+        match = " ".join(f'"{term}"*' for term in terms)
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f"{FTS_TABLE}.rowid = shop_product.id", f"{FTS_TABLE} MATCH %s"],
+            params=[match],
+            select={"search_rank": self.rank},
+            order_by=["search_rank", "-created_at"],
+        )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+class PostgresSearchBackend:
+    """tsvector search served by the shop_product_search_idx GIN index"""
+
+    def search(self, queryset, query):
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        return queryset.extra(
+            where=[f"{POSTGRES_VECTOR} @@ to_tsquery('simple', %s)"],
+            params=[tsquery],
+            select={
+                "search_rank": f"ts_rank({POSTGRES_VECTOR}, to_tsquery('simple', %s))"
+            },
+            select_params=[tsquery],
+            order_by=["-search_rank", "-created_at"],
+        )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute("REINDEX INDEX shop_product_search_idx")
+
+
+VENDOR_BACKENDS = {
+    "sqlite": SQLiteFTSBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+def get_search_backend():
+    path = getattr(settings, "SHOP_SEARCH_BACKEND", None)
+    if path:
+        return import_string(path)()
+    return VENDOR_BACKENDS.get(connection.vendor, BasicSearchBackend)()
@@ -1,7 +1,9 @@
 from django.contrib.auth.models import User
 from rest_framework import serializers
 
-from .models import Category, Customer, Order, OrderItem, Product
+from . import images, inventory
+from .checkout import CheckoutError, merge_lines, place_order
+from .models import Category, Customer, Order, OrderItem, Product, StockHold
 
 
 # User Serializers
@@ -42,19 +44,27 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 
 # Category Serializer
 class CategorySerializer(serializers.ModelSerializer):
-    product_count = serializers.SerializerMethodField()
+    product_count = serializers.IntegerField(
+        source="active_product_count", read_only=True
+    )
 
     class Meta:
         model = Category
         fields = ["id", "name", "description", "product_count", "created_at"]
         read_only_fields = ["id", "created_at"]
 
-    def get_product_count(self, obj):
-        return obj.products.count()
-
 
 # Product Serializers
-class ProductListSerializer(serializers.ModelSerializer):
+class ProductImageMixin(serializers.Serializer):
+    """Adds ``image_srcset``: the image's resized variants, by format"""
+
+    image_srcset = serializers.SerializerMethodField()
+
+    def get_image_srcset(self, product):
+        return images.srcset(product, self.context.get("request"))
+
+
+class ProductListSerializer(ProductImageMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source="category.name", read_only=True)
 
     class Meta:
@@ -64,35 +74,46 @@ class ProductListSerializer(serializers.ModelSerializer):
             "name",
             "price",
             "stock",
+            "available",
             "category",
             "category_name",
             "image",
+            "image_srcset",
             "is_active",
             "is_in_stock",
         ]
-        read_only_fields = ["id", "is_in_stock"]
+        read_only_fields = ["id", "available", "is_in_stock"]
 
 
-class ProductDetailSerializer(serializers.ModelSerializer):
+class ProductDetailSerializer(ProductImageMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source="category.name", read_only=True)
 
     class Meta:
         model = Product
         fields = [
             "id",
+            "sku",
             "name",
             "description",
             "price",
             "stock",
+            "available",
             "category",
             "category_name",
             "image",
+            "image_srcset",
             "is_active",
             "is_in_stock",
             "created_at",
             "updated_at",
         ]
-        read_only_fields = ["id", "is_in_stock", "created_at", "updated_at"]
+        read_only_fields = [
+            "id",
+            "available",
+            "is_in_stock",
+            "created_at",
+            "updated_at",
+        ]
 
 
 # Customer Serializer
@@ -122,6 +143,7 @@ class CustomerSerializer(serializers.ModelSerializer):
 class OrderItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source="product.name", read_only=True)
     product_image = serializers.ImageField(source="product.image", read_only=True)
+    product_image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = OrderItem
@@ -130,38 +152,27 @@ class OrderItemSerializer(serializers.ModelSerializer):
             "product",
             "product_name",
             "product_image",
+            "product_image_srcset",
             "quantity",
             "price",
             "subtotal",
         ]
         read_only_fields = ["id", "price", "subtotal"]
 
+    def get_product_image_srcset(self, item):
+        return images.srcset(item.product, self.context.get("request"))
+
     def validate_quantity(self, value):
         if value < 1:
             raise serializers.ValidationError("Quantity must be at least 1.")
         return value
 
 
-class OrderItemCreateSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = OrderItem
-        fields = ["product", "quantity"]
-
-    def validate(self, attrs):
-        product = attrs["product"]
-        quantity = attrs["quantity"]
-
-        if not product.is_active:
-            raise serializers.ValidationError(
-                {"product": "This product is not available."}
-            )
-
-        if quantity > product.stock:
-            raise serializers.ValidationError(
-                {"quantity": f"Only {product.stock} items available in stock."}
-            )
-
-        return attrs
+class OrderItemCreateSerializer(serializers.Serializer):
+    # A plain ID: place_order and inventory.reserve check every product,
+    # and its stock, in one statement for all the lines
+    product = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1)
 
 
 # Order Serializers
@@ -183,6 +194,9 @@ class OrderListSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "total_amount", "created_at"]
 
     def get_items_count(self, obj):
+        # Prefer the count annotated by OrderViewSet.get_queryset
+        if hasattr(obj, "items_count"):
+            return obj.items_count
         return obj.items.count()
 
 
@@ -206,6 +220,12 @@ class OrderDetailSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "total_amount", "created_at", "updated_at"]
 
 
+class OrderBulkCancelSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False
+    )
+
+
 class OrderCreateSerializer(serializers.ModelSerializer):
     items = OrderItemCreateSerializer(many=True, write_only=True)
 
@@ -219,24 +239,69 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         # Get customer from authenticated user
         customer = self.context["request"].user.customer_profile
 
-        # Create order
-        order = Order.objects.create(customer=customer, **validated_data)
+        # Lock stock, create order and items in a fixed number of queries
+        try:
+            return place_order(customer, items_data, **validated_data)
+        except CheckoutError as exc:
+            raise serializers.ValidationError({"items": exc.errors})
+
+
+# Stock Hold Serializers
+class StockHoldSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source="product.name", read_only=True)
+
+    class Meta:
+        model = StockHold
+        fields = ["id", "product", "product_name", "quantity", "expires_at"]
+        read_only_fields = fields
+
+
+class StockHoldCreateSerializer(serializers.Serializer):
+    items = OrderItemCreateSerializer(many=True, allow_empty=False)
+
+    def create(self, validated_data):
+        customer = self.context["request"].user.customer_profile
+
+        # All-or-nothing: one conditional update reserves every line
+        try:
+            return inventory.reserve(customer, merge_lines(validated_data["items"]))
+        except inventory.InsufficientStock as exc:
+            raise serializers.ValidationError({"items": exc.errors})
+
+
+# Cart Serializers
+class CartItemWriteSerializer(serializers.Serializer):
+    # A plain ID: shop.carts checks every product in one query
+    product = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=0)
+
 
-        # Create order items and update stock
-        for item_data in items_data:
-            product = item_data["product"]
-            quantity = item_data["quantity"]
+class CartUpdateSerializer(serializers.Serializer):
+    items = CartItemWriteSerializer(many=True)
 
-            # Create order item
-            OrderItem.objects.create(
-                order=order, product=product, quantity=quantity, price=product.price
-            )
+    def validated_lines(self):
+        return merge_lines(self.validated_data["items"])
 
-            # Update product stock
-            product.stock -= quantity
-            product.save()
 
-        # Calculate and save total
-        order.calculate_total()
+class CartLineSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    product_name = serializers.CharField(allow_null=True)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, allow_null=True)
+    quantity = serializers.IntegerField()
+    subtotal = serializers.DecimalField(
+        max_digits=12, decimal_places=2, allow_null=True
+    )
+    available = serializers.IntegerField()
+    error = serializers.CharField(allow_null=True)
 
-        return order
+
+class CartSerializer(serializers.Serializer):
+    token = serializers.UUIDField(allow_null=True)
+    items = CartLineSerializer(many=True)
+    total = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+class CartCheckoutSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Order
+        fields = ["shipping_address", "order_notes"]
@@ -0,0 +1,91 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import cache, rollups
+from .authentication import user_cache
+from .models import Category, Customer, Order, Product
+
+
+@receiver(pre_save, sender=Product)
+def product_image_changed(sender, instance, raw=False, **kwargs):
+    """
+    A new image needs new variants, made by the image_variants command.
+
+    The old variant files are kept: their content-addressed names may be
+    shared with other products, and cached pages may still link them.
+    """
+    variants = instance.image_variants
+    if not raw and variants and variants.get("source") != instance.image.name:
+        instance.image_variants = {}
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, raw=False, **kwargs):
+    """Keep Category.active_product_count in step with product writes"""
+    if raw:
+        return
+
+    cache.invalidate_products([instance.pk])
+
+    loaded_category_id = getattr(instance, "_loaded_category_id", None)
+    loaded_is_active = getattr(instance, "_loaded_is_active", None)
+    if (
+        not created
+        and loaded_category_id == instance.category_id
+        and loaded_is_active == instance.is_active
+    ):
+        return
+
+    category_ids = {instance.category_id, loaded_category_id} - {None}
+    Category.refresh_product_counts(category_ids)
+    cache.invalidate_categories()
+
+    instance._loaded_category_id = instance.category_id
+    instance._loaded_is_active = instance.is_active
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    cache.invalidate_products([instance.pk])
+    if instance.is_active:
+        Category.refresh_product_counts([instance.category_id])
+        cache.invalidate_categories()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, raw=False, **kwargs):
+    """Category names and counts appear in every catalogue response"""
+    if not raw:
+        cache.invalidate_categories()
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, raw=False, **kwargs):
+    """Move an order's sales between rollup buckets when its status changes"""
+    loaded_status = getattr(instance, "_loaded_status", None)
+    instance._loaded_status = instance.status
+    if raw or created or loaded_status in (None, instance.status):
+        return
+    rollups.move_orders([instance.pk], loaded_status, instance.status)
+
+
+@receiver(pre_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    status = getattr(instance, "_loaded_status", instance.status)
+    rollups.move_orders([instance.pk], status, None)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """Authenticated requests must see the new flags and password"""
+    user_cache.evict(instance.pk)
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def customer_changed(sender, instance, **kwargs):
+    # Cached users carry their customer profile
+    user_cache.evict(instance.user_id)
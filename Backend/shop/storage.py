@@ -0,0 +1,67 @@
+"""
+Content-addressed media storage.
+
+``ContentAddressedStorage`` saves every upload as the SHA-256 of its
+content, keeping the upload directory and extension
+(``products/3fa4…e1.jpg``). A file that is already stored is not written
+again, and replacing a product image gives it a new URL, so the files
+behind hashed URLs never change: ``serve_media`` sends them with
+``Cache-Control: immutable`` and a far-future expiry, and browsers and
+CDNs can keep them for good. A front web server serving MEDIA_ROOT itself
+should send the same headers for these names.
+"""
+
+import hashlib
+import os
+import posixpath
+import re
+import time
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.http import http_date
+from django.views.static import serve
+
+HASH_LENGTH = 32
+HASHED_NAME = re.compile(r"(^|/)[0-9a-f]{%d}(\.\w+)?$" % HASH_LENGTH)
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def is_hashed(name):
+    return bool(HASHED_NAME.search(name))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage that names files after their content"""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        extension = os.path.splitext(name)[1].lower()
+        name = posixpath.join(
+            posixpath.dirname(name), content_hash(content) + extension
+        )
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+
+def serve_media(request, path):
+    """Serve a media file, letting clients keep content-addressed ones for good"""
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if is_hashed(path):
+        response["Cache-Control"] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        response["Expires"] = http_date(time.time() + IMMUTABLE_MAX_AGE)
+    return response
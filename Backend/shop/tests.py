@@ -1,3 +1,1697 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from types import ModuleType
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.db.models import Count, Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import include, path
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import async_views, images, inventory, rollups
+from . import urls as shop_urls
+from .authentication import ShopRefreshToken, UserCache, user_cache
+from .blacklist import BloomFilter, TokenBlacklist, token_blacklist
+from .checkout import CheckoutError, cancel_orders, place_order
+from .imports import import_products
+from .inventory import InsufficientStock
+from .loadgen import LoadGenerator
+from .management.commands import bench_endpoints
+from .models import (
+    Cart,
+    Category,
+    CategorySalesRollup,
+    Customer,
+    CustomerSalesRollup,
+    Order,
+    OrderItem,
+    Product,
+    ProductSalesRollup,
+    StockHold,
+)
+from .passwords import HashingPool, PooledPBKDF2PasswordHasher
+
+
+def make_customer(username):
+    user = User.objects.create(username=username)
+    return Customer.objects.create(user=user)
+
+
+def make_product(category, name="Item", price="10.00", stock=10, **fields):
+    fields.setdefault("description", name)
+    return Product.objects.create(
+        name=name, price=Decimal(price), stock=stock, category=category, **fields
+    )
+
+
+def make_products(category, count, name="Item", **fields):
+    return [make_product(category, f"{name} {i}", **fields) for i in range(count)]
+
+
+class PlaceOrderTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Books")
+        self.customer = make_customer("reader")
+
+    def make_products(self, count, stock=10):
+        return make_products(self.category, count, "Book", price="5.00", stock=stock)
+
+    def order_queries(self, products):
+        items = [{"product": product, "quantity": 2} for product in products]
+        with CaptureQueriesContext(connection) as ctx:
+            place_order(self.customer, items, shipping_address="1 Main St")
+        return len(ctx.captured_queries)
+
+    def test_query_count_is_constant(self):
+        small = self.order_queries(self.make_products(1))
+        large = self.order_queries(self.make_products(25))
+        self.assertEqual(small, large)
+
+    def test_total_and_stock(self):
+        products = self.make_products(3)
+        items = [{"product": product, "quantity": 3} for product in products]
+        order = place_order(self.customer, items, shipping_address="1 Main St")
+
+        self.assertEqual(order.total_amount, Decimal("45.00"))
+        self.assertEqual(order.items.count(), 3)
+        for product in products:
+            product.refresh_from_db()
+            self.assertEqual(product.stock, 7)
+
+    def test_repeated_product_is_merged(self):
+        product = self.make_products(1)[0]
+        items = [{"product": product, "quantity": 1}] * 3
+        order = place_order(self.customer, items, shipping_address="1 Main St")
+
+        self.assertEqual(order.items.get().quantity, 3)
+
+    def test_insufficient_stock_rolls_back(self):
+        plenty, scarce = self.make_products(2, stock=2)
+        items = [
+            {"product": plenty, "quantity": 1},
+            {"product": scarce, "quantity": 5},
+        ]
+        with self.assertRaises(CheckoutError):
+            place_order(self.customer, items, shipping_address="1 Main St")
+
+        plenty.refresh_from_db()
+        self.assertEqual(plenty.stock, 2)
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderCreateTests(APITestCase):
+    def setUp(self):
+        self.products = make_products(Category.objects.create(name="Books"), 21)
+        self.client.force_authenticate(make_customer("reader").user)
+
+    def post_order(self, products):
+        return self.client.post(
+            "/api/orders/",
+            {
+                "shipping_address": "1 Main St",
+                "items": [{"product": p.pk, "quantity": 1} for p in products],
+            },
+            format="json",
+        )
+
+    def test_query_count_does_not_grow_with_the_basket(self):
+        # Warm the user cache so both requests authenticate alike
+        self.post_order(self.products[:1])
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.post_order(self.products[1:2]).status_code, 201)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self.post_order(self.products[1:]).status_code, 201)
+        self.assertEqual(len(small), len(large))
+
+    def test_missing_and_inactive_products_are_refused(self):
+        inactive = self.products[1]
+        inactive.is_active = False
+        inactive.save()
+        response = self.client.post(
+            "/api/orders/",
+            {
+                "shipping_address": "1 Main St",
+                "items": [
+                    {"product": self.products[0].pk, "quantity": 1},
+                    {"product": inactive.pk, "quantity": 1},
+                    {"product": 999_999, "quantity": 1},
+                ],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data["items"]), {inactive.pk, 999_999})
+        self.assertFalse(Order.objects.exists())
+
+
+class CancelOrderTests(APITestCase):
+    def setUp(self):
+        self.customer = make_customer("gardener")
+        self.products = make_products(Category.objects.create(name="Garden"), 3)
+
+    def place(self, quantity=2):
+        items = [{"product": p, "quantity": quantity} for p in self.products]
+        return place_order(self.customer, items, shipping_address="1 Main St")
+
+    def test_cancel_restores_stock_once(self):
+        order = self.place()
+        self.client.force_authenticate(self.customer.user)
+
+        response = self.client.post(f"/api/orders/{order.pk}/cancel/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["status"], "cancelled")
+
+        response = self.client.post(f"/api/orders/{order.pk}/cancel/")
+        self.assertEqual(response.status_code, 400)
+        for product in self.products:
+            product.refresh_from_db()
+            self.assertEqual(product.stock, 10)
+
+    def test_bulk_cancel_reports_skipped(self):
+        pending = [self.place(quantity=1) for _ in range(3)]
+        shipped = self.place(quantity=1)
+        Order.objects.filter(pk=shipped.pk).update(status="shipped")
+        admin = User.objects.create(username="admin", is_staff=True)
+        self.client.force_authenticate(admin)
+
+        ids = [order.pk for order in pending] + [shipped.pk, 9999]
+        response = self.client.post(
+            "/api/orders/bulk-cancel/", {"ids": ids}, format="json"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["cancelled"], ids[:3])
+        self.assertEqual(
+            response.data["skipped"],
+            {shipped.pk: "already shipped", 9999: "not found"},
+        )
+        for product in self.products:
+            product.refresh_from_db()
+            self.assertEqual(product.stock, 9)
+
+    def test_bulk_cancel_query_count_is_constant(self):
+        few = [self.place(quantity=1).pk for _ in range(2)]
+        many = [self.place(quantity=1).pk for _ in range(6)]
+        queryset = Order.objects.all()
+
+        with CaptureQueriesContext(connection) as small:
+            cancel_orders(queryset, few)
+        with CaptureQueriesContext(connection) as large:
+            cancel_orders(queryset, many)
+        self.assertEqual(len(small), len(large))
+
+    def test_bulk_cancel_requires_staff(self):
+        self.client.force_authenticate(self.customer.user)
+        response = self.client.post(
+            "/api/orders/bulk-cancel/", {"ids": [1]}, format="json"
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class OrderListTests(APITestCase):
+    def setUp(self):
+        self.product = make_product(
+            Category.objects.create(name="Sports"), "Ball", price="8.00", stock=1000
+        )
+        self.customer = make_customer("runner")
+
+    def create_orders(self, count):
+        for _ in range(count):
+            place_order(
+                self.customer,
+                [{"product": self.product, "quantity": 2}],
+                shipping_address="1 Main St",
+            )
+
+    def list_queries(self, user):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/orders/")
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_items_count(self):
+        self.create_orders(1)
+        response, _ = self.list_queries(self.customer.user)
+        self.assertEqual(response.data["results"][0]["items_count"], 1)
+
+    def test_query_count_is_constant(self):
+        admin = User.objects.create(username="admin", is_staff=True)
+        for user in (self.customer.user, admin):
+            Order.objects.all().delete()
+            self.create_orders(2)
+            _, small = self.list_queries(user)
+            self.create_orders(20)
+            _, large = self.list_queries(user)
+            self.assertEqual(small, large)
+
+
+class CategoryProductCountTests(APITestCase):
+    def setUp(self):
+        self.books = Category.objects.create(name="Books")
+        self.toys = Category.objects.create(name="Toys")
+
+    def counts(self):
+        return dict(Category.objects.values_list("name", "active_product_count"))
+
+    def test_counts_follow_product_writes(self):
+        product = make_product(self.books)
+        make_product(self.books, is_active=False)
+        self.assertEqual(self.counts(), {"Books": 1, "Toys": 0})
+
+        product.category = self.toys
+        product.save()
+        self.assertEqual(self.counts(), {"Books": 0, "Toys": 1})
+
+        product.is_active = False
+        product.save()
+        self.assertEqual(self.counts(), {"Books": 0, "Toys": 0})
+
+        product.is_active = True
+        product.save()
+        product.delete()
+        self.assertEqual(self.counts(), {"Books": 0, "Toys": 0})
+
+    def test_list_counts_products_without_a_query_per_category(self):
+        for i in range(30):
+            category = Category.objects.create(name=f"Category {i}")
+            make_product(category)
+
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/categories/")
+        counts = {row["name"]: row["product_count"] for row in response.data["results"]}
+        self.assertEqual(counts["Category 0"], 1)
+
+
+class CursorPaginationTests(APITestCase):
+    def setUp(self):
+        make_products(Category.objects.create(name="Music"), 25, "Album")
+
+    def test_cursor_mode_walks_all_products_without_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/products/?pagination=cursor")
+        self.assertNotIn("count", response.data)
+        self.assertFalse(
+            any("COUNT(" in query["sql"] for query in ctx.captured_queries)
+        )
+
+        names = [row["name"] for row in response.data["results"]]
+        response = self.client.get(response.data["next"])
+        names += [row["name"] for row in response.data["results"]]
+        self.assertIsNone(response.data["next"])
+        self.assertEqual(names, [f"Album {i}" for i in reversed(range(25))])
+
+    def test_page_number_mode_is_default(self):
+        response = self.client.get("/api/products/?page=2")
+        self.assertEqual(response.data["count"], 25)
+        self.assertEqual(len(response.data["results"]), 5)
+
+
+class ProductSearchTests(APITestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Kitchen")
+
+    def create_product(self, name, description):
+        return make_product(self.category, name, description=description)
+
+    def search(self, query):
+        response = self.client.get("/api/products/", {"search": query})
+        return [row["name"] for row in response.data["results"]]
+
+    def test_prefix_match_ranked_by_name(self):
+        self.create_product("Chef Knife", "Stainless steel blade")
+        self.create_product("Cutting Board", "Pairs well with any knife")
+        self.create_product("Teapot", "Ceramic")
+
+        self.assertEqual(self.search("kni"), ["Chef Knife", "Cutting Board"])
+        self.assertEqual(self.search("steel blade"), ["Chef Knife"])
+        self.assertEqual(self.search("%"), [])
+
+    def test_index_follows_writes(self):
+        product = self.create_product("Whisk", "Balloon whisk")
+        product.name = "Spatula"
+        product.description = "Silicone spatula"
+        product.save()
+        self.assertEqual(self.search("whisk"), [])
+        self.assertEqual(self.search("silicone"), ["Spatula"])
+
+        product.delete()
+        self.assertEqual(self.search("spatula"), [])
+
+
+class QueryPlanTests(APITestCase):
+    """Every list query must be answered from an index, never a table scan"""
+
+    # Tables whose list queries are expected to stay index-driven
+    tables = ["shop_product", "shop_order", "shop_orderitem", "shop_category"]
+
+    def setUp(self):
+        category = Category.objects.create(name="Office")
+        product = make_product(category, "Stapler")
+        self.customer = make_customer("clerk")
+        self.category = category
+        place_order(
+            self.customer,
+            [{"product": product, "quantity": 1}],
+            shipping_address="1 Main St",
+        )
+        self.admin = User.objects.create(username="admin", is_staff=True)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_no_table_scan(self, path, user=None):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+
+        for query in ctx.captured_queries:
+            sql = query["sql"]
+            if not sql.startswith("SELECT"):
+                continue
+            for step in self.explain(sql):
+                for table in self.tables:
+                    self.assertNotEqual(
+                        step, f"SCAN {table}", f"{path} scans {table}: {sql}"
+                    )
+
+    def test_product_lists(self):
+        for path in [
+            "/api/products/",
+            "/api/products/?pagination=cursor",
+            f"/api/products/?category={self.category.pk}",
+            f"/api/products/?category={self.category.pk}&in_stock=true",
+            "/api/products/?in_stock=true",
+            "/api/products/low_stock/",
+            f"/api/categories/{self.category.pk}/products/",
+        ]:
+            self.assert_no_table_scan(path)
+
+    def test_order_lists(self):
+        for user in (self.customer.user, self.admin):
+            self.assert_no_table_scan("/api/orders/", user)
+            self.assert_no_table_scan("/api/orders/?pagination=cursor", user)
+
+    def test_category_list(self):
+        self.assert_no_table_scan("/api/categories/")
+
+
+class OrderDetailTests(APITestCase):
+    def setUp(self):
+        self.products = make_products(
+            Category.objects.create(name="Pantry"), 12, "Spice", stock=100
+        )
+        self.customer = make_customer("cook")
+        self.client.force_authenticate(self.customer.user)
+
+    def detail_queries(self, lines):
+        items = [{"product": p.pk, "quantity": 1} for p in self.products[:lines]]
+        response = self.client.post(
+            "/api/orders/",
+            {"shipping_address": "1 Main St", "items": items},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data["items"]), lines)
+        order_id = response.data["id"]
+
+        with CaptureQueriesContext(connection) as retrieve:
+            response = self.client.get(f"/api/orders/{order_id}/")
+        self.assertEqual(response.data["items"][0]["product_name"], "Spice 0")
+
+        with CaptureQueriesContext(connection) as cancel:
+            self.client.post(f"/api/orders/{order_id}/cancel/")
+        return len(retrieve), len(cancel)
+
+    def test_detail_query_count_is_constant(self):
+        small = self.detail_queries(1)
+        large = self.detail_queries(12)
+        self.assertEqual(small, large)
+        self.assertEqual(small[0], 2)
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        self.product = make_product(
+            Category.objects.create(name="Garden"),
+            "Rake, steel",
+            price="15.00",
+            stock=50,
+            description='Says "sturdy"',
+        )
+        self.customer = make_customer("gardener")
+        for _ in range(3):
+            place_order(
+                self.customer,
+                [{"product": self.product.pk, "quantity": 1}],
+                shipping_address="2 Elm St",
+            )
+        old = place_order(
+            self.customer,
+            [{"product": self.product.pk, "quantity": 1}],
+            shipping_address="2 Elm St",
+        )
+        Order.objects.filter(pk=old.pk).update(
+            created_at=timezone.now() - timedelta(days=30), status="delivered"
+        )
+        self.old = old
+        self.client.force_authenticate(
+            User.objects.create(username="admin", is_staff=True)
+        )
+
+    def export(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def test_orders_csv(self):
+        content = self.export("/api/orders/export/")
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0][:3], ["id", "customer_id", "customer__user__username"])
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[1][2], "gardener")
+
+    def test_orders_ndjson_filters(self):
+        since = (timezone.localdate() - timedelta(days=1)).isoformat()
+        content = self.export(f"/api/orders/export/?fmt=ndjson&from={since}")
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertNotIn(self.old.pk, [row["id"] for row in rows])
+
+        content = self.export("/api/orders/export/?fmt=ndjson&status=delivered")
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row["id"] for row in rows], [self.old.pk])
+        self.assertEqual(rows[0]["total_amount"], "15.00")
+
+    def test_products_csv_quotes_fields(self):
+        content = self.export("/api/products/export/")
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(rows[0]["name"], "Rake, steel")
+        self.assertEqual(rows[0]["description"], 'Says "sturdy"')
+
+    def test_staff_only_and_format_validation(self):
+        self.assertEqual(
+            self.client.get("/api/products/export/?fmt=xml").status_code, 400
+        )
+        self.client.force_authenticate(self.customer.user)
+        self.assertEqual(self.client.get("/api/orders/export/").status_code, 403)
+
+
+class ProductImportTests(APITestCase):
+    def setUp(self):
+        self.tools = Category.objects.create(name="Tools")
+        self.paint = Category.objects.create(name="Paint")
+        make_product(
+            self.tools, "Hammer", price="9.00", stock=1, sku="HAM-1", description="Old"
+        )
+        self.client.force_authenticate(
+            User.objects.create(username="admin", is_staff=True)
+        )
+
+    def upload(self, content, fmt="csv"):
+        upload = SimpleUploadedFile(f"products.{fmt}", content.encode())
+        return self.client.post(
+            f"/api/products/bulk/?fmt={fmt}", {"file": upload}, format="multipart"
+        )
+
+    def test_csv_upsert_reports_row_errors(self):
+        response = self.upload(
+            "sku,name,description,price,stock,category,is_active\n"
+            'HAM-1,Claw Hammer,"Forged, steel",12.50,5,Tools,true\n'
+            "BRU-1,Brush,Soft,3.00,10,Paint,yes\n"
+            "BAD-1,Broken,,-1,x,Nope,maybe\n"
+            "ROL-1,Roller,Wide,4.00,2,Paint,false\n"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(response.data["updated"], 1)
+        self.assertEqual(len(response.data["errors"]), 1)
+        error = response.data["errors"][0]
+        self.assertEqual(error["row"], 3)
+        self.assertEqual(
+            set(error["errors"]), {"price", "stock", "category", "is_active"}
+        )
+
+        hammer = Product.objects.get(sku="HAM-1")
+        self.assertEqual(hammer.name, "Claw Hammer")
+        self.assertEqual(hammer.price, Decimal("12.50"))
+        self.assertFalse(Product.objects.get(sku="ROL-1").is_active)
+
+        # bulk_create bypasses signals: counts, cache and search still follow
+        self.paint.refresh_from_db()
+        self.assertEqual(self.paint.active_product_count, 1)
+        names = [
+            p["name"]
+            for p in self.client.get("/api/products/?search=claw").data["results"]
+        ]
+        self.assertEqual(names, ["Claw Hammer"])
+
+    def test_batches_use_a_fixed_number_of_queries(self):
+        rows = [
+            {
+                "sku": f"NAIL-{i}",
+                "name": f"Nail {i}",
+                "price": "0.10",
+                "stock": 100,
+                "category": "Tools",
+            }
+            for i in range(300)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            report = import_products(rows, batch_size=100)
+        self.assertEqual(report["created"], 300)
+        self.assertLess(len(queries), 20)
+
+    def test_ndjson_upload_and_command(self):
+        response = self.upload(
+            '{"sku": "TAPE-1", "name": "Tape", "price": 2, "category": "Tools"}\n'
+            "not json\n",
+            fmt="ndjson",
+        )
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(response.data["errors"][0]["row"], 2)
+
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write("sku,name,price,stock,category\nTAPE-1,Duct Tape,2.50,4,Tools\n")
+        self.addCleanup(os.remove, f.name)
+        out = io.StringIO()
+        call_command("import_products", f.name, stdout=out)
+        self.assertIn("Created 0, updated 1", out.getvalue())
+        self.assertEqual(Product.objects.get(sku="TAPE-1").name, "Duct Tape")
+
+    def test_rows_that_are_not_objects_are_row_errors(self):
+        response = self.client.post("/api/products/bulk/", ["x"], format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data["errors"],
+            [{"row": 1, "errors": {"row": "Row must be an object."}}],
+        )
+
+        response = self.upload(
+            '[1, 2]\n{"sku": "TAPE-1", "name": "Tape", "price": 2, "category": "Tools"}\n',
+            fmt="ndjson",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(response.data["errors"][0]["row"], 1)
+
+    def test_non_utf8_upload_is_rejected(self):
+        upload = SimpleUploadedFile(
+            "products.csv", "sku,name\nCAF-1,Café\n".encode("latin-1")
+        )
+        response = self.client.post(
+            "/api/products/bulk/?fmt=csv", {"file": upload}, format="multipart"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("UTF-8", response.data["file"])
+
+    def test_staff_only(self):
+        self.client.force_authenticate(make_customer("shopper").user)
+        self.assertEqual(
+            self.client.post("/api/products/bulk/", [], format="json").status_code, 403
+        )
+
+
+class BenchmarkCompareTests(SimpleTestCase):
+    meta = {"products": 10, "seed": 1}
+
+    def result(self, queries, p50_ms=5.0, size=100):
+        return {"queries": queries, "p50_ms": p50_ms, "bytes": size}
+
+    def compare(self, baseline, results):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "baseline.json")
+        with open(path, "w") as file:
+            json.dump({"meta": self.meta, "endpoints": baseline}, file)
+        command = bench_endpoints.Command(stdout=io.StringIO())
+        command.compare({"meta": self.meta, "endpoints": results}, path, 2.0)
+
+    def test_more_queries_is_a_regression(self):
+        with self.assertRaisesRegex(
+            CommandError, r"orders.create: 16 queries \(baseline 15\)"
+        ):
+            self.compare(
+                {"orders.create": self.result(15), "products.list": self.result(2)},
+                {"orders.create": self.result(16), "products.list": self.result(2)},
+            )
+
+    def test_within_the_baseline_passes(self):
+        self.compare(
+            {"orders.create": self.result(15)},
+            {
+                "orders.create": self.result(14, p50_ms=9.0),
+                "cart.detail": self.result(40),
+            },
+        )
+
+
+class LoadGeneratorTests(TestCase):
+    def test_generates_consistent_skewed_data(self):
+        out = io.StringIO()
+        call_command(
+            "generate_load_data",
+            categories=3,
+            products=60,
+            customers=20,
+            orders=300,
+            batch_size=100,
+            stdout=out,
+        )
+        self.assertEqual(Order.objects.count(), 300)
+        self.assertEqual(Customer.objects.count(), 20)
+
+        # One hash shared by every generated user
+        self.assertEqual(User.objects.values("password").distinct().count(), 1)
+
+        # Derived state matches what the signals would have maintained
+        for category in Category.objects.all():
+            self.assertEqual(
+                category.active_product_count,
+                category.products.filter(is_active=True).count(),
+            )
+        self.assertEqual(
+            ProductSalesRollup.objects.aggregate(total=Sum("quantity"))["total"],
+            OrderItem.objects.aggregate(total=Sum("quantity"))["total"],
+        )
+
+        # Zipfian popularity: the best seller shows up in far more orders
+        # than an even spread would put it in
+        top = (
+            OrderItem.objects.values("product")
+            .annotate(orders=Count("order"))
+            .order_by("-orders")
+            .first()
+        )
+        self.assertGreater(top["orders"], 300 * 3 / 60 * 3)
+
+    def test_same_seed_gives_same_rows_whatever_the_chunk_order(self):
+        class ReversedChunks(LoadGenerator):
+            # As a worker pool may finish them
+            def run_phase(self, tasks, workers, log):
+                super().run_phase(tasks[::-1], workers, log)
+
+        def generate(generator_class):
+            generator_class(
+                categories=2, products=30, customers=6, orders=40, batch_size=10
+            ).run(log=lambda message: None)
+            rows = (
+                list(Product.objects.order_by("pk").values_list("pk", "name")),
+                list(Customer.objects.order_by("pk").values_list("pk", "user_id")),
+                list(
+                    OrderItem.objects.order_by("order_id", "product_id").values_list(
+                        "order_id", "product_id", "quantity", "order__customer_id"
+                    )
+                ),
+            )
+            Order.objects.all().delete()
+            Product.objects.all().delete()
+            User.objects.all().delete()
+            return rows
+
+        self.assertEqual(generate(LoadGenerator), generate(ReversedChunks))
+
+
+@override_settings(
+    SHOP_PROFILING_ENABLED=True,
+    SHOP_PROFILING_SAMPLE_RATE=1.0,
+    SHOP_PROFILING_SLOW_MS=10_000,
+    SHOP_PROFILING_DUPLICATE_THRESHOLD=3,
+)
+class ProfilingMiddlewareTests(APITestCase):
+    def setUp(self):
+        make_products(Category.objects.create(name="Bins"), 4, "Bin", stock=2)
+        user = make_customer("profiler").user
+        token = AccessToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_server_timing_header(self):
+        response = self.client.get("/api/orders/")
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn("auth;dur=", timing)
+        self.assertIn("render;dur=", timing)
+        self.assertIn("total;dur=", timing)
+
+    def test_logs_repeated_queries(self):
+        # low_stock loads each product's category separately
+        with self.assertLogs("shop.profiling", "WARNING") as logs:
+            self.client.get("/api/products/low_stock/")
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry["path"], "/api/products/low_stock/")
+        self.assertEqual(entry["duplicates"][0]["count"], 4)
+        self.assertGreater(entry["bytes"], 0)
+
+    @override_settings(SHOP_PROFILING_ENABLED=False)
+    def test_disabled(self):
+        self.assertNotIn("Server-Timing", self.client.get("/api/orders/"))
+
+
+class CachedAuthenticationTests(APITestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.customer = make_customer("cached")
+        self.customer.user.set_password("secret-pass-1")
+        self.customer.user.save()
+
+    def login(self):
+        response = self.client.post(
+            "/api/auth/login/",
+            {"username": "cached", "password": "secret-pass-1"},
+            format="json",
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return response.data
+
+    def test_tokens_carry_identity_claims(self):
+        tokens = self.login()
+        access = AccessToken(tokens["access"])
+        self.assertEqual(
+            (access["user_id"], access["customer_id"], access["is_staff"]),
+            (str(self.customer.user_id), self.customer.pk, False),
+        )
+
+        refreshed = self.client.post(
+            "/api/auth/token/refresh/", {"refresh": tokens["refresh"]}, format="json"
+        ).data
+        self.assertEqual(
+            AccessToken(refreshed["access"])["customer_id"], self.customer.pk
+        )
+
+    def test_login_loads_the_profile_with_the_user(self):
+        # The user with its profile, the outstanding token, last_login
+        with self.assertNumQueries(3):
+            tokens = self.login()
+        self.assertEqual(AccessToken(tokens["access"])["customer_id"], self.customer.pk)
+
+        User.objects.create_user("staff", password="secret-pass-1", is_staff=True)
+        response = self.client.post(
+            "/api/auth/login/",
+            {"username": "staff", "password": "secret-pass-1"},
+            format="json",
+        )
+        self.assertIsNone(AccessToken(response.data["access"])["customer_id"])
+        response = self.client.post(
+            "/api/auth/login/",
+            {"username": "nobody", "password": "secret-pass-1"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_cached_user_needs_no_queries(self):
+        self.login()
+        self.client.get("/api/customers/profile/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/customers/profile/")
+        self.assertEqual(response.data["id"], self.customer.pk)
+
+    def test_changes_evict_the_cached_user(self):
+        self.login()
+        self.client.get("/api/customers/profile/")
+
+        self.customer.phone = "555-0100"
+        self.customer.save()
+        self.assertEqual(
+            self.client.get("/api/customers/profile/").data["phone"], "555-0100"
+        )
+
+        user = self.customer.user
+        user.is_active = False
+        user.save()
+        self.assertEqual(self.client.get("/api/customers/profile/").status_code, 401)
+
+    def test_user_cache_is_a_bounded_lru(self):
+        users = [User(id=pk, username=f"user{pk}") for pk in range(1, 4)]
+        cache = UserCache(max_size=2, ttl=60)
+        cache.set(users[0])
+        cache.set(users[1])
+        self.assertEqual(cache.get(1).username, "user1")
+        cache.set(users[2])
+        self.assertIsNone(cache.get(2))
+        self.assertEqual([cache.get(pk).username for pk in (1, 3)], ["user1", "user3"])
+
+        expired = UserCache(max_size=2, ttl=0)
+        expired.set(users[0])
+        self.assertIsNone(expired.get(1))
+
+
+class TokenBlacklistTests(APITestCase):
+    def setUp(self):
+        token_blacklist.clear()
+        self.user = make_customer("rotating").user
+
+    def refresh(self, token):
+        return self.client.post(
+            "/api/auth/token/refresh/", {"refresh": str(token)}, format="json"
+        )
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for n in range(1000):
+            bloom.add(f"in-{n}")
+        self.assertTrue(all(f"in-{n}" in bloom for n in range(1000)))
+        false_positives = sum(f"out-{n}" in bloom for n in range(10_000))
+        self.assertLess(false_positives, 300)
+
+    def test_rotated_token_is_refused_without_a_membership_query(self):
+        token = ShopRefreshToken.for_user(self.user)
+        first = self.refresh(token)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+        with mock.patch.object(token_blacklist, "sync_seconds", 60):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.refresh(first.data["refresh"]).status_code, 200)
+        self.assertFalse(
+            any(
+                query["sql"].startswith("SELECT 1")
+                and "token_blacklist_blacklistedtoken" in query["sql"]
+                for query in queries
+            )
+        )
+
+    def test_filter_outgrowing_its_capacity_is_rebuilt_once(self):
+        blacklist = TokenBlacklist(
+            capacity=10, error_rate=0.01, sync_seconds=60, rebuild_seconds=60
+        )
+        for _ in range(20):
+            ShopRefreshToken.for_user(self.user).blacklist()
+
+        self.assertIn(OutstandingToken.objects.first().jti, blacklist)
+        self.assertGreaterEqual(blacklist.filter.capacity, 40)
+        with self.assertNumQueries(0):
+            self.assertNotIn("never-issued", blacklist)
+
+    def test_tokens_blacklisted_elsewhere_are_seen(self):
+        token = ShopRefreshToken.for_user(self.user)
+        self.refresh(ShopRefreshToken.for_user(self.user))
+
+        # As another process would: straight to the table
+        BlacklistedToken.objects.create(
+            token=OutstandingToken.objects.get(jti=token["jti"])
+        )
+        with mock.patch.object(token_blacklist, "sync_seconds", 0):
+            self.assertEqual(self.refresh(token).status_code, 401)
+
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            "/api/auth/logout/", {"refresh_token": str(token)}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_purge_deletes_expired_tokens_in_batches(self):
+        now = timezone.now()
+        tokens = OutstandingToken.objects.bulk_create(
+            OutstandingToken(
+                jti=f"jti-{n}",
+                token="",
+                expires_at=now + timedelta(days=1 if n % 2 else -1),
+            )
+            for n in range(7)
+        )
+        BlacklistedToken.objects.bulk_create(
+            BlacklistedToken(token=token) for token in tokens[:4]
+        )
+
+        out = io.StringIO()
+        call_command("purge_tokens", batch_size=2, stdout=out)
+        self.assertIn("Deleted 4 expired tokens", out.getvalue())
+        self.assertEqual(
+            sorted(OutstandingToken.objects.values_list("jti", flat=True)),
+            ["jti-1", "jti-3", "jti-5"],
+        )
+        self.assertEqual(BlacklistedToken.objects.count(), 2)
+
+
+class ImageVariantTests(APITestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.product = make_product(
+            Category.objects.create(name="Art"),
+            "Poster",
+            image=self.upload("poster.jpg", (1200, 600)),
+        )
+
+    def upload(self, name, size):
+        buffer = io.BytesIO()
+        Image.new("RGB", size, "teal").save(buffer, "JPEG")
+        return SimpleUploadedFile(name, buffer.getvalue(), "image/jpeg")
+
+    def test_variants_are_generated_and_served(self):
+        self.assertEqual(self.product.image_variants, {})
+        self.assertEqual(
+            self.client.get(f"/api/products/{self.product.pk}/").data["image_srcset"],
+            {},
+        )
+
+        call_command("image_variants", stdout=io.StringIO())
+        self.product.refresh_from_db()
+        variants = self.product.image_variants
+        self.assertEqual(variants["source"], self.product.image.name)
+        self.assertEqual(
+            (variants["thumb"]["width"], variants["thumb"]["height"]), (200, 100)
+        )
+        storage = self.product.image.storage
+        with storage.open(variants["medium"]["webp"]) as file:
+            self.assertEqual(Image.open(file).format, "WEBP")
+
+        srcset = self.client.get("/api/products/").data["results"][0]["image_srcset"]
+        self.assertEqual(set(srcset), {"jpeg", "webp"})
+        self.assertRegex(
+            srcset["webp"],
+            r"^http://testserver/media/products/variants/\w+\.webp 200w, "
+            r"\S+\.webp 800w$",
+        )
+
+        # A new image is left for the next run
+        self.product.image = self.upload("new.jpg", (100, 100))
+        self.product.save()
+        self.assertIn(self.product, images.pending())
+        call_command("image_variants", stdout=io.StringIO())
+        srcset = self.client.get(f"/api/products/{self.product.pk}/").data[
+            "image_srcset"
+        ]
+        self.assertEqual(srcset["jpeg"].count("100w"), 1)
+
+    def test_unreadable_image_is_not_retried(self):
+        Product.objects.filter(pk=self.product.pk).update(image="products/missing.jpg")
+        call_command("image_variants", stdout=io.StringIO())
+        self.product.refresh_from_db()
+        self.assertIn("error", self.product.image_variants)
+        self.assertFalse(images.pending().exists())
+
+
+class ContentAddressedStorageTests(APITestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media = media.name
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.category = Category.objects.create(name="Prints")
+
+    def product(self, name, content):
+        return make_product(
+            self.category, name, image=SimpleUploadedFile(f"{name}.JPG", content)
+        )
+
+    def test_uploads_are_named_by_content_and_deduplicated(self):
+        first = self.product("first", b"same bytes")
+        second = self.product("second", b"same bytes")
+        third = self.product("third", b"other bytes")
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, third.image.name)
+        self.assertRegex(first.image.name, r"^products/[0-9a-f]{32}\.jpg$")
+        self.assertEqual(len(os.listdir(os.path.join(self.media, "products"))), 2)
+
+        data = self.client.get(f"/api/products/{first.pk}/").data
+        self.assertEqual(data["image"], f"http://testserver/media/{first.image.name}")
+
+    def test_hashed_media_is_served_immutable(self):
+        product = self.product("poster", b"poster bytes")
+        response = self.client.get(product.image.url)
+        self.assertEqual(b"".join(response.streaming_content), b"poster bytes")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn("Expires", response)
+
+        # Files stored under their upload name before may still change
+        os.makedirs(os.path.join(self.media, "legacy"))
+        with open(os.path.join(self.media, "legacy", "poster.jpg"), "wb") as f:
+            f.write(b"legacy")
+        self.assertNotIn("Cache-Control", self.client.get("/media/legacy/poster.jpg"))
+
+    def test_hash_media_moves_legacy_images(self):
+        product = self.product("legacy", b"legacy bytes")
+        os.makedirs(os.path.join(self.media, "old"))
+        with open(os.path.join(self.media, "old", "legacy.jpg"), "wb") as f:
+            f.write(b"legacy bytes")
+        Product.objects.filter(pk=product.pk).update(
+            image="old/legacy.jpg", image_variants={"source": "old/legacy.jpg"}
+        )
+
+        out = io.StringIO()
+        call_command("hash_media", stdout=out)
+        self.assertIn("Moved 1 product images", out.getvalue())
+        moved = Product.objects.get(pk=product.pk)
+        self.assertEqual(
+            moved.image.name, product.image.name.replace("products", "old")
+        )
+        self.assertEqual(moved.image_variants, {})
+
+
+class PasswordHashingTests(APITestCase):
+    def register(self, username):
+        return self.client.post(
+            "/api/auth/register/",
+            {
+                "username": username,
+                "email": f"{username}@example.com",
+                "password": "Campaign-2026!",
+                "password2": "Campaign-2026!",
+            },
+            format="json",
+        )
+
+    def test_pooled_hash_matches_django(self):
+        hasher = PooledPBKDF2PasswordHasher()
+        encoded = hasher.encode("secret", "saltsalt", iterations=1000)
+        self.assertEqual(
+            encoded, PBKDF2PasswordHasher().encode("secret", "saltsalt", 1000)
+        )
+        self.assertTrue(hasher.verify("secret", encoded))
+
+        # Hashes of another cost are upgraded at the next login
+        with override_settings(SHOP_PASSWORD_ITERATIONS=2000):
+            self.assertEqual(hasher.iterations, 2000)
+            self.assertTrue(hasher.must_update(encoded))
+
+    def test_full_pool_answers_503(self):
+        pool = HashingPool(workers=1, queue_size=1, nice=0)
+        pool.slots.acquire()
+        with mock.patch("shop.passwords.hashing_pool", pool):
+            response = self.register("burst")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertFalse(User.objects.filter(username="burst").exists())
+
+        pool.slots.release()
+        with mock.patch("shop.passwords.hashing_pool", pool):
+            self.assertEqual(self.register("burst").status_code, 201)
+        pool.shutdown()
+        self.assertTrue(
+            User.objects.get(username="burst").check_password("Campaign-2026!")
+        )
+
+
+class StockHoldTests(APITestCase):
+    def setUp(self):
+        self.product = make_product(
+            Category.objects.create(name="Tickets"), "Concert", price="50.00", stock=3
+        )
+        self.holder = make_customer("holder")
+        self.other = make_customer("other")
+        self.client.force_authenticate(self.holder.user)
+
+    def hold(self, quantity):
+        return self.client.post(
+            "/api/holds/",
+            {"items": [{"product": self.product.pk, "quantity": quantity}]},
+            format="json",
+        )
+
+    def buy(self, customer, quantity):
+        return place_order(
+            customer,
+            [{"product": self.product.pk, "quantity": quantity}],
+            shipping_address="1 Main St",
+        )
+
+    def test_hold_reduces_availability(self):
+        self.assertEqual(self.hold(2).status_code, 201)
+        data = self.client.get(f"/api/products/{self.product.pk}/").data
+        self.assertEqual((data["stock"], data["available"]), (3, 1))
+
+        response = self.hold(2)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Only 1 items", response.data["items"][self.product.pk])
+
+        # Other buyers cannot take held units
+        with self.assertRaises(CheckoutError):
+            self.buy(self.other, 2)
+        self.buy(self.other, 1)
+
+    def test_query_count_does_not_grow_with_the_lines(self):
+        products = make_products(self.product.category, 10, "Seat")
+
+        def hold_queries(lines):
+            items = [{"product": p.pk, "quantity": 1} for p in lines]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(
+                    "/api/holds/", {"items": items}, format="json"
+                )
+            self.assertEqual(response.status_code, 201)
+            return len(queries)
+
+        hold_queries(products[:1])
+        self.assertEqual(hold_queries(products[1:2]), hold_queries(products))
+
+    def test_missing_and_inactive_products_are_refused(self):
+        self.product.is_active = False
+        self.product.save()
+        response = self.client.post(
+            "/api/holds/",
+            {
+                "items": [
+                    {"product": self.product.pk, "quantity": 1},
+                    {"product": 999_999, "quantity": 1},
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data["items"]), {self.product.pk, 999_999})
+        self.assertFalse(StockHold.objects.exists())
+
+    def test_checkout_consumes_own_hold(self):
+        self.hold(2)
+        self.buy(self.holder, 3 - 1)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.reserved), (1, 0))
+        self.assertFalse(StockHold.objects.exists())
+
+    def test_release_and_expiry(self):
+        hold_id = self.hold(1).data[0]["id"]
+        self.assertEqual(self.client.delete(f"/api/holds/{hold_id}/").status_code, 204)
+
+        inventory.reserve(self.other, {self.product.pk: 2}, ttl=timedelta(seconds=-1))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 2)
+
+        out = io.StringIO()
+        call_command("expire_holds", stdout=out)
+        self.assertIn("Released 1 expired holds", out.getvalue())
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.reserved, self.product.available), (0, 3))
+
+
+class CartTests(APITestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Pantry")
+        self.products = Product.objects.bulk_create(
+            Product(
+                name=f"Jar {i}",
+                description="Jam",
+                price=Decimal("4.50"),
+                stock=5,
+                category=category,
+            )
+            for i in range(10)
+        )
+        self.customer = make_customer("shopper")
+
+    def lines(self, products, quantity=1):
+        return {"items": [{"product": p.pk, "quantity": quantity} for p in products]}
+
+    def test_guest_cart_merges_on_login(self):
+        first, second = self.products[:2]
+        response = self.client.post("/api/cart/", self.lines([first]), format="json")
+        token = response.data["token"]
+        self.client.post(
+            "/api/cart/",
+            self.lines([first, second]),
+            format="json",
+            HTTP_X_CART_TOKEN=token,
+        )
+
+        # The customer already has a cart of their own
+        own = Cart.objects.create(customer=self.customer)
+        own.items.create(product=second, quantity=2)
+
+        self.client.force_authenticate(self.customer.user)
+        data = self.client.get("/api/cart/", HTTP_X_CART_TOKEN=token).data
+        self.assertEqual(data["token"], str(own.token))
+        self.assertEqual(
+            [(line["product"], line["quantity"]) for line in data["items"]],
+            [(second.pk, 3), (first.pk, 2)],
+        )
+        self.assertEqual(data["total"], "22.50")
+        self.assertEqual(Cart.objects.count(), 1)
+
+    def test_replace_and_validation(self):
+        self.client.force_authenticate(self.customer.user)
+        self.client.put("/api/cart/", self.lines(self.products[:3]), format="json")
+        response = self.client.put(
+            "/api/cart/",
+            {"items": [{"product": self.products[0].pk, "quantity": 9}]},
+            format="json",
+        )
+        [line] = response.data["items"]
+        self.assertEqual(line["error"], "Only 5 items available in stock.")
+        self.assertEqual(response.data["total"], "0.00")
+
+        response = self.client.post(
+            "/api/cart/", {"items": [{"product": 999, "quantity": 1}]}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(999, response.data["items"])
+
+    def test_pricing_and_checkout_run_fixed_queries(self):
+        self.client.force_authenticate(self.customer.user)
+        counts = []
+        for products in [self.products[:1], self.products]:
+            self.client.put("/api/cart/", self.lines(products, 2), format="json")
+            with CaptureQueriesContext(connection) as priced:
+                self.client.get("/api/cart/")
+            with CaptureQueriesContext(connection) as checked_out:
+                response = self.client.post(
+                    "/api/cart/checkout/",
+                    {"shipping_address": "1 Main St"},
+                    format="json",
+                )
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(response.data["items"]), len(products))
+            counts.append((len(priced), len(checked_out)))
+        self.assertEqual(counts[0], counts[1])
+
+        self.assertEqual(self.client.get("/api/cart/").data["items"], [])
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock, 1)
+
+        response = self.client.post(
+            "/api/cart/checkout/", {"shipping_address": "1 Main St"}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+# Every async route enabled, as with SHOP_ASYNC_VIEWS listing them all
+ASYNC_URLCONF = ModuleType("async_urlconf")
+ASYNC_URLCONF.urlpatterns = [
+    path(
+        "api/",
+        include(async_views.routes(list(async_views.ROUTES)) + shop_urls.urlpatterns),
+    )
+]
+
+NO_CATALOGUE_CACHE = {
+    "CACHES": {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "test": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+    },
+    "SHOP_CATALOGUE_CACHE": "test",
+}
+
+
+@override_settings(**NO_CATALOGUE_CACHE)
+class AsyncViewTests(APITestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Books")
+        Product.objects.bulk_create(
+            Product(
+                name=f"Book {i}",
+                description="A good read",
+                price=Decimal("12.00"),
+                stock=i % 3,
+                category=self.category,
+            )
+            for i in range(25)
+        )
+        self.product = Product.objects.filter(stock__gt=0).first()
+        customer = make_customer("reader")
+        place_order(
+            customer,
+            [{"product": self.product.pk, "quantity": 1}],
+            shipping_address="1 Main St",
+        )
+
+    def get_both(self, url, **extra):
+        """GET url from the sync and the async route"""
+        sync = self.client.get(url, **extra)
+        with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+            response = self.client.get(url, **extra)
+            # resolver_match resolves lazily, against the current urlconf
+            response.view = response.resolver_match.func
+        self.assertEqual(response.status_code, sync.status_code)
+        return sync, response
+
+    def test_same_responses_as_sync_views(self):
+        urls = {
+            "/api/products/": async_views.product_list,
+            "/api/products/?in_stock=true": async_views.product_list,
+            f"/api/products/?category={self.category.pk}&page=2": (
+                async_views.product_list
+            ),
+            f"/api/products/{self.product.pk}/": async_views.product_detail,
+            f"/api/categories/{self.category.pk}/products/": (
+                async_views.category_products
+            ),
+        }
+        for url, view in urls.items():
+            with self.subTest(url=url):
+                sync, response = self.get_both(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIs(response.view, view)
+                # DRF views set Allow; the async views answer themselves
+                self.assertNotIn("Allow", response.headers)
+                self.assertEqual(response.json(), sync.json())
+
+    def test_dashboard_authenticates_and_gathers(self):
+        staff = User.objects.create(username="staff", is_staff=True)
+        token = f"Bearer {AccessToken.for_user(staff)}"
+        sync, response = self.get_both(
+            "/api/analytics/dashboard/", HTTP_AUTHORIZATION=token
+        )
+        self.assertEqual(response.json(), sync.json())
+        self.assertEqual(response.json()["total_orders"], 1)
+        self.assertNotIn("Allow", response.headers)
+
+        # Without credentials the sync view answers, with its 401
+        sync, response = self.get_both("/api/analytics/dashboard/")
+        self.assertEqual(response.status_code, 401)
+
+    def test_other_requests_fall_back_to_sync_views(self):
+        sync, response = self.get_both("/api/products/?pagination=cursor")
+        self.assertEqual(response.json(), sync.json())
+        self.assertEqual(self.get_both("/api/products/?page=9")[1].status_code, 404)
+        self.assertEqual(self.get_both("/api/products/999/")[1].status_code, 404)
+
+        admin = User.objects.create(username="admin", is_staff=True)
+        self.client.force_authenticate(admin)
+        with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+            response = self.client.post(
+                "/api/products/",
+                {
+                    "name": "New book",
+                    "description": "Fresh",
+                    "price": "9.00",
+                    "stock": 1,
+                    "category": self.category.pk,
+                },
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201)
+
+
+class SalesRollupTests(APITestCase):
+    def setUp(self):
+        self.books = Category.objects.create(name="Books")
+        self.games = Category.objects.create(name="Games")
+        self.novel = make_product(self.books, "Novel", stock=100)
+        self.chess = make_product(self.games, "Chess", price="25.00", stock=100)
+        self.alice = make_customer("alice")
+        self.bob = make_customer("bob")
+        self.client.force_authenticate(self.alice.user)
+        # Drop dashboard figures memoised by earlier tests
+        cache.clear()
+
+    def place(self, customer, novels, chess_sets):
+        items = [
+            {"product": self.novel, "quantity": novels},
+            {"product": self.chess, "quantity": chess_sets},
+        ]
+        return place_order(customer, items, shipping_address="1 Main St")
+
+    def snapshot(self):
+        def rows(model, *fields):
+            return sorted(
+                tuple(row) for row in model.objects.values_list(*fields) if any(row[3:])
+            )
+
+        return (
+            rows(ProductSalesRollup, "day", "product", "status", "quantity", "revenue"),
+            rows(
+                CategorySalesRollup, "day", "category", "status", "quantity", "revenue"
+            ),
+            rows(
+                CustomerSalesRollup,
+                "day",
+                "customer",
+                "status",
+                "order_count",
+                "total_spent",
+            ),
+        )
+
+    def test_incremental_updates_match_rebuild(self):
+        first = self.place(self.alice, 2, 1)
+        second = self.place(self.bob, 1, 3)
+        self.place(self.bob, 4, 1)
+
+        first.status = "shipped"
+        first.save()
+        cancel_orders(Order.objects.all(), [second.pk])
+
+        incremental = self.snapshot()
+        rollups.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_sales_stay_with_the_category_they_were_made_in(self):
+        order = place_order(
+            self.alice,
+            [{"product": self.novel, "quantity": 2}],
+            shipping_address="1 Main St",
+        )
+        self.novel.category = self.games
+        self.novel.save()
+        cancel_orders(Order.objects.all(), [order.pk])
+
+        incremental = self.snapshot()
+        self.assertEqual(
+            incremental[1],
+            [
+                (
+                    order.created_at.date(),
+                    self.books.pk,
+                    "cancelled",
+                    2,
+                    Decimal("20.00"),
+                )
+            ],
+        )
+        rollups.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_analytics_endpoints(self):
+        shipped = self.place(self.alice, 2, 1)
+        shipped.status = "delivered"
+        shipped.save()
+        cancelled = self.place(self.bob, 5, 5)
+        cancel_orders(Order.objects.all(), [cancelled.pk])
+        self.place(self.bob, 1, 1)
+
+        dashboard = self.client.get("/api/analytics/dashboard/").data
+        self.assertEqual(dashboard["total_orders"], 3)
+        self.assertEqual(dashboard["pending_orders"], 1)
+        self.assertEqual(dashboard["total_revenue"], Decimal("45.00"))
+
+        top_products = self.client.get("/api/analytics/top-products/").data
+        self.assertEqual(
+            [(row["name"], row["total_sold"]) for row in top_products],
+            [("Novel", 3), ("Chess", 2)],
+        )
+
+        top_customers = self.client.get("/api/analytics/top-customers/").data
+        self.assertEqual(
+            [
+                (row["id"], row["total_spent"], row["order_count"])
+                for row in top_customers
+            ],
+            [(self.alice.pk, Decimal("45.00"), 1), (self.bob.pk, Decimal("35.00"), 1)],
+        )
+
+        by_category = self.client.get("/api/analytics/revenue-by-category/").data
+        self.assertEqual(
+            [(row["name"], row["total_revenue"]) for row in by_category],
+            [("Games", 25.0), ("Books", 20.0)],
+        )
+
+    def test_dashboard_queries_window_and_memo(self):
+        order = self.place(self.alice, 1, 1)
+        today = timezone.localdate(order.created_at)
+        url = "/api/analytics/dashboard/"
+
+        # Orders, catalogue counters and customers: one query each
+        with self.assertNumQueries(3):
+            dashboard = self.client.get(url).data
+        self.assertEqual(
+            dashboard,
+            {
+                "total_products": 2,
+                "total_categories": 2,
+                "total_customers": 2,
+                "total_orders": 1,
+                "pending_orders": 1,
+                "total_revenue": 0,
+            },
+        )
+
+        # Repeat requests within the TTL are served from the memo
+        self.place(self.bob, 1, 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).data["total_orders"], 1)
+
+        # Once it expires the new order shows up
+        cache.clear()
+        with self.settings(SHOP_DASHBOARD_TTL_SECONDS=0):
+            self.assertEqual(self.client.get(url).data["total_orders"], 2)
+            yesterday = {"to": today - timedelta(days=1)}
+            self.assertEqual(self.client.get(url, yesterday).data["total_orders"], 0)
+            window = {"from": today, "to": today}
+            self.assertEqual(self.client.get(url, window).data["total_orders"], 2)
+        self.assertEqual(self.client.get(url, {"from": "soon"}).status_code, 400)
+
+    def test_revenue_by_category_date_window(self):
+        order = self.place(self.alice, 1, 1)
+        order.status = "shipped"
+        order.save()
+        today = timezone.localdate(order.created_at)
+        url = "/api/analytics/revenue-by-category/"
+
+        rows = self.client.get(url, {"from": today, "to": today}).data
+        self.assertEqual(sum(row["total_revenue"] for row in rows), 35.0)
+
+        tomorrow = today + timedelta(days=1)
+        rows = self.client.get(url, {"from": tomorrow}).data
+        self.assertEqual(sum(row["total_revenue"] for row in rows), 0)
+
+        response = self.client.get(url, {"to": "yesterday"})
+        self.assertEqual(response.status_code, 400)
+
+
+class CatalogueCacheTests(APITestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Garden")
+        self.product = make_product(self.category, "Rake", price="19.00", stock=3)
+
+    def test_repeat_reads_skip_the_database(self):
+        first = self.client.get("/api/products/", {"category": self.category.pk})
+        with self.assertNumQueries(0):
+            second = self.client.get("/api/products/", {"category": self.category.pk})
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first["ETag"], second["ETag"])
+
+    def test_etag_gives_not_modified(self):
+        url = f"/api/products/{self.product.pk}/"
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_writes_invalidate(self):
+        self.client.get("/api/products/")
+        self.client.get("/api/categories/")
+
+        self.product.name = "Leaf Rake"
+        self.product.save()
+        response = self.client.get("/api/products/")
+        self.assertEqual(response.data["results"][0]["name"], "Leaf Rake")
+
+        self.category.name = "Outdoors"
+        self.category.save()
+        response = self.client.get("/api/categories/")
+        self.assertEqual(response.data["results"][0]["name"], "Outdoors")
+
+    def test_checkout_invalidates_stock(self):
+        url = f"/api/products/{self.product.pk}/"
+        self.client.get(url)
+        place_order(
+            make_customer("gardener"),
+            [{"product": self.product, "quantity": 3}],
+            shipping_address="1 Main St",
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.data["stock"], 0)
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    def make_product(self, stock):
+        return make_product(
+            Category.objects.create(name="Toys"), "Robot", price="20.00", stock=stock
+        )
+
+    def run_concurrently(self, customers, attempt):
+        """Call attempt(customer) from one thread per customer at once"""
+        barrier = threading.Barrier(len(customers))
+        succeeded = []
+
+        def run(customer):
+            barrier.wait()
+            try:
+                # Retry lock timeouts the way a client would retry the request
+                deadline = time.monotonic() + 60
+                while time.monotonic() < deadline:
+                    try:
+                        attempt(customer)
+                    except OperationalError:
+                        time.sleep(random.random() / 50)
+                        continue
+                    except (CheckoutError, InsufficientStock):
+                        return
+                    succeeded.append(customer)
+                    return
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(c,)) for c in customers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return succeeded
+
+    def test_last_units_are_never_oversold(self):
+        product = self.make_product(stock=5)
+        customers = [make_customer(f"buyer{i}") for i in range(50)]
+
+        placed = self.run_concurrently(
+            customers,
+            lambda customer: place_order(
+                customer,
+                [{"product": product.pk, "quantity": 1}],
+                shipping_address="1 Main St",
+            ),
+        )
+
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(len(placed), 5)
+        self.assertEqual(Order.objects.count(), len(placed))
+
+    def test_holds_and_purchases_never_oversell(self):
+        product = self.make_product(stock=10)
+        customers = [make_customer(f"buyer{i}") for i in range(40)]
+
+        def hold_or_buy(customer):
+            if customer.pk % 2:
+                inventory.reserve(customer, {product.pk: 1})
+            else:
+                place_order(
+                    customer,
+                    [{"product": product.pk, "quantity": 1}],
+                    shipping_address="1 Main St",
+                )
+
+        winners = self.run_concurrently(customers, hold_or_buy)
+        self.assertEqual(len(winners), 10)
+
+        product.refresh_from_db()
+        holders = StockHold.objects.values_list("customer", flat=True)
+        self.assertEqual(product.reserved, len(holders))
+        self.assertEqual(product.stock, 10 - Order.objects.count())
+        self.assertEqual(product.available, 0)
+
+        # A hold guarantees its owner can still buy
+        for customer in Customer.objects.filter(pk__in=holders):
+            place_order(
+                customer,
+                [{"product": product.pk, "quantity": 1}],
+                shipping_address="1 Main St",
+            )
+        product.refresh_from_db()
+        self.assertEqual((product.stock, product.reserved), (0, 0))
+        self.assertEqual(Order.objects.count(), 10)
@@ -1,13 +1,17 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from .async_views import routes as async_routes
 from .views import (
+    CartViewSet,
     CategoryViewSet,
     CustomerViewSet,
     OrderViewSet,
     ProductViewSet,
     RegisterView,
+    StockHoldViewSet,
     analytics_dashboard,
     current_user_view,
     logout_view,
@@ -22,14 +26,31 @@ router.register(r"categories", CategoryViewSet, basename="category")
 router.register(r"products", ProductViewSet, basename="product")
 router.register(r"customers", CustomerViewSet, basename="customer")
 router.register(r"orders", OrderViewSet, basename="order")
+router.register(r"holds", StockHoldViewSet, basename="hold")
 
 urlpatterns = [
+    # Async variants of the routes named in SHOP_ASYNC_VIEWS, shadowing the
+    # sync routes below
+    *async_routes(settings.SHOP_ASYNC_VIEWS),
     # Authentication endpoints
     path("auth/register/", RegisterView.as_view(), name="register"),
     path("auth/login/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("auth/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("auth/logout/", logout_view, name="logout"),
     path("auth/user/", current_user_view, name="current_user"),
+    # Cart endpoints
+    path(
+        "cart/",
+        CartViewSet.as_view(
+            {"get": "retrieve", "put": "update", "post": "add", "delete": "destroy"}
+        ),
+        name="cart",
+    ),
+    path(
+        "cart/checkout/",
+        CartViewSet.as_view({"post": "checkout"}),
+        name="cart_checkout",
+    ),
     # Analytics endpoints
     path("analytics/dashboard/", analytics_dashboard, name="analytics_dashboard"),
     path("analytics/top-products/", top_selling_products, name="top_products"),
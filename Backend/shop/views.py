@@ -1,29 +1,93 @@
+import codecs
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Count, F, Sum
-from rest_framework import generics, permissions, status, viewsets
+from django.core.cache import cache
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework import generics, mixins, permissions, status, viewsets
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import (
     AllowAny,
+    IsAdminUser,
     IsAuthenticated,
     IsAuthenticatedOrReadOnly,
 )
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 
-from .models import Category, Customer, Order, OrderItem, Product
+from . import carts, inventory
+from .authentication import ShopRefreshToken
+from .cache import CatalogueCacheMixin, cache_response
+from .checkout import NON_CANCELLABLE_STATUSES, CheckoutError, cancel_orders
+from .exports import CONTENT_TYPES, export_response
+from .imports import import_products, object_rows, read_rows
+from .models import (
+    Category,
+    CategorySalesRollup,
+    Customer,
+    CustomerSalesRollup,
+    Order,
+    OrderItem,
+    Product,
+    ProductSalesRollup,
+    StockHold,
+)
+from .pagination import OptionalCursorPagination
+from .search import get_search_backend
 from .serializers import (
+    CartCheckoutSerializer,
+    CartSerializer,
+    CartUpdateSerializer,
     CategorySerializer,
     CustomerSerializer,
+    OrderBulkCancelSerializer,
     OrderCreateSerializer,
     OrderDetailSerializer,
     OrderListSerializer,
     ProductDetailSerializer,
     ProductListSerializer,
+    StockHoldCreateSerializer,
+    StockHoldSerializer,
     UserRegistrationSerializer,
     UserSerializer,
 )
 
 
+def date_bounds(request):
+    """Parse the optional ?from=/?to= ISO dates (inclusive) of a request"""
+    bounds = []
+    for param in ("from", "to"):
+        value = request.GET.get(param)
+        try:
+            bounds.append(date.fromisoformat(value) if value else None)
+        except ValueError:
+            raise ValidationError({param: "Enter a date as YYYY-MM-DD."})
+    return bounds
+
+
+def created_between(queryset, request):
+    """Filter on created_at with index-friendly datetime bounds"""
+    start, end = date_bounds(request)
+    tz = timezone.get_current_timezone()
+    if start:
+        start = datetime.combine(start, time.min, tzinfo=tz)
+        queryset = queryset.filter(created_at__gte=start)
+    if end:
+        end = datetime.combine(end + timedelta(days=1), time.min, tzinfo=tz)
+        queryset = queryset.filter(created_at__lt=end)
+    return queryset
+
+
+def file_format(request):
+    file_format = request.query_params.get("fmt", "csv")
+    if file_format not in CONTENT_TYPES:
+        raise ValidationError({"fmt": f"Choose one of: {', '.join(CONTENT_TYPES)}."})
+    return file_format
+
+
 # Authentication Views
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
@@ -36,7 +100,7 @@ class RegisterView(generics.CreateAPIView):
         user = serializer.save()
 
         # Generate JWT tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = ShopRefreshToken.for_user(user)
 
         return Response(
             {
@@ -54,7 +118,7 @@ class RegisterView(generics.CreateAPIView):
 def logout_view(request):
     try:
         refresh_token = request.data.get("refresh_token")
-        token = RefreshToken(refresh_token)
+        token = ShopRefreshToken(refresh_token)
         token.blacklist()
         return Response({"message": "Logout successful"}, status=status.HTTP_200_OK)
     except Exception as e:
@@ -69,12 +133,21 @@ def current_user_view(request):
 
 
 # Category ViewSet
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CatalogueCacheMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
+    @cache_response("categories")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response("categories")
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     @action(detail=True, methods=["get"])
+    @cache_response("categories", "products")
     def products(self, request, pk=None):
         """Get all products in this category"""
         category = self.get_object()
@@ -84,8 +157,46 @@ class CategoryViewSet(viewsets.ModelViewSet):
 
 
 # Product ViewSet
-class ProductViewSet(viewsets.ModelViewSet):
+PRODUCT_EXPORT_FIELDS = [
+    "id",
+    "sku",
+    "name",
+    "description",
+    "category_id",
+    "category__name",
+    "price",
+    "stock",
+    "is_active",
+    "created_at",
+    "updated_at",
+]
+
+
+def catalogue_products(params):
+    """Active products filtered by the list's query parameters"""
+    queryset = Product.objects.filter(is_active=True)
+
+    # Filter by category
+    category = params.get("category", None)
+    if category:
+        queryset = queryset.filter(category_id=category)
+
+    # Filter by stock availability
+    in_stock = params.get("in_stock", None)
+    if in_stock == "true":
+        queryset = queryset.filter(stock__gt=F("reserved"))
+
+    # Full-text search over name and description, ranked by relevance
+    search = params.get("search", None)
+    if search:
+        queryset = get_search_backend().search(queryset, search)
+
+    return queryset.select_related("category")
+
+
+class ProductViewSet(CatalogueCacheMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = OptionalCursorPagination
     queryset = Product.objects.filter(is_active=True)
 
     def get_serializer_class(self):
@@ -94,24 +205,47 @@ class ProductViewSet(viewsets.ModelViewSet):
         return ProductListSerializer
 
     def get_queryset(self):
-        queryset = Product.objects.filter(is_active=True)
+        return catalogue_products(self.request.query_params)
+
+    @cache_response("categories", "products")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
-        # Filter by category
-        category = self.request.query_params.get("category", None)
-        if category:
-            queryset = queryset.filter(category_id=category)
+    @cache_response("categories", "product:{pk}")
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
-        # Filter by stock availability
-        in_stock = self.request.query_params.get("in_stock", None)
-        if in_stock == "true":
-            queryset = queryset.filter(stock__gt=0)
+    @action(detail=False, methods=["get"], permission_classes=[IsAdminUser])
+    def export(self, request):
+        """Stream every product as CSV or NDJSON (?fmt=), filterable by date"""
+        products = created_between(Product.objects.all(), request)
 
-        # Search by name
-        search = self.request.query_params.get("search", None)
-        if search:
-            queryset = queryset.filter(name__icontains=search)
+        status_filter = request.query_params.get("status")
+        if status_filter in ("active", "inactive"):
+            products = products.filter(is_active=status_filter == "active")
 
-        return queryset.select_related("category")
+        return export_response(
+            products, PRODUCT_EXPORT_FIELDS, file_format(request), "products"
+        )
+
+    @action(detail=False, methods=["post"], permission_classes=[IsAdminUser])
+    def bulk(self, request):
+        """Upsert products by SKU from an uploaded CSV/NDJSON file or a JSON list"""
+        upload = request.FILES.get("file")
+        if upload is not None:
+            rows = read_rows(
+                codecs.iterdecode(upload, "utf-8-sig"), file_format(request)
+            )
+        elif isinstance(request.data, list):
+            rows = object_rows(request.data)
+        else:
+            raise ValidationError(
+                {"file": "Upload a CSV/NDJSON file or post a list of products."}
+            )
+        try:
+            return Response(import_products(rows))
+        except UnicodeDecodeError:
+            raise ValidationError({"file": "The file must be UTF-8 encoded."})
 
     @action(detail=False, methods=["get"])
     def low_stock(self, request):
@@ -154,8 +288,22 @@ class CustomerViewSet(viewsets.ModelViewSet):
 
 
 # Order ViewSet
+ORDER_EXPORT_FIELDS = [
+    "id",
+    "customer_id",
+    "customer__user__username",
+    "customer__user__email",
+    "status",
+    "total_amount",
+    "shipping_address",
+    "created_at",
+    "updated_at",
+]
+
+
 class OrderViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
+    pagination_class = OptionalCursorPagination
 
     def get_serializer_class(self):
         if self.action == "create":
@@ -168,12 +316,27 @@ class OrderViewSet(viewsets.ModelViewSet):
         user = self.request.user
 
         # Admin can see all orders, regular users only their own
-        if user.is_staff:
-            return Order.objects.all().select_related("customer__user")
+        queryset = Order.objects.select_related("customer__user")
+        if not user.is_staff:
+            queryset = queryset.filter(customer__user=user)
 
-        return Order.objects.filter(customer__user=user).select_related(
-            "customer__user"
-        )
+        if self.action == "retrieve":
+            queryset = queryset.with_details()
+
+        # Count items in the list query instead of once per order. A
+        # correlated subquery only runs for the rows on the current page,
+        # where a JOIN + GROUP BY would aggregate the whole table first.
+        if self.action == "list":
+            items_count = (
+                OrderItem.objects.filter(order=OuterRef("pk"))
+                .order_by()
+                .values("order")
+                .annotate(count=Count("pk"))
+                .values("count")
+            )
+            queryset = queryset.annotate(items_count=Coalesce(Subquery(items_count), 0))
+
+        return queryset
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -181,6 +344,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         order = serializer.save()
 
         # Return detailed order information
+        order = Order.objects.with_details().get(pk=order.pk)
         detail_serializer = OrderDetailSerializer(order)
         return Response(detail_serializer.data, status=status.HTTP_201_CREATED)
 
@@ -189,41 +353,233 @@ class OrderViewSet(viewsets.ModelViewSet):
         """Cancel an order"""
         order = self.get_object()
 
-        if order.status in ["shipped", "delivered"]:
+        if order.status in NON_CANCELLABLE_STATUSES:
             return Response(
                 {"error": "Cannot cancel shipped or delivered orders"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Restore product stock
-        for item in order.items.all():
-            item.product.stock += item.quantity
-            item.product.save()
-
-        order.status = "cancelled"
-        order.save()
+        # Restore product stock and mark the order cancelled atomically
+        cancelled, skipped = cancel_orders(self.get_queryset(), [order.pk])
+        if not cancelled:
+            return Response(
+                {"error": f"Cannot cancel order: {skipped[order.pk]}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
+        order = Order.objects.with_details().get(pk=order.pk)
         serializer = OrderDetailSerializer(order)
         return Response(serializer.data)
 
+    @action(detail=False, methods=["get"], permission_classes=[IsAdminUser])
+    def export(self, request):
+        """Stream the order history as CSV or NDJSON (?fmt=)"""
+        orders = created_between(Order.objects.all(), request)
+
+        statuses = request.query_params.get("status")
+        if statuses:
+            orders = orders.filter(status__in=statuses.split(","))
+
+        return export_response(
+            orders, ORDER_EXPORT_FIELDS, file_format(request), "orders"
+        )
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="bulk-cancel",
+        permission_classes=[IsAdminUser],
+    )
+    def bulk_cancel(self, request):
+        """Cancel many orders at once, reporting the ones that were skipped"""
+        serializer = OrderBulkCancelSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        cancelled, skipped = cancel_orders(
+            self.get_queryset(), serializer.validated_data["ids"]
+        )
+
+        return Response({"cancelled": cancelled, "skipped": skipped})
+
+
+# Stock Hold ViewSet
+class StockHoldViewSet(
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    """Hold stock for the current customer while they check out"""
+
+    permission_classes = [IsAuthenticated]
+
+    def get_serializer_class(self):
+        if self.action == "create":
+            return StockHoldCreateSerializer
+        return StockHoldSerializer
+
+    def get_queryset(self):
+        return (
+            StockHold.objects.filter(
+                customer__user=self.request.user, expires_at__gt=timezone.now()
+            )
+            .select_related("product")
+            .order_by("expires_at", "pk")
+        )
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        holds = serializer.save()
+        # Read back with their products, rather than one query per line
+        holds = self.get_queryset().filter(pk__in=[hold.pk for hold in holds])
+        return Response(
+            StockHoldSerializer(holds, many=True).data, status=status.HTTP_201_CREATED
+        )
+
+    def perform_destroy(self, instance):
+        inventory.release(StockHold.objects.filter(pk=instance.pk))
+
+
+# Cart ViewSet
+class CartViewSet(viewsets.ViewSet):
+    """
+    The current shopper's cart (shop.carts).
+
+    Guests send back the token of their cart in the X-Cart-Token header;
+    signing in merges that cart into the customer's.
+    """
+
+    permission_classes = [AllowAny]
+
+    def get_permissions(self):
+        if self.action == "checkout":
+            return [IsAuthenticated()]
+        return super().get_permissions()
+
+    def cart_response(self, cart, status_code=status.HTTP_200_OK):
+        return Response(CartSerializer(carts.price(cart)).data, status=status_code)
+
+    def retrieve(self, request):
+        return self.cart_response(carts.find_cart(request))
+
+    def update(self, request):
+        """Replace the cart's content"""
+        return self.write(request, replace=True)
+
+    def add(self, request):
+        """Add quantities to the cart's lines"""
+        return self.write(request, replace=False)
+
+    def write(self, request, replace):
+        serializer = CartUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        cart = carts.find_cart(request, create=True)
+        try:
+            carts.update(cart, serializer.validated_lines(), replace=replace)
+        except carts.CartError as exc:
+            raise ValidationError({"items": exc.errors})
+        return self.cart_response(cart)
+
+    def destroy(self, request):
+        cart = carts.find_cart(request)
+        if cart is not None:
+            cart.items.all().delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def checkout(self, request):
+        """Place an order for everything in the cart"""
+        serializer = CartCheckoutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        cart = carts.find_cart(request)
+        if cart is None:
+            raise ValidationError({"cart": "The cart is empty."})
+        if cart.customer_id is None:
+            raise ValidationError({"cart": "Only customers can check out."})
+        try:
+            order = carts.checkout(cart, **serializer.validated_data)
+        except carts.CartError as exc:
+            raise ValidationError(exc.errors)
+        except CheckoutError as exc:
+            raise ValidationError({"items": exc.errors})
+
+        order = Order.objects.with_details().get(pk=order.pk)
+        return Response(
+            OrderDetailSerializer(order).data, status=status.HTTP_201_CREATED
+        )
+
 
 # Analytics Views
+# Order-derived figures are read from the daily sales rollups (shop.rollups)
+REVENUE_STATUSES = ["delivered", "shipped"]
+
+
+def date_window(request):
+    """Turn the optional ?from=/?to= dates into rollup day lookups"""
+    start, end = date_bounds(request)
+    window = {}
+    if start:
+        window["day__gte"] = start
+    if end:
+        window["day__lte"] = end
+    return window
+
+
+# Shared with the async dashboard in shop.async_views. Order figures come
+# from one conditional aggregate over the rollups, catalogue figures from
+# the maintained Category.active_product_count counters.
+DASHBOARD_ORDER_TOTALS = {
+    "total_orders": Sum("order_count"),
+    "pending_orders": Sum("order_count", filter=Q(status="pending")),
+    "total_revenue": Sum("total_spent", filter=Q(status__in=REVENUE_STATUSES)),
+}
+DASHBOARD_CATALOGUE_TOTALS = {
+    "total_categories": Count("pk"),
+    "total_products": Sum("active_product_count"),
+}
+
+
+def dashboard_cache_key(window):
+    return "analytics:dashboard:" + ",".join(
+        f"{lookup}={value}" for lookup, value in sorted(window.items())
+    )
+
+
+def dashboard_ttl():
+    return getattr(settings, "SHOP_DASHBOARD_TTL_SECONDS", 5)
+
+
+def dashboard_data(orders, catalogue, customers):
+    return {
+        "total_products": catalogue["total_products"] or 0,
+        "total_categories": catalogue["total_categories"],
+        "total_customers": customers,
+        "total_orders": orders["total_orders"] or 0,
+        "pending_orders": orders["pending_orders"] or 0,
+        "total_revenue": orders["total_revenue"] or 0,
+    }
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def analytics_dashboard(request):
-    """Get overall analytics dashboard data"""
-
-    data = {
-        "total_products": Product.objects.filter(is_active=True).count(),
-        "total_categories": Category.objects.count(),
-        "total_customers": Customer.objects.count(),
-        "total_orders": Order.objects.count(),
-        "pending_orders": Order.objects.filter(status="pending").count(),
-        "total_revenue": Order.objects.filter(
-            status__in=["delivered", "shipped"]
-        ).aggregate(Sum("total_amount"))["total_amount__sum"]
-        or 0,
-    }
+    """Get overall analytics dashboard data, optionally for ?from=/?to= dates"""
+    window = date_window(request)
+
+    # Auto-refreshing dashboards share one computation per TTL
+    key = dashboard_cache_key(window)
+    data = cache.get(key)
+    if data is None:
+        data = dashboard_data(
+            CustomerSalesRollup.objects.filter(**window).aggregate(
+                **DASHBOARD_ORDER_TOTALS
+            ),
+            Category.objects.aggregate(**DASHBOARD_CATALOGUE_TOTALS),
+            Customer.objects.count(),
+        )
+        cache.set(key, data, dashboard_ttl())
 
     return Response(data)
 
@@ -233,17 +589,23 @@ def analytics_dashboard(request):
 def top_selling_products(request):
     """Get top 10 best-selling products"""
 
-    products = Product.objects.annotate(
-        total_sold=Sum("order_items__quantity")
-    ).order_by("-total_sold")[:10]
+    top = (
+        ProductSalesRollup.objects.exclude(status="cancelled")
+        .values("product")
+        .annotate(total_sold=Sum("quantity"))
+        .order_by("-total_sold")[:10]
+    )
+    top = list(top)
+    products = Product.objects.in_bulk([row["product"] for row in top])
 
     data = []
-    for product in products:
+    for row in top:
+        product = products[row["product"]]
         data.append(
             {
                 "id": product.id,
                 "name": product.name,
-                "total_sold": product.total_sold or 0,
+                "total_sold": row["total_sold"] or 0,
                 "price": product.price,
                 "stock": product.stock,
             }
@@ -257,19 +619,27 @@ def top_selling_products(request):
 def top_customers(request):
     """Get top 10 customers by total spending"""
 
-    customers = Customer.objects.annotate(
-        total_spent=Sum("orders__total_amount"), order_count=Count("orders")
-    ).order_by("-total_spent")[:10]
+    top = (
+        CustomerSalesRollup.objects.exclude(status="cancelled")
+        .values("customer")
+        .annotate(total_spent=Sum("total_spent"), order_count=Sum("order_count"))
+        .order_by("-total_spent")[:10]
+    )
+    top = list(top)
+    customers = Customer.objects.select_related("user").in_bulk(
+        [row["customer"] for row in top]
+    )
 
     data = []
-    for customer in customers:
+    for row in top:
+        customer = customers[row["customer"]]
         data.append(
             {
                 "id": customer.id,
                 "name": customer.full_name,
                 "email": customer.user.email,
-                "total_spent": customer.total_spent or 0,
-                "order_count": customer.order_count,
+                "total_spent": row["total_spent"] or 0,
+                "order_count": row["order_count"],
             }
         )
 
@@ -279,20 +649,26 @@ def top_customers(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def revenue_by_category(request):
-    """Get revenue breakdown by category"""
+    """Get revenue breakdown by category, optionally within ?from=/?to= dates"""
 
-    categories = Category.objects.annotate(
-        total_revenue=Sum("products__order_items__subtotal")
-    ).order_by("-total_revenue")
+    revenue = dict(
+        CategorySalesRollup.objects.filter(
+            status__in=REVENUE_STATUSES, **date_window(request)
+        )
+        .values("category")
+        .annotate(total_revenue=Sum("revenue"))
+        .values_list("category", "total_revenue")
+    )
 
     data = []
-    for category in categories:
+    for category_id, name in Category.objects.values_list("id", "name"):
         data.append(
             {
-                "id": category.id,
-                "name": category.name,
-                "total_revenue": float(category.total_revenue or 0),
+                "id": category_id,
+                "name": name,
+                "total_revenue": float(revenue.get(category_id) or 0),
             }
         )
+    data.sort(key=lambda row: row["total_revenue"], reverse=True)
 
     return Response(data)
@@ -45,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Inert unless SHOP_PROFILING_ENABLED is set; first so it sees everything
+    "shop.middleware.ProfilingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -83,6 +85,12 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            # Take the write lock when a transaction starts so concurrent
+            # checkouts queue on the busy timeout instead of failing midway
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+        },
     }
 }
 
@@ -99,6 +107,32 @@ DATABASES = {
 # }
 
 
+# ==============================================================================
+# CACHES
+# ==============================================================================
+
+# Local memory by default; set REDIS_URL to share caches between workers
+REDIS_URL = os.environ.get("REDIS_URL")
+CACHE_BACKEND = (
+    "django.core.cache.backends.redis.RedisCache"
+    if REDIS_URL
+    else "django.core.cache.backends.locmem.LocMemCache"
+)
+
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": REDIS_URL or "default",
+    },
+    "catalogue": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": REDIS_URL or "catalogue",
+        "KEY_PREFIX": "catalogue",
+        "TIMEOUT": 300,
+    },
+}
+
+
 # ==============================================================================
 # PASSWORD VALIDATION
 # ==============================================================================
@@ -118,6 +152,16 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Django's defaults, with PBKDF2-SHA256 hashed in a process pool at the
+# cost set by SHOP_PASSWORD_ITERATIONS (shop.passwords)
+PASSWORD_HASHERS = [
+    "shop.passwords.PooledPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+
 
 # ==============================================================================
 # INTERNATIONALIZATION
@@ -146,6 +190,16 @@ STATIC_URL = "static/"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Uploads are stored under the hash of their content (shop.storage)
+STORAGES = {
+    "default": {"BACKEND": "shop.storage.ContentAddressedStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+# Serve MEDIA_ROOT from Django (shop.storage.serve_media), with immutable
+# caching for content-addressed files; off where a web server or CDN does
+SHOP_SERVE_MEDIA = os.environ.get("SHOP_SERVE_MEDIA", "1" if DEBUG else "") == "1"
+
 
 # ==============================================================================
 # CORS CONFIGURATION
@@ -166,9 +220,7 @@ CORS_ALLOW_CREDENTIALS = True
 # ==============================================================================
 
 REST_FRAMEWORK = {
-    "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
-    ),
+    "DEFAULT_AUTHENTICATION_CLASSES": ("shop.authentication.CachedJWTAuthentication",),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 20,
@@ -185,11 +237,78 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
     "UPDATE_LAST_LOGIN": True,
+    # Adds the customer_id and is_staff claims
+    "TOKEN_OBTAIN_SERIALIZER": "shop.authentication.ShopTokenObtainPairSerializer",
+    # Checks the refresh token against the blacklist filter (shop.blacklist)
+    "TOKEN_REFRESH_SERIALIZER": "shop.authentication.ShopTokenRefreshSerializer",
 }
 
+# Loads the customer profile with the user at login, for the token claims
+AUTHENTICATION_BACKENDS = ["shop.authentication.ShopModelBackend"]
+
 
 # ==============================================================================
 # DEFAULT PRIMARY KEY FIELD TYPE
 # ==============================================================================
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# ==============================================================================
+# SHOP CONFIGURATION
+# ==============================================================================
+
+# Product search backend; chosen from the database vendor when unset.
+# SHOP_SEARCH_BACKEND = "shop.search.BasicSearchBackend"
+
+# Cache alias used for rendered catalogue responses (shop.cache)
+SHOP_CATALOGUE_CACHE = "catalogue"
+
+# How long a stock hold (shop.inventory) lasts before expire_holds frees it
+SHOP_HOLD_TTL_SECONDS = 15 * 60
+
+# Resized copies of product images (shop.images), by largest side in
+# pixels, and their JPEG/WebP quality. Made by "manage.py image_variants".
+SHOP_IMAGE_VARIANTS = {"thumb": 200, "medium": 800}
+SHOP_IMAGE_QUALITY = 80
+
+# How long the analytics dashboard figures are reused between requests
+SHOP_DASHBOARD_TTL_SECONDS = 5
+
+# In-process cache of authenticated users (shop.authentication): how many
+# to keep, and for how long another process's change may go unnoticed
+SHOP_AUTH_CACHE_SIZE = 10_000
+SHOP_AUTH_CACHE_TTL_SECONDS = 60
+
+# Bloom filter of blacklisted refresh tokens (shop.blacklist): its size and
+# false positive rate, how long another process's blacklisting may go
+# unseen, and how often it is rebuilt to drop the expired tokens. Run
+# "manage.py purge_tokens --loop" to delete expired tokens from the tables.
+SHOP_BLACKLIST_FILTER_CAPACITY = 1_000_000
+SHOP_BLACKLIST_FILTER_ERROR_RATE = 0.001
+SHOP_BLACKLIST_SYNC_SECONDS = 1
+SHOP_BLACKLIST_REBUILD_SECONDS = 60 * 60
+
+# Password hashing (shop.passwords): PBKDF2 iterations, worker processes
+# per server process (0 hashes inline), hashes accepted at once before
+# answering 503, and how much lower the workers' CPU priority is.
+# Stored hashes are upgraded to a new iteration count at the next login.
+SHOP_PASSWORD_ITERATIONS = int(os.environ.get("SHOP_PASSWORD_ITERATIONS", "1000000"))
+SHOP_PASSWORD_WORKERS = int(os.environ.get("SHOP_PASSWORD_WORKERS", "2"))
+SHOP_PASSWORD_QUEUE_SIZE = int(os.environ.get("SHOP_PASSWORD_QUEUE_SIZE", "8"))
+SHOP_PASSWORD_NICE = 10
+
+# Hot read routes served by the async views in shop.async_views, by URL
+# name (e.g. "product-list,product-detail"). Only pays off under ASGI.
+SHOP_ASYNC_VIEWS = [
+    name for name in os.environ.get("SHOP_ASYNC_VIEWS", "").split(",") if name
+]
+
+# Per-request profiling (shop.middleware.ProfilingMiddleware). Sampled
+# requests get a Server-Timing header; those over a threshold are logged
+# to the "shop.profiling" logger.
+SHOP_PROFILING_ENABLED = os.environ.get("SHOP_PROFILING", "") == "1"
+SHOP_PROFILING_SAMPLE_RATE = float(os.environ.get("SHOP_PROFILING_SAMPLE_RATE", "0.01"))
+SHOP_PROFILING_SLOW_MS = 500
+SHOP_PROFILING_MAX_QUERIES = 50
+SHOP_PROFILING_DUPLICATE_THRESHOLD = 5